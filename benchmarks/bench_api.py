@@ -0,0 +1,116 @@
+"""
+Measure the throughput and peak memory of the fetch, filter/sort and delete stages,
+against a local fake GitHub api, with synthetic package versions.
+
+    > pipenv run bench_api --sizes 1000 10000 100000 --latency 20 --error_rate 0.01
+    > pipenv run bench_api --sizes 500000 --label v1.4.0 --output benchmarks.ndjson
+
+Each scenario is run twice. Once for the time, and once with tracemalloc on for the peak memory,
+as tracing slows everything down. The fake api runs in this same process, but only ever holds one page at a time.
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable
+import ghpkgadmin as g
+from benchmarks.synthetic import SyntheticVersions
+from tests.fake_github import FakeGitHub
+
+
+PACKAGE = "bench"
+PATH = g.LIST_PACKAGE_VERSIONS_FOR_ORG.format(org="bench", package_type="container", package_name=PACKAGE)
+INCLUDE = [("metadata.container.tags[*]", "develop-.*")]
+
+
+def _measure(run: Callable[[], int], traceMemory: bool) -> dict:
+    """
+    Time a single run, and then run it again for the peak memory.
+    `run` returns the number of items it processed. Anything it prints is dropped.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        items = run()
+        seconds = time.perf_counter() - start
+
+        result = {"items": items, "seconds": round(seconds, 3), "items_per_second": round(items / seconds) if seconds else None}
+        if traceMemory:
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["peak_mb"] = round(peak / (1024 * 1024), 1)
+    return result
+
+
+def _scenarios(args, fake: FakeGitHub, client: g.GitHubClient, size: int) -> dict[str, Callable[[], int]]:
+
+    def fetch() -> int:
+        result, _ = g._pagedDataFetch(client, PATH, size, {}, workers=args.fetch_workers)
+        return len(result)
+
+    fetched, _ = g._pagedDataFetch(client, PATH, size, {}, workers=args.fetch_workers)
+
+    def filterSort() -> int:
+        g._filterAndSortListResponseJson(itemList=fetched, include=INCLUDE, exclude=None, sortBy="updated_at",
+                                         sortReverse=True, slice=(None, 100), summary={})
+        return len(fetched)
+
+    def pipeline() -> int:
+        summary: dict = {}
+        g._listPackageVersions(summary=summary, client=client, org="bench", user=None, packageType="container",
+                               packageName=PACKAGE, fetchLimit=size, fetchWorkers=args.fetch_workers,
+                               include=INCLUDE, exclude=None, sortBy="updated_at", sortReverse=True, slice=(None, 100),
+                               fields=args.fields)
+        return summary["items_fetched"]
+
+    deleteList = fetched[:args.delete_items]
+
+    def delete() -> int:
+        g._deletePackageVersions(summary={}, itemList=deleteList, client=client, org="bench", user=None,
+                                 packageType="container", packageName=PACKAGE, dryrun=False, workers=args.delete_workers)
+        return len(deleteList)
+
+    return {"fetch": fetch, "filter_sort": filterSort, "pipeline": pipeline, "delete": delete}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="How many versions the fake package has. Up to 500000")
+    parser.add_argument('--scenarios', nargs='+', default=["fetch", "filter_sort", "pipeline", "delete"])
+    parser.add_argument('--latency', type=float, default=0, help="Milliseconds added to every fake api request")
+    parser.add_argument('--error_rate', type=float, default=0, help="The chance of any fake api request failing with a 502 or 429")
+    parser.add_argument('--rate_limit', type=int, default=None, help="Send X-RateLimit headers, counting down from this budget")
+    parser.add_argument('--max_per_page', type=int, default=g.GITHUB_PER_PAGE_LIMIT)
+    parser.add_argument('--fetch_workers', type=int, default=4)
+    parser.add_argument('--delete_workers', type=int, default=4)
+    parser.add_argument('--delete_items', type=int, default=1000, help="How many versions the delete scenario deletes")
+    parser.add_argument('--fields', nargs='+', default=None, help="The --fields projection for the pipeline scenario")
+    parser.add_argument('--backoff', type=float, default=0.05, help="The client retry backoff. Kept short, so injected errors don't dominate")
+    parser.add_argument('--no_memory', action='store_true', help="Skip the second, traced, run of each scenario")
+    parser.add_argument('--label', default=None, help="Recorded with each result. eg, the release being measured")
+    parser.add_argument('--output', default=None, help="Append each result to this json lines file")
+    args = parser.parse_args()
+
+    g._debug = False
+
+    for size in args.sizes:
+        with FakeGitHub(versions={PACKAGE: SyntheticVersions(size)},
+                        latency=args.latency / 1000,
+                        errorRate=args.error_rate,
+                        rateLimit=args.rate_limit,
+                        maxPerPage=args.max_per_page) as fake, \
+                g.GitHubClient("bench", apiRoot=fake.url, poolSize=max(args.fetch_workers, args.delete_workers), backoff=args.backoff) as client:
+
+            scenarios = _scenarios(args, fake, client, size)
+            for name in args.scenarios:
+                requestsBefore = len(fake.requests)
+                result = {"label": args.label, "scenario": name, "size": size, **_measure(scenarios[name], not args.no_memory)}
+                result["requests"] = len(fake.requests) - requestsBefore
+                print(f"{name:12} {size:>7} versions  {result['items']:>7} items  {result['seconds']:8.3f}s  {result['items_per_second'] or 0:>9} items/s  "
+                      f"{result.get('peak_mb', '-'):>7} MB  {result['requests']:>6} requests")
+                if args.output:
+                    with open(args.output, "a") as fh:
+                        fh.write(json.dumps(result) + "\n")
@@ -0,0 +1,77 @@
+"""
+Compare the compiled include/exclude filters against the original
+`[*].path` find + `_findRootIndex` implementation.
+
+    > pipenv run python -m benchmarks.bench_filters --items 100000
+"""
+import argparse
+import time
+import jsonpath_ng  # type: ignore
+import re
+from collections import OrderedDict
+import ghpkgadmin as g
+from benchmarks.synthetic import versions as syntheticVersions
+
+
+def _findRootIndex(jsonpath) -> int:
+    if type(jsonpath) is jsonpath_ng.DatumInContext:
+        return _findRootIndex(jsonpath.full_path)
+    if type(jsonpath) is jsonpath_ng.Index:
+        return jsonpath.index
+    if type(jsonpath) is jsonpath_ng.Child:
+        return _findRootIndex(jsonpath.left)
+    raise Exception("Attempt to find root list index, found nothing.")
+
+
+def _legacyIncludeFilter(itemList: list[dict], include: tuple[str, str]) -> list[dict]:
+    fieldPathExpr = jsonpath_ng.parse("[*]." + include[0])
+    fieldValueRegex = re.compile(include[1])
+    newItemDict: OrderedDict[int, dict] = OrderedDict()
+    for fieldPath in fieldPathExpr.find(itemList):
+        if fieldValueRegex.match(str(fieldPath.value)) is not None:
+            rootIndex = _findRootIndex(fieldPath)
+            newItemDict[rootIndex] = itemList[rootIndex]
+    return list(newItemDict.values())
+
+
+def _legacyExcludeFilter(itemList: list[dict], exclude: tuple[str, str]) -> list[dict]:
+    fieldPathExpr = jsonpath_ng.parse("[*]." + exclude[0])
+    fieldValueRegex = re.compile(exclude[1])
+    newItemList = itemList.copy()
+    delItemIndexList: list[int] = []
+    for fieldPath in fieldPathExpr.find(newItemList):
+        if fieldValueRegex.match(str(fieldPath.value)):
+            rootIndex = _findRootIndex(fieldPath)
+            if rootIndex not in delItemIndexList:
+                delItemIndexList.append(rootIndex)
+    for i in sorted(delItemIndexList, reverse=True):
+        del newItemList[i]
+    return newItemList
+
+
+def _timed(fn) -> tuple[float, list[dict]]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--skip_legacy_exclude', action='store_true', help="The legacy exclude is quadratic, and very slow at 100k items")
+    args = parser.parse_args()
+
+    g._debug = False
+    versions = syntheticVersions(args.items)
+    filter = ("metadata.container.tags[*]", "(?i)develop-.*")
+
+    legacyTime, legacyResult = _timed(lambda: _legacyIncludeFilter(versions, filter))
+    compiledTime, (compiledResult, _) = _timed(lambda: g._includeFilter(versions, filter, {}))
+    assert legacyResult == compiledResult, "include results differ"
+    print(f"include  {args.items} items  legacy {legacyTime:8.3f}s  compiled {compiledTime:8.3f}s  x{legacyTime / compiledTime:.1f}")
+
+    if not args.skip_legacy_exclude:
+        legacyTime, legacyResult = _timed(lambda: _legacyExcludeFilter(versions, filter))
+        compiledTime, (compiledResult, _) = _timed(lambda: g._excludeFilter(versions, filter, {}))
+        assert legacyResult == compiledResult, "exclude results differ"
+        print(f"exclude  {args.items} items  legacy {legacyTime:8.3f}s  compiled {compiledTime:8.3f}s  x{legacyTime / compiledTime:.1f}")
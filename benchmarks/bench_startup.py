@@ -0,0 +1,71 @@
+"""
+Measure how long the action takes to start. Each command is run in a fresh python process, as the docker action does.
+
+    > pipenv run bench_startup --runs 20
+
+- import: just `import ghpkgadmin`
+- help (script): import plus the argparse setup, run the way the original entrypoint did, `python ghpkgadmin.py`
+- help (module): the same, as `python -m ghpkgadmin`, which can use the cached bytecode
+- first json path: the first jsonpath_ng parse, which builds the parser, with and without the precompiled parser tables
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PARSE = """
+import sys, time
+sys.path.insert(0, {tablesDir!r})
+import ghpkgadmin as g
+g._debug = False
+start = time.perf_counter()
+# Straight to the parser, _compileFieldPath would take the simple path fast path and never build it
+g._parseJsonPath("metadata.container.tags[*]")
+print(time.perf_counter() - start)
+"""
+
+
+def _median(command: list[str], runs: int, env: dict) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _medianReported(command: list[str], runs: int, env: dict) -> float:
+    """ The median of the seconds the command prints itself """
+    return statistics.median(float(subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout)
+                             for _ in range(runs))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    # Let python cache the bytecode, the same as in the docker image
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "ghpkgadmin.py"], cwd=ROOT, env=env, check=True)
+
+    commands = {
+        "import": [sys.executable, "-c", "import ghpkgadmin"],
+        "help (script)": [sys.executable, "ghpkgadmin.py", "--help"],
+        "help (module)": [sys.executable, "-m", "ghpkgadmin", "--help"],
+    }
+    for name, command in commands.items():
+        print(f"{name:28} {_median(command, args.runs, env) * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tablesDir:
+        untabled = _medianReported([sys.executable, "-c", FIRST_PARSE.format(tablesDir=tablesDir)], args.runs, env)
+        subprocess.run([sys.executable, "-c", f"import ghpkgadmin; ghpkgadmin._writeJsonPathTables({tablesDir!r})"], cwd=ROOT, env=env, check=True)
+        tabled = _medianReported([sys.executable, "-c", FIRST_PARSE.format(tablesDir=tablesDir)], args.runs, env)
+    print(f"{'first json path (generated)':28} {untabled * 1000:8.1f} ms")
+    print(f"{'first json path (tables)':28} {tabled * 1000:8.1f} ms")
@@ -0,0 +1,54 @@
+"""
+Synthetic container package versions, for benchmarks at any size.
+Each version is made from it's index alone, so the same count always gives the same versions.
+"""
+import random
+from typing import Sequence
+
+
+def version(index: int) -> dict:
+    """
+    A single container version, shaped like the GitHub list package versions response.
+    Roughly half are tagged. Most tags are develop builds, the rest are releases.
+    """
+    rnd = random.Random(index)
+    tags = []
+    if rnd.random() < 0.5:
+        tags = [f"develop-{index}"] if rnd.random() < 0.8 else [f"v1-{index}", "develop-latest"]
+    updated = f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T{rnd.randint(0, 23):02d}:00:00Z"
+    return {
+        "id": index,
+        "name": f"sha256:{index:064x}",
+        "url": f"https://api.github.com/orgs/bench/packages/container/bench/versions/{index}",
+        "package_html_url": "https://github.com/orgs/bench/packages/container/package/bench",
+        "created_at": updated,
+        "updated_at": updated,
+        "html_url": f"https://github.com/orgs/bench/packages/container/bench/{index}",
+        "metadata": {"package_type": "container", "container": {"tags": tags}},
+    }
+
+
+def versions(count: int) -> list[dict]:
+    return [version(i) for i in range(count)]
+
+
+class SyntheticVersions(Sequence[dict]):
+    """
+    A read only list of `count` versions, that makes each version only when it's asked for.
+    Lets the fake GitHub api serve 500k versions without holding them all in memory.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [version(i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return version(index)
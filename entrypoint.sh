@@ -4,7 +4,8 @@ CLI_ARGS=$@
 
 echo "Starting Action with args [ ${CLI_ARGS} ]"
 
-cd /action
+# ACTION_DIR lets the tests run the entrypoint against the checked out code
+cd "${ACTION_DIR:-/action}" || exit 1
 
 echo "Running Action"
-python ghpkgadmin.py ${CLI_ARGS}
+python -m ghpkgadmin ${CLI_ARGS}
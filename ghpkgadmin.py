@@ -7,37 +7,131 @@ A simple python script that can run a set of GitHub Package Admin functions.
 import sys
 import os
 import argparse
-from typing import Optional, Any
+from typing import Optional, Any, Callable, Iterable, Iterator, Generator, AsyncIterator
 from enum import Enum
+from datetime import datetime, timedelta, timezone
 import requests
+import requests.adapters
 import json
-import jsonpath_ng  # type: ignore
+import urllib.parse
 import re
-from collections import OrderedDict
+import time
+import random
+import hashlib
+import heapq
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import closing, contextmanager
 
 KEY_ORG = "org"
 KEY_USER = "user"
 
 API_ROOT = "https://api.github.com"
 
+# The api paths below are relative to the api root of the GitHubClient
+
 # We'll impose a paging limit of 50. GitHub already imposes a limit of 100. And a default of 30
 GITHUB_PER_PAGE_LIMIT = 100
 
 
-LIST_PACKAGES_FOR_ORG = API_ROOT + "/orgs/{org}/packages?package_type={package_type}"
-LIST_PACKAGES_FOR_USER = API_ROOT + "/users/{user}/packages?package_type={package_type}"
+LIST_PACKAGES_FOR_ORG = "/orgs/{org}/packages?package_type={package_type}"
+LIST_PACKAGES_FOR_USER = "/users/{user}/packages?package_type={package_type}"
 
-# DELETE_PACKAGE_FOR_ORG = API_ROOT + "/orgs/{org}/packages/{package_type}/{package_name}"
-# DELETE_PACKAGE_FOR_USER = API_ROOT + "/users/{user}/packages/{package_type}/{package_name}/versions/{package_version_id}"
+# DELETE_PACKAGE_FOR_ORG = "/orgs/{org}/packages/{package_type}/{package_name}"
+# DELETE_PACKAGE_FOR_USER = "/users/{user}/packages/{package_type}/{package_name}/versions/{package_version_id}"
 
-LIST_PACKAGE_VERSIONS_FOR_ORG = API_ROOT + "/orgs/{org}/packages/{package_type}/{package_name}/versions?"
-LIST_PACKAGE_VERSIONS_FOR_USER = API_ROOT + "/users/{user}/packages/{package_type}/{package_name}/versions?"
+LIST_PACKAGE_VERSIONS_FOR_ORG = "/orgs/{org}/packages/{package_type}/{package_name}/versions?"
+LIST_PACKAGE_VERSIONS_FOR_USER = "/users/{user}/packages/{package_type}/{package_name}/versions?"
 
-DELETE_PACKAGE_VERSION_FOR_ORG = API_ROOT + "/orgs/{org}/packages/{package_type}/{package_name}/versions/{package_version_id}"
-DELETE_PACKAGE_VERSION_FOR_USER = API_ROOT + "/users/{user}/packages/{package_type}/{package_name}/versions/{package_version_id}"
+DELETE_PACKAGE_VERSION_FOR_ORG = "/orgs/{org}/packages/{package_type}/{package_name}/versions/{package_version_id}"
+DELETE_PACKAGE_VERSION_FOR_USER = "/users/{user}/packages/{package_type}/{package_name}/versions/{package_version_id}"
 
 PAGING_ARGS = "&per_page={per_page}&page={page}"
 
+# The default most items to fetch from any one list
+FETCH_LIMIT = 1000
+
+# Every package type github knows about
+PACKAGE_TYPES = ["npm", "maven", "rubygems", "docker", "nuget", "container"]
+
+# How many times a single request is re-attempted after being rate limited
+RATE_LIMIT_RETRIES = 5
+
+# GitHub does not always send a Retry-After with a secondary rate limit. Their docs suggest waiting at least a minute.
+SECONDARY_RATE_LIMIT_WAIT_SECONDS = 60
+
+# Where to find the tags of a container package version
+CONTAINER_TAGS_PATH = "metadata.container.tags[*]"
+
+# The json paths that can be projected. A dotted path of plain keys, with an optional [*] or [n] on the end.
+SIMPLE_FIELD_PATH = re.compile(r"^(?:\$\.)?([A-Za-z_][A-Za-z0-9_-]*(?:\.[A-Za-z_][A-Za-z0-9_-]*)*)(?:\[(?:\*|[0-9]+)\])?$")
+
+# The options a plan file rule can have. The same as the command line arguments of the same name
+PLAN_RULE_KEYS = {"name", "include", "exclude", "filter_mode", "older_than", "keep_newest_per_tag_prefix", "age_field", "sort_by", "reverse", "slice"}
+
+# The defaults for the on-disk page cache
+CACHE_MAX_AGE_HOURS = 24 * 7
+CACHE_MAX_MB = 100
+
+# A version index older than this is thrown away, and the package is fetched in full again.
+# This is how versions deleted from deep in the history, by someone else, are eventually dropped from the index.
+INDEX_MAX_AGE_HOURS = 24
+
+# Retry 5xx and 429 responses this many times, with a jittered exponential backoff starting at this many seconds
+HTTP_RETRIES = 3
+HTTP_BACKOFF_SECONDS = 1.0
+HTTP_BACKOFF_MAX_SECONDS = 30.0
+
+# Once the primary budget drops below this many calls, spread the remaining calls out until the reset time.
+RATE_LIMIT_LOW_WATERMARK = 50
+
+# The secondary rate limit allows this many points per minute, and each DELETE costs this many points.
+SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE = 900
+DELETE_POINTS = 5
+
+# The share of a minute's secondary rate limit points that can be sent in a single burst.
+RATE_LIMIT_BURST_SHARE = 0.1
+
+# GitHub limits each action output to 1MB. A larger result is written to this file in the workspace instead
+ACTION_OUTPUT_MAX_BYTES = 1024 * 1024
+RESULT_FILE_NAME = "ghpkgadmin-result.json"
+NDJSON_RESULT_FILE_NAME = "ghpkgadmin-result.ndjson"
+SUMMARY_FILE_NAME = "ghpkgadmin-summary.json"
+
+# The jsonpath_ng parser tables are precompiled into this module, next to this script, when the docker image is built.
+# It's named for the jsonpath_ng version the tables were built from.
+JSONPATH_TABLES_MODULE = "jsonpath_parsetab_{version}"
+
+# How many compiled json paths are kept, for re-use by every filter, sort and rule that uses the same path
+JSONPATH_CACHE_SIZE = 256
+
+# The tables the query operation loads the packages and versions into. Tags are flattened into their own table.
+# Timestamps are stored as `YYYY-MM-DD HH:MM:SS` in UTC, so they compare directly with sqlite's own `datetime()`.
+QUERY_SCHEMA = """
+DROP TABLE IF EXISTS tags;
+DROP TABLE IF EXISTS versions;
+DROP TABLE IF EXISTS packages;
+CREATE TABLE packages (id INTEGER, package_type TEXT, name TEXT, visibility TEXT, version_count INTEGER,
+                       created_at TEXT, updated_at TEXT, data TEXT, PRIMARY KEY (package_type, name));
+CREATE TABLE versions (id INTEGER PRIMARY KEY, package_type TEXT, package_name TEXT, name TEXT, tag_count INTEGER,
+                       created_at TEXT, updated_at TEXT, data TEXT);
+CREATE TABLE tags (version_id INTEGER, tag TEXT, PRIMARY KEY (version_id, tag));
+"""
+
+# A version seen twice while the pages shift is replaced, and its tags are only kept once.
+# The indexes are built once all of the rows are loaded, which is quicker than keeping them up to date row by row.
+QUERY_INDEXES = """
+CREATE INDEX versions_package ON versions (package_type, package_name);
+CREATE INDEX versions_created_at ON versions (created_at);
+CREATE INDEX versions_updated_at ON versions (updated_at);
+CREATE INDEX tags_tag ON tags (tag);
+"""
+
+# Used by the dryrun execution plan estimate, when no request has been timed yet.
+ESTIMATED_SECONDS_PER_CALL = 1.0
+
 _debug = True
 
 
@@ -50,10 +144,93 @@ def INFO_PRINT(msg):
     print(msg)
 
 
+class _StageTimes:
+    """
+    The wall time, call count and item count of each named pipeline stage.
+    Stages can be timed from any thread. Stages that run in parallel add up to more than the wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, items)
+
+    def add(self, name: str, seconds: float, items: int = 0):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "items": 0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["items"] += items
+
+    def report(self) -> dict:
+        with self._lock:
+            return {name: {**stage, "seconds": round(stage["seconds"], 4)} for name, stage in self.stages.items()}
+
+
+_stages = _StageTimes()
+
+
+class _ThreadProfiler:
+    """
+    cProfile only profiles the thread that enabled it. The fetches, deletes and batch packages all run on worker
+    threads, so every thread started while this is enabled gets a profiler of it's own. They are merged into one dump.
+    """
+
+    def __init__(self):
+        import cProfile
+        self._newProfile = cProfile.Profile
+        self._lock = threading.Lock()
+        self._profiles = [cProfile.Profile()]
+
+    def _profileThread(self, frame, event, arg):
+        # The first profile event of a new thread, swap this hook for a real profiler
+        profile = self._newProfile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def enable(self):
+        threading.setprofile(self._profileThread)
+        self._profiles[0].enable()
+
+    def dump(self, path: str):
+        import pstats
+        self._profiles[0].disable()
+        threading.setprofile(None)
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+
+
+class FILTER_MODE(str, Enum):
+    AND = "and"
+    OR = "or"
+
+
+class OUTPUT_FORMAT(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+
 class OPERATION(str, Enum):
     LIST_PACKAGES = "listPackages"
     LIST_PACKAGE_VERSIONS = "listPackageVersions"
     DELETE_PACKAGE_VERSIONS = "deletePackageVersions"
+    BATCH_DELETE_PACKAGE_VERSIONS = "batchDeletePackageVersions"
+    DELETE_PACKAGE_VERSIONS_BY_PLAN = "deletePackageVersionsByPlan"
+    INVENTORY = "inventory"
+    QUERY = "query"
+    PURGE_UNTAGGED_CONTAINER_VERSIONS = "purgeUntaggedContainerVersions"
 
 
 def _generateRequestHeaders(ghtoken: str) -> dict:
@@ -67,126 +244,743 @@ def _generateRequestHeaders(ghtoken: str) -> dict:
     }
 
 
-def _findRootIndex(jsonpath: jsonpath_ng.Child | jsonpath_ng.Index | jsonpath_ng.DatumInContext) -> int:
+class EtagCache:
     """
-    Given a json path, or path context. find the root index.
-    If the root is a list, it'll be the index in that list of this items.
-    if the root is a dict/object, return None
-    This function is recursive.
+    An on-disk cache of fetched list pages, keyed by url, and stored with the ETag GitHub sent for the page.
+    The next fetch of the same url sends `If-None-Match`. A 304 response does not count against the
+    rate limit, and the page body is read back from here instead.
+    Entries older than `maxAgeSeconds` are dropped, then the least recently used entries are dropped
+    until the cache fits within `maxBytes`.
     """
 
-    # If we get a datum, pass it's full path recursively into this function
-    if type(jsonpath) is jsonpath_ng.DatumInContext:
-        return _findRootIndex(jsonpath.full_path)
+    def __init__(self,
+                 cacheDir: str,
+                 maxAgeSeconds: float = CACHE_MAX_AGE_HOURS * 3600,
+                 maxBytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.cacheDir = cacheDir
+        self.maxAgeSeconds = maxAgeSeconds
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cacheDir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cacheDir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def load(self, url: str) -> Optional[dict]:
+        """
+        The cached entry for this url. A dict of `etag`, `link` and `body`. None if there is no usable entry.
+        """
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.maxAgeSeconds:
+                return None
+            with open(path) as fh:
+                entry: dict = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def store(self, url: str, etag: str, link: Optional[str], body: Any):
+        """
+        Write the entry to a temp file first, so a concurrent reader never sees a partial file.
+        """
+        path = self._path(url)
+        tmpPath = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmpPath, "w") as fh:
+            json.dump({"url": url, "etag": etag, "link": link, "body": body}, fh)
+        os.replace(tmpPath, path)
+
+    def touch(self, url: str):
+        """
+        Mark the entry as recently used, so it is the last to be evicted.
+        """
+        try:
+            os.utime(self._path(url))
+        except OSError:
+            pass
+
+    def count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evict(self) -> int:
+        """
+        Drop the expired entries, then the least recently used entries until we are within our size limit.
+        Returns how many entries were removed.
+        """
+        entries = []
+        for name in os.listdir(self.cacheDir):
+            path = os.path.join(self.cacheDir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        now = time.time()
+        totalBytes = sum(entry[1] for entry in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if now - mtime <= self.maxAgeSeconds and totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalBytes -= size
+            removed += 1
 
-    # If the child is an Index, we're at the root
-    if type(jsonpath) is jsonpath_ng.Index:
-        return jsonpath.index
+        DEBUG_PRINT(f"Evicted {removed} cache entries from {self.cacheDir}")
+        return removed
 
-    # If this is a child, navigate left and run this function recursively.
-    if type(jsonpath) is jsonpath_ng.Child:
-        if jsonpath.left is None:
-            raise Exception("Attempt to find root list index, in a non list object")
-        else:
-            return _findRootIndex(jsonpath.left)
 
-    raise Exception("Attempt to find root list index, found nothing.")
+class VersionIndex:
+    """
+    A local snapshot of every version of a package, kept in the same newest first order as the api, one compact json file per package.
+    A later listing only fetches pages until it reaches a version id that is already in the snapshot.
+    The fetched pages replace everything in the snapshot down to the last known id on them. Any known id in that range that was
+    not fetched has been deleted, and is dropped. The older versions are taken from the snapshot as is.
+    Snapshots older than `maxAgeSeconds` are not used, and the package is fetched in full.
+    """
 
+    def __init__(self,
+                 indexDir: str,
+                 maxAgeSeconds: float = INDEX_MAX_AGE_HOURS * 3600):
+        self.indexDir = indexDir
+        self.maxAgeSeconds = maxAgeSeconds
+        self._lock = threading.Lock()
+        os.makedirs(indexDir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.indexDir, hashlib.sha256(url.encode()).hexdigest() + ".index.json")
+
+    def load(self, url: str) -> Optional[dict]:
+        """
+        The snapshot for this version list url. A dict of `versions` and `complete`. None if there is no usable snapshot.
+        `complete` is false when the last full fetch stopped at the fetch limit, before the end of the history.
+        """
+        path = self._path(url)
+        try:
+            with open(path) as fh:
+                snapshot: dict = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get("url") != url or time.time() - snapshot.get("synced", 0) > self.maxAgeSeconds:
+            return None
+        return snapshot
+
+    def store(self, url: str, versions: list[dict], complete: bool, synced: Optional[float] = None):
+        """
+        Write the snapshot to a temp file first, so a concurrent reader never sees a partial file.
+        """
+        path = self._path(url)
+        tmpPath = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmpPath, "w") as fh:
+            json.dump({"url": url, "synced": time.time() if synced is None else synced, "complete": complete, "versions": versions},
+                      fh, separators=(",", ":"))
+        os.replace(tmpPath, path)
+
+    def remove(self, url: str, ids: Iterable[Any]):
+        """
+        Drop versions we have deleted ourselves, so the next listing does not need to find out.
+        """
+        removeIds = set(ids)
+        with self._lock:
+            snapshot = self.load(url)
+            if snapshot is None or not removeIds:
+                return
+            versions = [version for version in snapshot["versions"] if version.get("id") not in removeIds]
+            self.store(url, versions, snapshot["complete"], synced=snapshot["synced"])
+
+
+class RateLimitScheduler:
+    """
+    Paces every request a client sends, shared by all of it's list and delete workers, across every package.
+    The primary budget is read from the X-RateLimit headers of every response. Requests go out as fast as they can,
+    until the usable budget runs low. Then they are spread out evenly until the reset time.
+    `reserve` is the share of both the primary and secondary limits left unused, for other jobs sharing the same token.
+    With `pointsPerMinute`, a token bucket also keeps us under the secondary rate limit. A GET costs 1 point, and a DELETE costs DELETE_POINTS.
+    The bucket only holds RATE_LIMIT_BURST_SHARE of a minute's points, so no minute ever sees more than `pointsPerMinute`.
+    Any rate limited response pauses every request until the limit clears.
+    """
 
-def _includeFilter(itemList: list[dict],
-                   include: tuple[str, str],
-                   summary: dict) -> tuple[list[dict], dict]:
+    def __init__(self,
+                 pointsPerMinute: Optional[float] = None,
+                 reserve: float = 0.0,
+                 lowWatermark: int = RATE_LIMIT_LOW_WATERMARK):
+        assert reserve >= 0 and reserve < 1, "The rate limit reserve must be at least 0, and less than 1"
+        self.reserve = reserve
+        self.lowWatermark = lowWatermark
+        self.waits = 0
+        self.waitSeconds = 0.0
+        self.rateLimited = 0
+        self._lock = threading.Lock()
+        self._pauseUntil = 0.0
+        self._limit = 0
+        self._remaining: Optional[int] = None
+        self._reset = 0.0
+        self._nextPrimaryAt = 0.0
+        self._rate: Optional[float] = None
+        self._capacity = 0.0
+        self._tokens = 0.0
+        self._refilledAt = time.time()
+        if pointsPerMinute:
+            points = pointsPerMinute * (1 - reserve)
+            self._capacity = max(points * RATE_LIMIT_BURST_SHARE, DELETE_POINTS)
+            self._rate = (points - self._capacity) / 60 if points > self._capacity else points / 60
+            self._tokens = self._capacity
+
+    def _usable(self, now: float) -> Optional[float]:
+        """
+        The primary budget we may still use before the reset. None if we do not know it.
+        """
+        if self._remaining is None or now >= self._reset:
+            return None
+        return self._remaining - self.reserve * self._limit
+
+    def acquire(self, method: str):
+        """
+        Block the calling worker until it is allowed to send its next request.
+        """
+        cost = DELETE_POINTS if method == "DELETE" else 1
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                delay = self._pauseUntil - now
+
+                usable = self._usable(now)
+                slot = now
+                if usable is not None and usable < 1:
+                    delay = max(delay, self._reset - now)
+                elif usable is not None and usable < self.lowWatermark:
+                    slot = max(now, self._nextPrimaryAt)
+                    delay = max(delay, slot - now)
+
+                if self._rate is not None:
+                    self._tokens = min(self._capacity, self._tokens + (now - self._refilledAt) * self._rate)
+                    self._refilledAt = now
+                    if self._tokens < cost:
+                        delay = max(delay, (cost - self._tokens) / self._rate)
+
+                if delay <= 0:
+                    if usable is not None and self._remaining is not None:
+                        if usable < self.lowWatermark:
+                            self._nextPrimaryAt = slot + (self._reset - now) / usable
+                        self._remaining -= 1
+                    if self._rate is not None:
+                        self._tokens -= cost
+                    if waited:
+                        self.waits += 1
+                        self.waitSeconds += waited
+                    return
+
+            time.sleep(delay)
+            waited += delay
+
+    def observe(self, response: requests.Response) -> Optional[float]:
+        """
+        Keep the latest primary budget, and pause every request if this response was rate limited.
+        Returns the seconds to wait before trying again, or None if the response was not rate limited.
+        """
+        waitSeconds = _rateLimitWaitSeconds(response)
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        with self._lock:
+            if remaining is not None:
+                reset = float(response.headers.get("X-RateLimit-Reset", 0))
+                # Responses can arrive out of order. Within the same window, the lowest count is the latest.
+                if self._remaining is not None and reset == self._reset:
+                    self._remaining = min(self._remaining, int(remaining))
+                else:
+                    self._remaining = int(remaining)
+                self._limit = int(response.headers.get("X-RateLimit-Limit", 0))
+                self._reset = reset
+            if waitSeconds is not None:
+                self.rateLimited += 1
+                self._pauseUntil = max(self._pauseUntil, time.time() + waitSeconds)
+        return waitSeconds
+
+    def pause(self, seconds: float):
+        """
+        Pause all requests for the given number of seconds.
+        """
+        with self._lock:
+            self._pauseUntil = max(self._pauseUntil, time.time() + seconds)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {"reserve": self.reserve, "rate_limited": self.rateLimited, "waits": self.waits, "wait_seconds": round(self.waitSeconds, 2)}
+
+
+class GitHubClient:
     """
-    Returns a NEW list of filtered items.
-    And the origianl summary dict altered
+    A shared, keep-alive connection to the GitHub api.
+    The headers are built once, and the pooled connections are re-used by every page fetch and delete.
+    5xx responses are retried with a jittered exponential backoff.
+    Pass a different `apiRoot` to point the client at a local stand-in server.
+    Every request sent is counted, timed and sized by method, and the most recent rate limit headers are kept in `rateLimit`.
+    The version list pages actually listed, not counting retries, are kept in `versionPages`.
+    With an `index`, package versions are listed incrementally against a local snapshot.
+    Every request is paced by the `scheduler`, and rate limited requests are retried once the limit clears.
+    Without one, the client only slows down for a low primary budget, and for rate limited responses.
     """
-    assert len(include) == 2, "Include Filter must have 2 values.  (jsonpath, regex)"
 
-    includePath = "[*]." + include[0]
-    includeRegex = include[1]
+    def __init__(self,
+                 ghtoken: str,
+                 apiRoot: str = API_ROOT,
+                 poolSize: int = 10,
+                 retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_BACKOFF_SECONDS,
+                 cache: Optional["EtagCache"] = None,
+                 index: Optional["VersionIndex"] = None,
+                 scheduler: Optional[RateLimitScheduler] = None):
+        self.apiRoot = apiRoot.rstrip("/")
+        self.cache = cache
+        self.index = index
+        self.scheduler = scheduler if scheduler is not None else RateLimitScheduler()
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.headers.update(_generateRequestHeaders(ghtoken))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.calls: dict[str, int] = {}
+        self.callSeconds: dict[str, float] = {}
+        self.callBytes: dict[str, int] = {}
+        self.slowestCall: dict[str, float] = {}
+        self.rateLimit: Optional[dict] = None
+        self.versionPages = 0
+        self._statsLock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def url(self, path: str) -> str:
+        """
+        Api paths are relative to our api root. Full urls, such as those from a Link header, are used as is.
+        """
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.apiRoot + path
+
+    def _backoffSeconds(self, attempt: int, response: requests.Response) -> float:
+        retryAfter = response.headers.get("Retry-After")
+        if retryAfter is not None:
+            return float(retryAfter)
+        return min(self.backoff * (2 ** attempt), HTTP_BACKOFF_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+    def _record(self, method: str, seconds: float, response: requests.Response):
+        """
+        Count and time the request, and keep the latest primary rate limit budget.
+        """
+        rateLimit = None
+        if "X-RateLimit-Remaining" in response.headers:
+            rateLimit = {
+                "limit": int(response.headers.get("X-RateLimit-Limit", 0)),
+                "remaining": int(response.headers["X-RateLimit-Remaining"]),
+                "used": int(response.headers.get("X-RateLimit-Used", 0)),
+                "reset": int(response.headers.get("X-RateLimit-Reset", 0)),
+                "resource": response.headers.get("X-RateLimit-Resource", "core")
+            }
+        with self._statsLock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.callSeconds[method] = self.callSeconds.get(method, 0.0) + seconds
+            self.callBytes[method] = self.callBytes.get(method, 0) + len(response.content)
+            self.slowestCall[method] = max(self.slowestCall.get(method, 0.0), seconds)
+            if rateLimit is not None:
+                self.rateLimit = rateLimit
+
+    def countVersionPage(self):
+        with self._statsLock:
+            self.versionPages += 1
+
+    def httpReport(self) -> dict:
+        """
+        The calls, total and slowest seconds, and bytes received, of the requests sent so far. By method.
+        """
+        with self._statsLock:
+            return {method: {"calls": self.calls[method],
+                             "seconds": round(self.callSeconds[method], 4),
+                             "slowest_seconds": round(self.slowestCall[method], 4),
+                             "bytes": self.callBytes[method]} for method in self.calls}
+
+    def request(self, method: str, path: str, headers: Optional[dict] = None) -> requests.Response:
+        """
+        Send the request once the scheduler allows it. Retry it once the rate limit clears, and retry server errors with a backoff.
+        The final response is returned as is, it's up to the caller to check the status.
+        """
+        url = self.url(path)
+        attempt = 0
+        rateLimited = 0
+        while True:
+            self.scheduler.acquire(method)
+            DEBUG_PRINT(f"{method} {url}")
+            start = time.monotonic()
+            response = self.session.request(method, url, headers=headers)
+            self._record(method, time.monotonic() - start, response)
+
+            waitSeconds = self.scheduler.observe(response)
+            if waitSeconds is not None and rateLimited < RATE_LIMIT_RETRIES:
+                INFO_PRINT(f"Rate limited [{response.status_code}]. Pausing requests for {waitSeconds:.0f}s")
+                rateLimited += 1
+                continue
+
+            if attempt >= self.retries or (response.status_code < 500 and response.status_code != 429):
+                return response
+
+            wait = self._backoffSeconds(attempt, response)
+            DEBUG_PRINT(f"Received [{response.status_code}]. Retrying in {wait:.2f}s")
+            time.sleep(wait)
+            attempt += 1
+
+    def get(self, path: str, headers: Optional[dict] = None) -> requests.Response:
+        return self.request("GET", path, headers=headers)
+
+    def delete(self, path: str) -> requests.Response:
+        return self.request("DELETE", path)
+
+
+_jsonPathParser: Any = None
+_jsonPathLock = threading.Lock()
+
+
+def _jsonPathTablesModule() -> str:
+    import jsonpath_ng  # type: ignore
+    return JSONPATH_TABLES_MODULE.format(version=jsonpath_ng.__version__.replace(".", "_"))
+
+
+def _buildJsonPathParser(writeTablesTo: Optional[str] = None) -> Any:
+    """
+    jsonpath_ng builds a whole new parser from it's grammar, for every json path it parses.
+    Instead, we build one parser, the first time a json path is needed, and re-use it.
+    When the precompiled tables module can be imported, the parser is built straight from it, skipping the grammar analysis.
+    Otherwise the tables are generated, and written to `writeTablesTo` if given.
+    """
+    import ply.yacc  # type: ignore
+    import jsonpath_ng.parser  # type: ignore
 
-    # Item Path Matcher, and it's matching regex value matcher
-    try:
-        fieldPathExpr = jsonpath_ng.parse(includePath)
-    except Exception:
-        raise Exception(f"Malformed json path in include filter '{includePath}'. See above exception.")
+    grammar = jsonpath_ng.parser.JsonPathParser()
+    tablesModule = _jsonPathTablesModule()
 
-    try:
-        fieldValueRegex = re.compile(includeRegex)
-    except Exception:
-        raise Exception(f"Malformed regex in include filter '{includeRegex}'. See above exception.")
+    if writeTablesTo is None:
+        try:
+            tables = ply.yacc.LRTable()
+            tables.read_table(tablesModule)
+            tables.bind_callables({name: getattr(grammar, name) for name in dir(grammar) if name.startswith("p_")})
+            return ply.yacc.LRParser(tables, grammar.p_error)
+        except ImportError:
+            DEBUG_PRINT(f"No precompiled json path parser tables found in {tablesModule}")
 
-    # Needs to be a OrderedDict by rootIndex, so we don't duplicate
-    newItemDict: OrderedDict[int, dict] = OrderedDict()
+    return ply.yacc.yacc(module=grammar, start="jsonpath", tabmodule=tablesModule, outputdir=writeTablesTo,
+                         write_tables=writeTablesTo is not None, debug=False, errorlog=ply.yacc.NullLogger())
 
-    # Find all/any path matches into this list
-    fieldPathList = fieldPathExpr.find(itemList)
-    DEBUG_PRINT(f"Found {len(fieldPathList)} value(s) at path '{fieldPathExpr}'")
 
-    # Check each value against the provided value regex
-    for fieldPath in fieldPathList:
+def _writeJsonPathTables(outputDir: str = os.path.dirname(os.path.abspath(__file__))):
+    """
+    Precompile the json path parser tables into a module in the given directory. Run once, when the docker image is built.
+    """
+    _buildJsonPathParser(writeTablesTo=outputDir)
 
-        fieldValue = str(fieldPath.value)
 
-        # If we get a value match, add to the new root list
-        if fieldValueRegex.match(fieldValue) is not None:
-            DEBUG_PRINT(f"Regex '{includeRegex} matches Value '{fieldValue}'. Adding to result list")
-            rootIndex = _findRootIndex(fieldPath)
-            newItemDict[rootIndex] = itemList[rootIndex]
+def _parseJsonPath(path: str) -> Any:
+    """
+    Parse the json path with our one, shared, jsonpath_ng parser.
+    jsonpath_ng is only imported the first time a json path is parsed. Operations without a filter or sort never load it.
+    """
+    global _jsonPathParser
+    import jsonpath_ng.lexer  # type: ignore
+    import jsonpath_ng.parser  # type: ignore
 
-    DEBUG_PRINT(f"Include Filter Result {len(newItemDict)}")
-    summary["include_filter_result"] = len(newItemDict)
-    return list(newItemDict.values()), summary
+    # The parser keeps it's state on itself, so only one path can be parsed at a time
+    with _jsonPathLock:
+        if _jsonPathParser is None:
+            _jsonPathParser = _buildJsonPathParser()
+        tokens = jsonpath_ng.parser.IteratorToTokenStream(jsonpath_ng.lexer.JsonPathLexer().tokenize(path))
+        return _jsonPathParser.parse(lexer=tokens)
 
 
-def _excludeFilter(itemList: list[dict],
-                   exclude: tuple[str, str],
-                   summary: dict) -> tuple[list[dict], dict]:
+def _fastFieldPath(path: str) -> Optional[Callable[[Any], list[Any]]]:
     """
-    Run the exclude filter on the item list
+    A direct dict traversal for a simple dotted json path, optionally ending in [*]. eg `metadata.container.tags[*]`
+    Finds exactly the same values jsonpath_ng would, including it's habit of treating a single value as a list of one for [*].
+    None for any other json path.
     """
-    assert len(exclude) == 2, "Exclude Filter must have 2 values.  (jsonpath, regex)"
-    excludePath = "[*]." + exclude[0]
-    excludeRegex = exclude[1]
+    keys = _fieldKeys(path)
+    spread = path.strip().endswith("[*]")
+    if keys is None or "where" in keys or (path.strip().endswith("]") and not spread):
+        return None
 
-    # Item Path Matcher, and it's matching regex value matcher
-    try:
-        fieldPathExpr = jsonpath_ng.parse(excludePath)
-    except Exception:
-        raise Exception(f"Malformed json path in exclude filter {excludePath}. See above exception.")
+    def valuesAt(item: Any) -> list[Any]:
+        value = item
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                return []
+            value = value[key]
+        if not spread:
+            return [value]
+        if not value:
+            return []
+        if isinstance(value, (dict, int, str)):
+            return [value]
+        return [value[i] for i in range(len(value))]
+
+    return valuesAt
+
+
+@functools.lru_cache(maxsize=JSONPATH_CACHE_SIZE)
+def _compileFieldPath(path: str) -> Callable[[Any], list[Any]]:
+    """
+    Compile the json path once, and return a function that finds all of the values at that path within a single item.
+    Simple dotted paths never touch jsonpath_ng. The compiled paths are cached, so every stage and rule using the same path shares one.
+    """
+    fastPath = _fastFieldPath(path)
+    if fastPath is not None:
+        return fastPath
 
-    try:
-        fieldValueRegex = re.compile(excludeRegex)
-    except Exception:
-        raise Exception(f"Malformed regex in include filter {excludeRegex}. See above exception.")
+    fieldPathExpr = _parseJsonPath(path)
+    return lambda item: [match.value for match in fieldPathExpr.find(item)]
+
+
+class _FilterPlan:
+    """
+    Any number of include and exclude (jsonpath, regex) filters, compiled once, and run together in a single pass over the items.
+    A filter matches an item when the regex matches ANY of the values found at the jsonpath.
+    With the AND mode, an item must match ALL of the include filters to be kept. With the OR mode, matching ANY include filter keeps it.
+    Matching ANY exclude filter always removes an item, whatever the mode. Each exclude protects the versions it matches from a delete.
+    The values at each json path are only extracted once per item, no matter how many filters use that path.
+    """
+
+    def __init__(self,
+                 include: list[tuple[str, str]],
+                 exclude: list[tuple[str, str]],
+                 mode: FILTER_MODE = FILTER_MODE.AND):
+        self._valuesAt: dict[str, Callable[[Any], list[Any]]] = {}
+        self.include = [self._compile(filter, "include") for filter in include]
+        self.exclude = [self._compile(filter, "exclude") for filter in exclude]
+        self.combine = all if mode == FILTER_MODE.AND else any
+
+    def _compile(self, filter: tuple[str, str], filterName: str) -> tuple[str, Callable]:
+        assert len(filter) == 2, f"{filterName.capitalize()} Filter must have 2 values.  (jsonpath, regex)"
+        filterPath = filter[0]
+        filterRegex = filter[1]
+
+        # Item Path Matcher, and it's matching regex value matcher
+        if filterPath not in self._valuesAt:
+            try:
+                self._valuesAt[filterPath] = _compileFieldPath(filterPath)
+            except Exception:
+                raise Exception(f"Malformed json path in {filterName} filter '{filterPath}'. See above exception.")
+
+        try:
+            fieldValueRegex = re.compile(filterRegex)
+        except Exception:
+            raise Exception(f"Malformed regex in {filterName} filter '{filterRegex}'. See above exception.")
+
+        return filterPath, fieldValueRegex.match
+
+    def _matches(self, item: dict, values: dict[str, list[str]], filter: tuple[str, Callable]) -> bool:
+        filterPath, match = filter
+        fieldValues = values.get(filterPath)
+        if fieldValues is None:
+            fieldValues = values[filterPath] = [str(value) for value in self._valuesAt[filterPath](item)]
+        return any(match(value) is not None for value in fieldValues)
+
+    def filter(self, itemList: list[dict]) -> tuple[list[dict], int]:
+        """
+        Returns a NEW list of the items that pass the filters, in their original order.
+        And the count of items that passed the include filters, before the exclude filters were applied.
+        """
+        newItemList = []
+        includedCount = 0
+        for item in itemList:
+            values: dict[str, list[str]] = {}
+            if self.include and not self.combine(self._matches(item, values, filter) for filter in self.include):
+                continue
+            includedCount += 1
+            if any(self._matches(item, values, filter) for filter in self.exclude):
+                continue
+            newItemList.append(item)
+        return newItemList, includedCount
+
+
+class _Timestamps:
+    """
+    Parse the ISO8601 timestamp at a json path of an item. Items without a parsable timestamp have None.
+    Within a `stage()` block, each item is only parsed once, however many times it's asked for. The parsed timestamps
+    are dropped at the end of the block, so no item is kept alive once the stage is done with it.
+    Stages are per thread, so one set of rules can be shared by the packages of a batch.
+    """
 
-    newItemList = itemList.copy()
-    delItemIndexList: list[int] = []
+    def __init__(self, field: str):
+        self.field = field
+        self._valuesAt = _compileFieldPath(field)
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self):
+        previous = getattr(self._local, "cache", None)
+        self._local.cache = {}
+        try:
+            yield
+        finally:
+            self._local.cache = previous
+
+    def of(self, item: dict) -> Optional[datetime]:
+        cache: Optional[dict[int, tuple[dict, Optional[datetime]]]] = getattr(self._local, "cache", None)
+        cached = cache.get(id(item)) if cache is not None else None
+        if cached is not None and cached[0] is item:
+            return cached[1]
+
+        timestamp = None
+        values = self._valuesAt(item)
+        if values:
+            try:
+                timestamp = datetime.fromisoformat(str(values[0]))
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+            except ValueError:
+                DEBUG_PRINT(f"Unable to parse the timestamp '{values[0]}' at '{self.field}'")
+
+        if cache is not None:
+            cache[id(item)] = (item, timestamp)
+        return timestamp
+
+
+class _RetentionRules:
+    """
+    Age based rules for what to act on.
+    - older than: only items with an age field timestamp older than the given number of days pass.
+    - keep newest: group the items by the prefix of each of their tags, and take the newest N of each group out of the list.
+      The prefix is the first capture group of the regex, or the whole match if there is none. Items with no matching tag are not affected.
+    """
+
+    def __init__(self,
+                 olderThanDays: Optional[float] = None,
+                 keepNewest: Optional[tuple[int, str]] = None,
+                 ageField: str = "updated_at",
+                 tagPath: str = CONTAINER_TAGS_PATH,
+                 now: Optional[datetime] = None):
+        self.timestamps = _Timestamps(ageField)
+        self.tagPath = tagPath
+        self.cutoff = None
+        if olderThanDays is not None:
+            self.cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=olderThanDays)
+
+        self.keepNewest = None
+        if keepNewest is not None:
+            try:
+                prefixRegex = re.compile(keepNewest[1])
+            except Exception:
+                raise Exception(f"Malformed regex in keep newest per tag prefix '{keepNewest[1]}'. See above exception.")
+            self.keepNewest = (int(keepNewest[0]), prefixRegex)
+            self._tagsAt = _compileFieldPath(tagPath)
+
+    def filterAge(self, itemList: list[dict]) -> list[dict]:
+        """
+        Returns a NEW list of the items older than our cutoff. Items without a timestamp are never old enough.
+        """
+        if self.cutoff is None:
+            return itemList
+        cutoff = self.cutoff
+        with self.timestamps.stage():
+            return [item for item in itemList if (timestamp := self.timestamps.of(item)) is not None and timestamp < cutoff]
+
+    def _prefixes(self, item: dict) -> set[str]:
+        assert self.keepNewest is not None
+        prefixes = set()
+        for tag in self._tagsAt(item):
+            match = self.keepNewest[1].match(str(tag))
+            if match is not None:
+                prefixes.add(match.group(1) if match.groups() else match.group(0))
+        return prefixes
+
+    def withoutNewest(self, itemList: list[dict], summary: dict) -> list[dict]:
+        """
+        Returns a NEW list, without the newest N items of each tag prefix group.
+        An item that is one of the newest in ANY of it's groups is taken out.
+        """
+        if self.keepNewest is None:
+            return itemList
+        keepCount = self.keepNewest[0]
+
+        groups: dict[str, list[dict]] = {}
+        for item in itemList:
+            for prefix in self._prefixes(item):
+                groups.setdefault(prefix, []).append(item)
+
+        # Items without a timestamp are the oldest
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        keep: set[int] = set()
+        # An item is in a group for each of its tag prefixes, only parse its timestamp once
+        with self.timestamps.stage():
+            for prefix, group in groups.items():
+                newest = heapq.nlargest(keepCount, group, key=lambda item: self.timestamps.of(item) or oldest)
+                DEBUG_PRINT(f"Keeping the newest {len(newest)} of {len(group)} with tag prefix '{prefix}'")
+                keep.update(id(item) for item in newest)
+
+        summary["kept_newest"] = len(keep)
+        return [item for item in itemList if id(item) not in keep]
 
 
-    # Find all/any path matches into this item
-    fieldPathList = fieldPathExpr.find(newItemList)
-    DEBUG_PRINT(f"Found {len(fieldPathList)} values at path'{fieldPathExpr}'")
-    for fieldPath in fieldPathList:
+def _includeFilter(itemList: list[dict],
+                   include: tuple[str, str],
+                   summary: dict) -> tuple[list[dict], dict]:
+    """
+    Returns a NEW list of filtered items.
+    And the origianl summary dict altered
+    """
+    newItemList, _ = _FilterPlan(include=[include], exclude=[]).filter(itemList)
 
-        fieldValue = str(fieldPath.value)
+    DEBUG_PRINT(f"Include Filter Result {len(newItemList)}")
+    summary["include_filter_result"] = len(newItemList)
+    return newItemList, summary
 
-        # If we get a value match, add to the delete index list. Only if it's not already there
-        if fieldValueRegex.match(fieldValue):
-            DEBUG_PRINT(f"Regex '{excludeRegex} matches Value '{fieldValue}'. Removing from result list")
-            rootIndex = _findRootIndex(fieldPath)
-            if rootIndex not in delItemIndexList:
-                delItemIndexList.append(rootIndex)
 
-    # Delete our found indexes. In reverse so we don't affect the index lookup in realtime
-    for i in sorted(delItemIndexList, reverse=True):
-        del newItemList[i]
+def _excludeFilter(itemList: list[dict],
+                   exclude: tuple[str, str],
+                   summary: dict) -> tuple[list[dict], dict]:
+    """
+    Run the exclude filter on the item list
+    """
+    newItemList, _ = _FilterPlan(include=[], exclude=[exclude]).filter(itemList)
 
     DEBUG_PRINT(f"Exclude Filter Result {len(newItemList)}")
     summary["exclude_filter_result"] = len(newItemList)
     return newItemList, summary
 
 
+def _sortKeys(itemList: list[dict],
+              sortBy: str,
+              sortReverse: bool) -> list[tuple[bool, Any]]:
+    """
+    Extract the sort key of every item in a single pass.
+    When there are several values at the path, the first in sorted order is used. eg: the max when reversed.
+    The key pushes Nones to the end of the sort.
+    """
+    valuesAt = _compileFieldPath(sortBy)
+    pick = max if sortReverse else min
+
+    keys = []
+    for item in itemList:
+        fieldValues = valuesAt(item)
+        fieldValue = pick(fieldValues) if fieldValues else None
+        keys.append((fieldValue is None, fieldValue))
+    return keys
+
+
 def _sortBy(itemList: list[dict],
             sortBy: str,
             sortReverse: bool,
@@ -194,34 +988,102 @@ def _sortBy(itemList: list[dict],
     """
     Run the sort by on the provided list
     """
+    keys = _sortKeys(itemList, sortBy, sortReverse)
+
+    # Sort the item indexes by their keys. A stable sort, so equal keys keep their original order
+    order = sorted(range(len(itemList)), key=keys.__getitem__, reverse=sortReverse)
 
-    fieldPathExpr = jsonpath_ng.parse(sortBy)
+    resultList = [itemList[i] for i in order]
+    return resultList, summary
 
-    newItemList: list[tuple[Any, dict]] = []  # A list of tuples. [0] is the sorting value. [1] is the item
 
-    # Build a list of tuples, with the desired field value in the [0] of the tuple
-    for item in itemList:
+def _sortTopK(itemList: list[dict],
+              sortBy: str,
+              sortReverse: bool,
+              slice: tuple[int | None, int | None]) -> Optional[list[dict]]:
+    """
+    When the slice only takes K items from the front, or the back, of the sorted list, a heap selects
+    those K items without sorting the whole list. The result is identical to a full sort and slice.
+    Returns None when the slice is not bounded, or K is too large for a heap to pay off.
+    """
+    count = len(itemList)
+    start, end = slice
+
+    if (start is None or start >= 0) and end is not None and end >= 0:
+        fromFront = True
+        k = end
+    elif start is not None and start < 0 and (end is None or end < 0):
+        fromFront = False
+        k = -start
+    else:
+        return None
 
-        fieldValues = [item.value for item in fieldPathExpr.find(item)]
-        fieldValues.sort(reverse=sortReverse)
-        fieldValue = (fieldValues or [None])[0]
-        newItemList.append((fieldValue, item))
+    if k * 4 > count:
+        return None
 
-    # Sort pushing Nones to the end
-    newItemList.sort(key=lambda x: (x[0] is None, x[0]), reverse=sortReverse)
+    keys = _sortKeys(itemList, sortBy, sortReverse)
 
-    # Now, extract the list of json values that have been sorted by the typle [0]
-    resultList = list(map(lambda x: x[1], newItemList))
-    return resultList, summary
+    # Break ties by the original index, the same way the stable full sort does.
+    # Ascending, equal keys keep their original order. Descending, they keep their original order too,
+    # which is the reverse of their order in an ascending sort.
+    if sortReverse:
+        def rank(i: int) -> tuple:
+            return (keys[i], -i)
+        first, last = heapq.nlargest, heapq.nsmallest
+    else:
+        def rank(i: int) -> tuple:
+            return (keys[i], i)
+        first, last = heapq.nsmallest, heapq.nlargest
+
+    DEBUG_PRINT(f"Selecting the {'first' if fromFront else 'last'} {k} of {count} sorted items")
+
+    if fromFront:
+        picked = first(k, range(count), key=rank)
+        return [itemList[i] for i in picked][start:end]
+
+    picked = last(k, range(count), key=rank)
+    picked.reverse()
+    return [itemList[i] for i in picked][:end]
+
+
+def _sortAndSlice(itemList: list[dict],
+                  sortBy: Optional[str],
+                  sortReverse: Optional[bool],
+                  slice: Optional[tuple[int | None, int | None]],
+                  summary: dict) -> tuple[list[dict], dict]:
+    """
+    Apply the sorting rule, then the slice, to an already filtered list.
+    """
+    summary["items_found"] = len(itemList)
+
+    if sortBy and slice:
+        with _stages.stage("sort", len(itemList)):
+            selected = _sortTopK(itemList=itemList, sortBy=sortBy, sortReverse=bool(sortReverse), slice=slice)
+        if selected is not None:
+            summary["sliced"] = len(selected)
+            return selected, summary
+
+    if sortBy:
+        with _stages.stage("sort", len(itemList)):
+            itemList, summary = _sortBy(itemList=itemList, sortBy=sortBy, sortReverse=bool(sortReverse), summary=summary)
+
+    if slice:
+        DEBUG_PRINT(f"slice with [{slice[0]}:{slice[1]}]")
+        itemList = itemList[slice[0]:slice[1]]
+        summary["sliced"] = len(itemList)
+
+    return itemList, summary
 
 
 def _filterAndSortListResponseJson(itemList: list[dict],
-                                   include: Optional[tuple[str, str]],  # path, regex
-                                   exclude: Optional[tuple[str, str]],  # path, regex
+                                   include: Optional[list[tuple[str, str]]],  # [(path, regex), ...]
+                                   exclude: Optional[list[tuple[str, str]]],  # [(path, regex), ...]
                                    sortBy: Optional[str],
                                    sortReverse: Optional[bool],
                                    slice: Optional[tuple[int | None, int | None]],
-                                   summary: dict) -> tuple[list[dict], dict]:
+                                   summary: dict,
+                                   filterMode: FILTER_MODE = FILTER_MODE.AND,
+                                   retention: Optional[_RetentionRules] = None) -> tuple[list[dict], dict]:
     """
     Take the raw string json response. This response should contain a root list of items.
     Run the include and exclude filters on it.
@@ -230,93 +1092,431 @@ def _filterAndSortListResponseJson(itemList: list[dict],
     """
     DEBUG_PRINT(f"include filter: {include}")
     DEBUG_PRINT(f"exclude filter: {exclude}")
+    DEBUG_PRINT(f"filter mode: {filterMode.value}")
     DEBUG_PRINT(f"sort by: {sortBy}")
 
-    if include:
-        itemList, summary = _includeFilter(itemList=itemList, include=include, summary=summary)
+    itemList = next(_filterPages([itemList], include=include, exclude=exclude, summary=summary, filterMode=filterMode, retention=retention))
 
-    if exclude:
-        itemList, summary = _excludeFilter(itemList=itemList, exclude=exclude, summary=summary)
+    if retention is not None:
+        with _stages.stage("keep_newest", len(itemList)):
+            itemList = retention.withoutNewest(itemList, summary)
 
-    if sortBy:
-        itemList, summary = _sortBy(itemList=itemList, sortBy=sortBy, sortReverse=bool(sortReverse), summary=summary)
+    return _sortAndSlice(itemList=itemList, sortBy=sortBy, sortReverse=sortReverse, slice=slice, summary=summary)
 
-    summary["items_found"] = len(itemList)
 
-    if slice:
-        DEBUG_PRINT(f"slice with [{slice[0]}:{slice[1]}]")
-        itemList = itemList[slice[0]:slice[1]]
-        summary["sliced"] = len(itemList)
+def _fieldKeys(path: str) -> Optional[list[str]]:
+    """
+    The keys of a simple dotted json path. eg, `metadata.container.tags[*]` is ["metadata", "container", "tags"].
+    None for any other json path.
+    """
+    match = SIMPLE_FIELD_PATH.match(path.strip())
+    if match is None:
+        return None
+    return match.group(1).split(".")
 
-    return itemList, summary
 
+class _Projection:
+    """
+    Copy only the given fields of an item into a new, much smaller, item. The nesting of each field is kept,
+    so any json path that works on the whole item still works on the projected one.
+    Only simple dotted json paths can be projected. A field inside another field is copied along with it.
+    """
+
+    def __init__(self, fields: list[str]):
+        keyLists = []
+        for field in fields:
+            keys = _fieldKeys(field)
+            if keys is None:
+                raise Exception(f"Malformed field '{field}'. Only simple dotted json paths can be projected")
+            if keys not in keyLists:
+                keyLists.append(keys)
+        self._keyLists = [keys for keys in keyLists if not any(other != keys and keys[:len(other)] == other for other in keyLists)]
+
+    def __call__(self, item: dict) -> dict:
+        projected: dict = {}
+        for keys in self._keyLists:
+            value: Any = item
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                target = projected
+                for key in keys[:-1]:
+                    target = target.setdefault(key, {})
+                target[keys[-1]] = value
+        return projected
 
-def _pagedDataFetch(ghtoken: str,
-                    urlWithoutPageParameter: str,
-                    totalFetchLimit: int,
-                    summary: dict) -> tuple[list, dict]:
+    def items(self, itemList: list[dict]) -> list[dict]:
+        return [self(item) for item in itemList]
+
+
+def _pipelineProjection(fields: Optional[list[str]],
+                        include: Optional[list[tuple[str, str]]],
+                        exclude: Optional[list[tuple[str, str]]],
+                        sortBy: Optional[str],
+                        retention: Optional[_RetentionRules]) -> Optional[_Projection]:
     """
-    given a PAT token, and a URL, without the 2 paging parameters appended,
-    attempt to load all of the data from the URL, up to our max result limit
-    if limit is -1 or None. Just do a 1 off fetch, and return the result.
-    Otherwise, provide a limit.
+    The projection applied to each page as soon as it's fetched. As well as the requested fields, it keeps the id,
+    and every field the filters, sort and retention rules read.
+    None if there are no fields, or one of those rules reads a json path that can't be projected.
     """
+    if not fields:
+        return None
 
-    DEBUG_PRINT(urlWithoutPageParameter)
-    DEBUG_PRINT(f"limit: {totalFetchLimit}")
+    needed = ["id"] + [path for path, _ in include or []] + [path for path, _ in exclude or []]
+    if sortBy:
+        needed.append(sortBy)
+    if retention is not None:
+        needed.append(retention.timestamps.field)
+        if retention.keepNewest is not None:
+            needed.append(retention.tagPath)
 
-    result: list = []
-    page = 1
+    for path in needed:
+        if _fieldKeys(path) is None:
+            DEBUG_PRINT(f"The json path '{path}' can't be projected. Keeping whole items until the output")
+            return None
 
-    while page > 0:
+    return _Projection(list(fields) + needed)
 
-        # Where to get the data
-        url = urlWithoutPageParameter
 
-        # Set the page size.  We'll keep adjusting it down to fit the desired result. but 100 is the GH imposed max
-        if totalFetchLimit > 0:
+def _projectPages(pages: Generator[list[dict], None, None],
+                  projection: Optional[_Projection]) -> Generator[list[dict], None, None]:
+    """
+    Project each page as it arrives, so the full items are dropped straight away.
+    """
+    with closing(pages):
+        for page in pages:
+            if projection is not None:
+                with _stages.stage("projection", len(page)):
+                    page = projection.items(page)
+            yield page
+
+
+def _filterPages(pages: Iterable[list[dict]],
+                 include: Optional[list[tuple[str, str]]],  # [(path, regex), ...]
+                 exclude: Optional[list[tuple[str, str]]],  # [(path, regex), ...]
+                 summary: dict,
+                 filterMode: FILTER_MODE = FILTER_MODE.AND,
+                 retention: Optional[_RetentionRules] = None) -> Iterator[list[dict]]:
+    """
+    Run all of the include and exclude filters, then the older than rule, on each page as it arrives.
+    The filter result counts in the summary are totalled across all pages.
+    """
+    ageFilter = retention is not None and retention.cutoff is not None
+    if not include and not exclude and not ageFilter:
+        yield from pages
+        return
+
+    plan = _FilterPlan(include=include or [], exclude=exclude or [], mode=filterMode)
+
+    if include:
+        summary["include_filter_result"] = 0
+    if exclude:
+        summary["exclude_filter_result"] = 0
+    if ageFilter:
+        summary["older_than_result"] = 0
+
+    for page in pages:
+        with _stages.stage("filter", len(page)):
+            page, includedCount = plan.filter(page)
+        if include:
+            summary["include_filter_result"] += includedCount
+        if exclude:
+            summary["exclude_filter_result"] += len(page)
+        if retention is not None and ageFilter:
+            with _stages.stage("older_than", len(page)):
+                page = retention.filterAge(page)
+            summary["older_than_result"] += len(page)
+        yield page
+
+
+def _filterAndSortPages(pages: Generator[list[dict], None, None],
+                        include: Optional[list[tuple[str, str]]],  # [(path, regex), ...]
+                        exclude: Optional[list[tuple[str, str]]],  # [(path, regex), ...]
+                        sortBy: Optional[str],
+                        sortReverse: Optional[bool],
+                        slice: Optional[tuple[int | None, int | None]],
+                        summary: dict,
+                        filterMode: FILTER_MODE = FILTER_MODE.AND,
+                        retention: Optional[_RetentionRules] = None) -> tuple[list[dict], dict]:
+    """
+    The streaming version of `_filterAndSortListResponseJson`.
+    Pages are filtered as they arrive, so only the items that pass the filters are held onto.
+    Without a sort, once the end of the slice has been reached, no further pages are fetched.
+    """
+    DEBUG_PRINT(f"include filter: {include}")
+    DEBUG_PRINT(f"exclude filter: {exclude}")
+    DEBUG_PRINT(f"filter mode: {filterMode.value}")
+    DEBUG_PRINT(f"sort by: {sortBy}")
+
+    # Only a slice from the front of the list can be satisfied before seeing the whole list
+    stopAt = None
+    keepsNewest = retention is not None and retention.keepNewest is not None
+    if not sortBy and not keepsNewest and slice and slice[1] is not None and slice[1] >= 0 and (slice[0] is None or slice[0] >= 0):
+        stopAt = slice[1]
+
+    itemList: list[dict] = []
+    with closing(pages):
+        for page in _filterPages(pages, include=include, exclude=exclude, summary=summary, filterMode=filterMode, retention=retention):
+            itemList.extend(page)
+            if stopAt is not None and len(itemList) >= stopAt:
+                DEBUG_PRINT(f"Slice end {stopAt} reached. Stopping the fetch early")
+                break
+
+    if retention is not None:
+        with _stages.stage("keep_newest", len(itemList)):
+            itemList = retention.withoutNewest(itemList, summary)
 
-            pageArgs = PAGING_ARGS.format(per_page=GITHUB_PER_PAGE_LIMIT, page=page)
-            url = url + pageArgs
+    return _sortAndSlice(itemList=itemList, sortBy=sortBy, sortReverse=sortReverse, slice=slice, summary=summary)
 
-        DEBUG_PRINT(url)
-        response = requests.get(url, headers=_generateRequestHeaders(ghtoken))
+
+def _fetchPage(client: GitHubClient,
+               url: str) -> tuple[list, requests.Response]:
+    """
+    Fetch a single page of list data.
+    Returns the fetched list, and the response so the caller can inspect the headers.
+    """
+    cached = client.cache.load(url) if client.cache is not None else None
+    headers = {"If-None-Match": cached["etag"]} if cached is not None else None
+
+    response = client.get(url, headers=headers)
+
+    if cached is not None and response.status_code == 304:
+        DEBUG_PRINT(f"Not Modified. Using the cached page for {url}")
+        assert client.cache is not None
+        client.cache.touch(url)
+        client.cache.count(hit=True)
+        fetched: list = cached["body"]
+        # A 304 does not always repeat the paging links
+        if cached["link"] and "Link" not in response.headers:
+            response.headers["Link"] = cached["link"]
+    else:
         response.raise_for_status()
-        fetched: list = response.json()
+        start = time.perf_counter()
+        fetched = response.json()
+        _stages.add("json_decode", time.perf_counter() - start, len(fetched))
+        if client.cache is not None:
+            client.cache.count(hit=False)
+            etag = response.headers.get("ETag")
+            if etag:
+                client.cache.store(url, etag, response.headers.get("Link"), fetched)
+
+    assert type(fetched) is list, f"Fetched Content must be a list. Received {fetched.__class__}"
 
-        assert type(fetched) is list, f"Fetched Content must be a list. Received {fetched.__class__}"
+    if urllib.parse.urlparse(url).path.endswith("/versions"):
+        client.countVersionPage()
 
-        fetchCount = len(fetched)
-        DEBUG_PRINT(f"Fetched {fetchCount} total items")
+    DEBUG_PRINT(f"Fetched {len(fetched)} total items")
+    return fetched, response
 
-        # Add to our return list
-        result = result + fetched
 
-        # Stop if there are no more items to fetch. Or if we have a -1 limit for a single fetch
-        if totalFetchLimit < 0 or len(fetched) == 0 or len(fetched) < GITHUB_PER_PAGE_LIMIT:
-            break
+def _lastPageNumber(response: requests.Response) -> Optional[int]:
+    """
+    Find the total page count from the `Link: <...>; rel="last"` header of a paged response.
+    None if there is no last page link. eg, this is the only page.
+    """
+    last = response.links.get("last")
+    if last is None:
+        return None
+    pageArgs = urllib.parse.parse_qs(urllib.parse.urlparse(last["url"]).query).get("page")
+    if not pageArgs:
+        return None
+    return int(pageArgs[0])
+
 
-        # Next Page
-        page += 1
+def _pagedDataGenerator(client: GitHubClient,
+                        urlWithoutPageParameter: str,
+                        totalFetchLimit: int,
+                        summary: dict,
+                        workers: int = 1) -> Generator[list, None, None]:
+    """
+    given a client, and a URL, without the 2 paging parameters appended,
+    yield each page of data from the URL as it arrives, up to our max result limit.
+    if limit is -1 or None. Just do a 1 off fetch, and yield the result.
+    With more than 1 worker, the first page tells us how many pages there are, and up to
+    `workers` of the following pages are kept in flight at once. Pages are still yielded in order.
+    Closing the generator early stops any further pages from being requested.
+    """
 
-    # Trim our result incase we exceed our limit
-    result = result[:totalFetchLimit]
-    summary["items_fetched"] = len(result)
+    DEBUG_PRINT(urlWithoutPageParameter)
+    DEBUG_PRINT(f"limit: {totalFetchLimit}")
+
+    summary["items_fetched"] = 0
+
+    # A single 1 off fetch
+    if totalFetchLimit < 0:
+        fetched, _ = _fetchPage(client, urlWithoutPageParameter)
+        summary["items_fetched"] = len(fetched)
+        yield fetched
+        return
+
+    def pageUrl(page: int) -> str:
+        return urlWithoutPageParameter + PAGING_ARGS.format(per_page=GITHUB_PER_PAGE_LIMIT, page=page)
+
+    def trimmed(fetched: list) -> list:
+        """ Trim the page incase we exceed our limit """
+        fetched = fetched[:totalFetchLimit - summary["items_fetched"]]
+        summary["items_fetched"] += len(fetched)
+        return fetched
+
+    # Never fetch more pages than it takes to reach our limit
+    pageLimit = -(-totalFetchLimit // GITHUB_PER_PAGE_LIMIT)
+
+    fetched, response = _fetchPage(client, pageUrl(1))
+    lastPage = _lastPageNumber(response)
+    yield trimmed(fetched)
+
+    if workers > 1 and lastPage is not None:
+
+        lastPage = min(lastPage, pageLimit)
+        DEBUG_PRINT(f"Fetching pages 2 to {lastPage} with {workers} workers")
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        inFlight: deque[Future] = deque()
+        nextPage = 2
+        try:
+            while nextPage <= lastPage or inFlight:
+                # Keep the pool busy, but never run more than `workers` pages ahead of the consumer
+                while nextPage <= lastPage and len(inFlight) < workers:
+                    inFlight.append(executor.submit(_fetchPage, client, pageUrl(nextPage)))
+                    nextPage += 1
+                fetched, _ = inFlight.popleft().result()
+                yield trimmed(fetched)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    else:
+
+        page = 1
+        # Stop if there are no more items to fetch, or we have reached our limit
+        while len(fetched) == GITHUB_PER_PAGE_LIMIT and page < pageLimit:
+            page += 1
+            fetched, _ = _fetchPage(client, pageUrl(page))
+            yield trimmed(fetched)
+
+
+def _indexedPagedDataGenerator(client: GitHubClient,
+                               urlWithoutPageParameter: str,
+                               totalFetchLimit: int,
+                               summary: dict,
+                               workers: int = 1) -> Generator[list, None, None]:
+    """
+    The same pages as `_pagedDataGenerator`, but synced against the client's version index first.
+    Only the newest pages are fetched, until one of them holds a version id the index already knows.
+    Without a usable snapshot, with one cut short by a smaller fetch limit than this one, or when the merged snapshot
+    no longer adds up to the page count GitHub reports, every page is fetched and the snapshot is replaced.
+    """
+    index = client.index
+    assert index is not None, "A version index is required"
+
+    def pageUrl(page: int) -> str:
+        return urlWithoutPageParameter + PAGING_ARGS.format(per_page=GITHUB_PER_PAGE_LIMIT, page=page)
+
+    def fullSync() -> list[dict]:
+        versions: list[dict] = []
+        for fetched in _pagedDataGenerator(client, urlWithoutPageParameter, totalFetchLimit, summary, workers=workers):
+            versions.extend(fetched)
+        index.store(urlWithoutPageParameter, versions, complete=len(versions) < totalFetchLimit)
+        summary["index"] = {"sync": "full", "pages_fetched": -(-len(versions) // GITHUB_PER_PAGE_LIMIT), "versions": len(versions)}
+        return versions
+
+    snapshot = index.load(urlWithoutPageParameter)
+    if snapshot is not None and not snapshot["complete"] and totalFetchLimit > len(snapshot["versions"]):
+        # A snapshot cut short by a smaller fetch limit is missing the older versions we now want
+        DEBUG_PRINT(f"Version index for {urlWithoutPageParameter} stops at {len(snapshot['versions'])} versions. Fetching up to {totalFetchLimit}")
+        snapshot = None
+    if snapshot is None:
+        DEBUG_PRINT(f"No usable version index for {urlWithoutPageParameter}")
+        versions = fullSync()
+    else:
+        stored: list[dict] = snapshot["versions"]
+        known = {version.get("id"): position for position, version in enumerate(stored)}
+        fetchedVersions: list[dict] = []
+        page = 0
+        lastPage = 1
+        lastKnown = None
+        while lastKnown is None:
+            page += 1
+            fetched, response = _fetchPage(client, pageUrl(page))
+            if page == 1:
+                lastPage = _lastPageNumber(response) or 1
+            fetchedVersions.extend(fetched)
+            positions = [known[item.get("id")] for item in fetched if item.get("id") in known]
+            if positions:
+                lastKnown = max(positions)
+            if len(fetched) < GITHUB_PER_PAGE_LIMIT or page >= lastPage or len(fetchedVersions) >= totalFetchLimit:
+                break
+
+        complete = snapshot["complete"]
+        if lastKnown is None:
+            # We reached the end of the history, or our limit, without meeting a known version. Everything is new.
+            dropped = len(stored)
+            versions = fetchedVersions
+            complete = len(fetchedVersions) < totalFetchLimit
+        else:
+            fetchedIds = set(item.get("id") for item in fetchedVersions)
+            dropped = len([version for version in stored[:lastKnown + 1] if version.get("id") not in fetchedIds])
+            versions = fetchedVersions + [version for version in stored[lastKnown + 1:] if version.get("id") not in fetchedIds]
+
+        DEBUG_PRINT(f"Version index synced from {page} page(s). {len(versions)} versions, {dropped} dropped")
+        if complete and max(-(-len(versions) // GITHUB_PER_PAGE_LIMIT), 1) != lastPage:
+            DEBUG_PRINT(f"Version index has {len(versions)} versions, but GitHub reports {lastPage} pages. Fetching them all")
+            versions = fullSync()
+        else:
+            index.store(urlWithoutPageParameter, versions, complete=complete)
+            summary["index"] = {"sync": "incremental", "pages_fetched": page, "versions": len(versions),
+                                "added": len(versions) - len(stored) + dropped, "dropped": dropped}
+
+    versions = versions[:totalFetchLimit]
+    summary["items_fetched"] = len(versions)
+    for start in range(0, len(versions), GITHUB_PER_PAGE_LIMIT):
+        yield versions[start:start + GITHUB_PER_PAGE_LIMIT]
+
+
+def _versionPagesGenerator(client: GitHubClient,
+                           urlWithoutPageParameter: str,
+                           totalFetchLimit: int,
+                           summary: dict,
+                           workers: int = 1) -> Generator[list, None, None]:
+    """
+    The pages of a package version list. From the version index when the client has one.
+    """
+    if client.index is not None and totalFetchLimit >= 0:
+        return _indexedPagedDataGenerator(client, urlWithoutPageParameter, totalFetchLimit, summary, workers=workers)
+    return _pagedDataGenerator(client, urlWithoutPageParameter, totalFetchLimit, summary, workers=workers)
+
+
+def _pagedDataFetch(client: GitHubClient,
+                    urlWithoutPageParameter: str,
+                    totalFetchLimit: int,
+                    summary: dict,
+                    workers: int = 1) -> tuple[list, dict]:
+    """
+    Fetch all of the pages from `_pagedDataGenerator` into a single list.
+    """
+    result: list = []
+    for fetched in _pagedDataGenerator(client, urlWithoutPageParameter, totalFetchLimit, summary, workers=workers):
+        result.extend(fetched)
 
     return result, summary
 
 
 def _listPackages(summary: dict,
-                  ghtoken: str,
+                  client: GitHubClient,
                   org: Optional[str],
                   user: Optional[str],
                   packageType: str,
                   fetchLimit: int,
-                  include: Optional[tuple[str, str]],
-                  exclude: Optional[tuple[str, str]],
+                  fetchWorkers: int,
+                  include: Optional[list[tuple[str, str]]],
+                  exclude: Optional[list[tuple[str, str]]],
                   sortBy: Optional[str],
                   sortReverse: Optional[bool],
-                  slice: Optional[tuple[int | None, int | None]]) -> tuple[list[dict], dict]:
+                  slice: Optional[tuple[int | None, int | None]],
+                  filterMode: FILTER_MODE = FILTER_MODE.AND,
+                  retention: Optional[_RetentionRules] = None,
+                  fields: Optional[list[str]] = None) -> tuple[list[dict], dict]:
     """
     Get the list of packages, and return the json response
     """
@@ -328,25 +1528,30 @@ def _listPackages(summary: dict,
         url = LIST_PACKAGES_FOR_USER.format(user=user, package_type=packageType)
     assert url is not None, "Failed to generate a valid API url"
 
-    packageList, summary = _pagedDataFetch(ghtoken, url, fetchLimit, summary)
-    assert type(packageList) is list
-    packageList, summary = _filterAndSortListResponseJson(itemList=packageList, include=include, exclude=exclude, sortBy=sortBy, sortReverse=sortReverse, slice=slice, summary=summary)
+    pages = _pagedDataGenerator(client, url, fetchLimit, summary, workers=fetchWorkers)
+    pages = _projectPages(pages, _pipelineProjection(fields, include, exclude, sortBy, retention))
+    packageList, summary = _filterAndSortPages(pages=pages, include=include, exclude=exclude, filterMode=filterMode, retention=retention,
+                                               sortBy=sortBy, sortReverse=sortReverse, slice=slice, summary=summary)
 
     return packageList, summary
 
 
 def _listPackageVersions(summary: dict,
-                         ghtoken: str,
+                         client: GitHubClient,
                          org: Optional[str],
                          user: Optional[str],
                          packageType: str,
                          packageName: str,
                          fetchLimit: int,
-                         include: Optional[tuple[str, str]],
-                         exclude: Optional[tuple[str, str]],
+                         fetchWorkers: int,
+                         include: Optional[list[tuple[str, str]]],
+                         exclude: Optional[list[tuple[str, str]]],
                          sortBy: Optional[str],
                          sortReverse: Optional[bool],
-                         slice: Optional[tuple[int | None, int | None]]) -> tuple[list[dict], dict]:
+                         slice: Optional[tuple[int | None, int | None]],
+                         filterMode: FILTER_MODE = FILTER_MODE.AND,
+                         retention: Optional[_RetentionRules] = None,
+                         fields: Optional[list[str]] = None) -> tuple[list[dict], dict]:
     """
     Get the list of package versions for the specific package
     """
@@ -359,63 +1564,947 @@ def _listPackageVersions(summary: dict,
         url = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type=packageType, package_name=packageName)
     assert url is not None, "Failed to generate a valid API url"
 
-    versionList, summary = _pagedDataFetch(ghtoken, url, fetchLimit, summary)
-    assert type(versionList) is list, f"fetched data returned an unexpected type [{type(versionList)}]"
-    versionList, summary = _filterAndSortListResponseJson(itemList=versionList, include=include, exclude=exclude, sortBy=sortBy, sortReverse=sortReverse, slice=slice, summary=summary)
+    pages = _versionPagesGenerator(client, url, fetchLimit, summary, workers=fetchWorkers)
+    pages = _projectPages(pages, _pipelineProjection(fields, include, exclude, sortBy, retention))
+    versionList, summary = _filterAndSortPages(pages=pages, include=include, exclude=exclude, filterMode=filterMode, retention=retention,
+                                               sortBy=sortBy, sortReverse=sortReverse, slice=slice, summary=summary)
 
     return versionList, summary
 
 
+def _inventoryPackage(client: GitHubClient,
+                      org: Optional[str],
+                      user: Optional[str],
+                      package: dict,
+                      fetchLimit: int,
+                      fetchWorkers: int,
+                      ageField: str) -> dict:
+    """
+    Count the versions of a single package as the pages stream in. The versions themselves are not kept.
+    Container packages also get a count of their untagged versions.
+    """
+    packageType = package["package_type"]
+    packageName = package["name"]
+    report: dict = {"package_type": packageType, "name": packageName}
+
+    url = None
+    if org:
+        url = LIST_PACKAGE_VERSIONS_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName)
+    if user:
+        url = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type=packageType, package_name=packageName)
+    assert url is not None, "Failed to generate a valid API url"
+
+    timestamps = _Timestamps(ageField)
+    tagsAt = _compileFieldPath(CONTAINER_TAGS_PATH) if packageType == "container" else None
+    versions = 0
+    untagged = 0
+    oldest: Optional[tuple[datetime, dict]] = None
+    newest: Optional[tuple[datetime, dict]] = None
+
+    for page in _versionPagesGenerator(client, url, fetchLimit, {}, workers=fetchWorkers):
+        versions += len(page)
+        for item in page:
+            if tagsAt is not None and not tagsAt(item):
+                untagged += 1
+            at = timestamps.of(item)
+            if at is None:
+                continue
+            if oldest is None or at < oldest[0]:
+                oldest = (at, item)
+            if newest is None or at > newest[0]:
+                newest = (at, item)
+
+    def version(found: Optional[tuple[datetime, dict]]) -> Optional[dict]:
+        if found is None:
+            return None
+        return {"id": found[1].get("id"), "name": found[1].get("name"), ageField: found[0].isoformat()}
+
+    report["versions"] = versions
+    report["untagged"] = untagged if tagsAt is not None else None
+    report["oldest"] = version(oldest)
+    report["newest"] = version(newest)
+    report["truncated"] = versions >= fetchLimit
+    return report
+
+
+def _listPackagesOfTypes(client: GitHubClient,
+                         org: Optional[str],
+                         user: Optional[str],
+                         packageTypes: list[str],
+                         fetchLimit: int,
+                         fetchWorkers: int) -> tuple[list[dict], dict[str, dict]]:
+    """
+    List the packages of every given type at the same time. Each package is given it's `package_type`, if it did not already have one.
+    Returns the packages, and a summary of the package count of each type. A failure listing one type does not stop the others.
+    """
+
+    def listType(packageType: str) -> tuple[list[dict], dict]:
+        typeSummary: dict = {}
+        try:
+            return _listPackages(summary=typeSummary, client=client, org=org, user=user, packageType=packageType,
+                                 fetchLimit=fetchLimit, fetchWorkers=fetchWorkers,
+                                 include=None, exclude=None, sortBy=None, sortReverse=None, slice=None)
+        except Exception as e:
+            INFO_PRINT(f"Package type {packageType} failed [{e}]")
+            typeSummary["error"] = str(e)
+            return [], typeSummary
+
+    packages: list[dict] = []
+    typeSummaries: dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=len(packageTypes)) as executor:
+        for packageType, (packageList, typeSummary) in zip(packageTypes, executor.map(listType, packageTypes)):
+            typeSummaries[packageType] = {"packages": len(packageList)}
+            if "error" in typeSummary:
+                typeSummaries[packageType]["error"] = typeSummary["error"]
+            packages += [{**package, "package_type": package.get("package_type", packageType)} for package in packageList]
+
+    return packages, typeSummaries
+
+
+def _inventory(summary: dict,
+               client: GitHubClient,
+               org: Optional[str],
+               user: Optional[str],
+               packageTypes: list[str],
+               fetchLimit: int,
+               fetchWorkers: int,
+               ageField: str = "updated_at",
+               workers: int = 1) -> tuple[list[dict], dict]:
+    """
+    A report of every package of every given type. All of the package types are listed at the same time,
+    then the versions of up to `workers` packages are counted at the same time.
+    Returns one report per package, with it's version count, untagged count, and oldest and newest version.
+    A failure listing one type or package does not stop the others.
+    """
+    assert bool(org) != bool(user)
+    assert workers >= 1, "Inventory workers must be at least 1"
+
+    packages, typeSummaries = _listPackagesOfTypes(client=client, org=org, user=user, packageTypes=packageTypes,
+                                                   fetchLimit=fetchLimit, fetchWorkers=fetchWorkers)
+
+    INFO_PRINT(f"Inventory of {len(packages)} package(s)")
+
+    def inventoryPackage(package: dict) -> dict:
+        try:
+            return _inventoryPackage(client=client, org=org, user=user, package=package,
+                                     fetchLimit=fetchLimit, fetchWorkers=fetchWorkers, ageField=ageField)
+        except Exception as e:
+            INFO_PRINT(f"Package {package['name']} failed [{e}]")
+            return {"package_type": package["package_type"], "name": package["name"], "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(inventoryPackage, packages))
+
+    for report in reports:
+        if "error" in report:
+            continue
+        typeSummary = typeSummaries[report["package_type"]]
+        typeSummary["versions"] = typeSummary.get("versions", 0) + report["versions"]
+        if report["untagged"] is not None:
+            typeSummary["untagged"] = typeSummary.get("untagged", 0) + report["untagged"]
+
+    summary["package_types"] = typeSummaries
+    summary["packages"] = len(reports)
+    summary["versions"] = sum(r.get("versions", 0) for r in reports)
+    summary["untagged"] = sum(r.get("untagged") or 0 for r in reports)
+    summary["packages_failed"] = len([r for r in reports if "error" in r]) + len([s for s in typeSummaries.values() if "error" in s])
+
+    return reports, summary
+
+
+def _sqlTimestamp(value: Any) -> Any:
+    """
+    A github timestamp as `YYYY-MM-DD HH:MM:SS` in UTC. Anything that is not a timestamp is kept as it is.
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        at = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc)
+    return at.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _query(summary: dict,
+           client: GitHubClient,
+           org: Optional[str],
+           user: Optional[str],
+           packageTypes: list[str],
+           sql: str,
+           fetchLimit: int,
+           fetchWorkers: int,
+           packageNameRegex: Optional[str] = None,
+           databasePath: str = ":memory:",
+           workers: int = 1) -> tuple[list[dict], dict]:
+    """
+    Load every package of every given type, and all of their versions, into an sqlite database, then run a single sql query over it.
+    The versions of up to `workers` packages are fetched at the same time, and written to the database as each package completes.
+    A database file is rebuilt from scratch each run, and kept afterwards to be queried again with any sqlite tool.
+    The query is run read only. Returns one dict per row of the query result, keyed by column name.
+    A failure listing one type or package does not stop the others.
+    """
+    import sqlite3
+
+    assert bool(org) != bool(user)
+    assert workers >= 1, "Query workers must be at least 1"
+    assert sql, "A sql query is required"
+
+    nameRegex = None
+    if packageNameRegex:
+        try:
+            nameRegex = re.compile(packageNameRegex)
+        except Exception:
+            raise Exception(f"Malformed regex in package name regex '{packageNameRegex}'. See above exception.")
+
+    packages, typeSummaries = _listPackagesOfTypes(client=client, org=org, user=user, packageTypes=packageTypes,
+                                                   fetchLimit=fetchLimit, fetchWorkers=fetchWorkers)
+    if nameRegex is not None:
+        packages = [package for package in packages if nameRegex.match(package["name"])]
+
+    INFO_PRINT(f"Loading {len(packages)} package(s) into {databasePath}")
+
+    tagsAt = _compileFieldPath(CONTAINER_TAGS_PATH)
+
+    def fetchVersions(package: dict) -> tuple[list[tuple], list[tuple], Optional[str]]:
+        packageType = package["package_type"]
+        packageName = package["name"]
+        url = None
+        if org:
+            url = LIST_PACKAGE_VERSIONS_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName)
+        if user:
+            url = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type=packageType, package_name=packageName)
+        assert url is not None, "Failed to generate a valid API url"
+
+        versionRows: list[tuple] = []
+        tagRows: list[tuple] = []
+        try:
+            for page in _versionPagesGenerator(client, url, fetchLimit, {}, workers=fetchWorkers):
+                for item in page:
+                    tags = [tag for tag in tagsAt(item) if isinstance(tag, str)]
+                    versionRows.append((item.get("id"), packageType, packageName, item.get("name"), len(tags),
+                                        _sqlTimestamp(item.get("created_at")), _sqlTimestamp(item.get("updated_at")), json.dumps(item)))
+                    tagRows += [(item.get("id"), tag) for tag in tags]
+        except Exception as e:
+            INFO_PRINT(f"Package {packageName} failed [{e}]")
+            return [], [], str(e)
+        return versionRows, tagRows, None
+
+    db = sqlite3.connect(databasePath)
+    try:
+        with _stages.stage("sqlite_load"):
+            # Nothing here needs to survive a crash. The whole database is rebuilt on the next run.
+            db.execute("PRAGMA journal_mode = OFF")
+            db.execute("PRAGMA synchronous = OFF")
+            db.executescript(QUERY_SCHEMA)
+            db.executemany("INSERT OR REPLACE INTO packages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           [(package.get("id"), package["package_type"], package["name"], package.get("visibility"), package.get("version_count"),
+                             _sqlTimestamp(package.get("created_at")), _sqlTimestamp(package.get("updated_at")), json.dumps(package))
+                            for package in packages])
+
+            failed: dict[str, str] = {}
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for package, (versionRows, tagRows, error) in zip(packages, executor.map(fetchVersions, packages)):
+                    if error is not None:
+                        failed[f"{package['package_type']}/{package['name']}"] = error
+                    db.executemany("INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", versionRows)
+                    db.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)", tagRows)
+            versions = db.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+            tags = db.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+
+            db.executescript(QUERY_INDEXES)
+            db.execute("ANALYZE")
+            db.commit()
+
+        with _stages.stage("query"):
+            db.execute("PRAGMA query_only = ON")
+            try:
+                cursor = db.execute(sql)
+                columns = [column[0] for column in cursor.description or []]
+                rows = [dict(zip(columns, row)) for row in cursor]
+            except sqlite3.Error:
+                raise Exception(f"Malformed sql query '{sql}'. See above exception.")
+    finally:
+        db.close()
+
+    summary["package_types"] = typeSummaries
+    summary["packages"] = len(packages)
+    summary["versions"] = versions
+    summary["tags"] = tags
+    summary["rows"] = len(rows)
+    summary["packages_failed"] = len(failed) + len([s for s in typeSummaries.values() if "error" in s])
+    if failed:
+        summary["package_errors"] = failed
+
+    return rows, summary
+
+
+def _rateLimitWaitSeconds(response: requests.Response) -> Optional[float]:
+    """
+    Inspect a response for GitHub primary or secondary rate limit signals.
+    Returns the number of seconds to wait before trying again, or None if this response was not rate limited.
+    """
+    if response.status_code not in [403, 429]:
+        return None
+
+    retryAfter = response.headers.get("Retry-After")
+    if retryAfter is not None:
+        return float(retryAfter)
+
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = float(response.headers.get("X-RateLimit-Reset", time.time()))
+        return max(reset - time.time(), 1)
+
+    if response.status_code == 429 or "secondary rate limit" in response.text.lower():
+        return SECONDARY_RATE_LIMIT_WAIT_SECONDS
+
+    # A plain 403 is a permissions problem, not a rate limit
+    return None
+
+
+class DeleteJournal:
+    """
+    An append-only json lines file of the package versions planned for deletion, and the outcome of each delete.
+    If a long delete run dies partway through, a resumed run reads back the planned versions that were not
+    yet deleted, and retries only those. No need to list and filter the package versions again.
+    """
+
+    def __init__(self, journalPath: str):
+        self.journalPath = journalPath
+        self._lock = threading.Lock()
+
+    def _append(self, records: list[dict]):
+        with self._lock, open(self.journalPath, "a") as fh:
+            for record in records:
+                fh.write(json.dumps(record) + "\n")
+            fh.flush()
+
+    def planned(self, packageName: str, ids: list[Any]):
+        self._append([{"event": "planned", "package": packageName, "id": id} for id in ids])
+
+    def completed(self, packageName: str, id: Any, outcome: str):
+        event = "deleted" if outcome.startswith("ok") else "failed"
+        self._append([{"event": event, "package": packageName, "id": id, "outcome": outcome}])
+
+    def unfinished(self, packageName: str) -> list[Any]:
+        """
+        The ids planned for this package, that have not been deleted yet. In their planned order.
+        """
+        planned: dict[Any, None] = {}
+        deleted = set()
+        if not os.path.exists(self.journalPath):
+            return []
+        with open(self.journalPath) as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line can be cut short, if the run was killed while writing it
+                    continue
+                if record.get("package") != packageName:
+                    continue
+                if record.get("event") == "planned":
+                    planned[record["id"]] = None
+                elif record.get("event") == "deleted":
+                    deleted.add(record["id"])
+        return [id for id in planned if id not in deleted]
+
+
+def _deletePackageVersion(client: GitHubClient,
+                          url: str,
+                          goneIsDone: bool = False) -> str:
+    """
+    Delete a single package version. The client paces the delete, and retries it while we are being rate limited.
+    Never raises, instead returns the outcome of this delete as a short string.
+    With `goneIsDone`, a version that is already gone counts as deleted. A killed run often leaves deletes that
+    completed on the server, but never made it into the journal.
+    """
+    try:
+        response = client.delete(url)
+        if response.status_code == 204:
+            return "ok"
+        if response.status_code == 404 and goneIsDone:
+            return "ok [gone]"
+        return f"fail [{response.status_code}]"
+
+    except Exception as e:
+        return f"error [{e}]"
+
+
 def _deletePackageVersions(summary: dict,
                            itemList: list[dict],
-                           ghtoken: str,
+                           client: GitHubClient,
                            org: Optional[str],
                            user: Optional[str],
                            packageType: str,
                            packageName: str,
-                           dryrun: bool) -> tuple[list[dict], dict]:
+                           dryrun: bool,
+                           workers: int = 1,
+                           journal: Optional[DeleteJournal] = None,
+                           resuming: bool = False) -> tuple[list[dict], dict]:
     """
     Delete the packages identified by the provided item list.
+    Deletes are run across a pool of `workers` threads. A failed delete does not stop the others,
+    the outcome of each id is reported in the summary.
+    With a journal, the planned ids and the outcome of each delete are recorded as we go.
+    When `resuming` a journal, a version that is already gone is reported as `ok [gone]` rather than a failure.
     """
 
     assert bool(org) != bool(user)
-    url = None
+    assert workers >= 1, "Delete workers must be at least 1"
+
+    # Nothing is sent with a dryrun, so there is nothing to report item by item
+    if dryrun:
+        planned = {str(item["id"]): "ok[dryrun]" for item in itemList if item["id"] is not None}
+        INFO_PRINT(f"Dryrun. {len(planned)} of {len(itemList)} package version(s) would be deleted from {packageName}")
+        summary['deleted'] = len(planned)
+        summary['delete_failed'] = 0
+        summary['delete_results'] = planned
+        return itemList, summary
 
     INFO_PRINT(f"Deleting {len(itemList)} package version(s)")
 
-    deleteCount = 0
-    for index, item in enumerate(itemList):
-        id = item["id"]
-        if id is not None:
-            deleteCount += 1
-            INFO_PRINT(f"Deleting [{index+1}/{len(itemList)}] - id:{id}")
-
-            if org:
-                url = DELETE_PACKAGE_VERSION_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName, package_version_id=id)
-            if user:
-                url = DELETE_PACKAGE_VERSION_FOR_USER.format(user=user, package_type=packageType, package_name=packageName, package_version_id=id)
-
-            assert url is not None, "Failed to generate a valid API url"
-
-            DEBUG_PRINT(url)
-            if not dryrun:
-                response = requests.delete(url, headers=_generateRequestHeaders(ghtoken))
-                response.raise_for_status()
-                if response.status_code == 204:
-                    INFO_PRINT("Ok")
-                else:
-                    INFO_PRINT(f"Fail [{response.status_code}]")
-            else:
-                INFO_PRINT("Ok[dryrun]")
+    results: dict[str, str] = {}
+    total = len(itemList)
 
-        else:
-            INFO_PRINT(f"Skipping {index+1} of {len(itemList)} id not found")
+    if journal is not None:
+        journal.planned(packageName, [item["id"] for item in itemList if item["id"] is not None])
 
-    summary['deleted'] = len(itemList)
+    def deleteItem(index: int, item: dict):
+        id = item["id"]
+        if id is None:
+            INFO_PRINT(f"Skipping {index+1} of {total} id not found")
+            return
+
+        url = None
+        if org:
+            url = DELETE_PACKAGE_VERSION_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName, package_version_id=id)
+        if user:
+            url = DELETE_PACKAGE_VERSION_FOR_USER.format(user=user, package_type=packageType, package_name=packageName, package_version_id=id)
+        assert url is not None, "Failed to generate a valid API url"
+
+        outcome = _deletePackageVersion(client, url, goneIsDone=resuming)
+        if journal is not None:
+            journal.completed(packageName, id, outcome)
+
+        results[str(id)] = outcome
+        INFO_PRINT(f"Deleting [{index+1}/{total}] - {packageName} id:{id} {outcome}")
+
+    with _stages.stage("delete", total), ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(deleteItem, index, item) for index, item in enumerate(itemList)]
+        for future in futures:
+            future.result()
+
+    failed = {id: outcome for id, outcome in results.items() if not outcome.startswith("ok")}
+
+    if client.index is not None:
+        listUrl = None
+        if org:
+            listUrl = LIST_PACKAGE_VERSIONS_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName)
+        if user:
+            listUrl = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type=packageType, package_name=packageName)
+        assert listUrl is not None, "Failed to generate a valid API url"
+        client.index.remove(listUrl, [item["id"] for item in itemList if str(item["id"]) in results and str(item["id"]) not in failed])
+
+    summary['deleted'] = len(results) - len(failed)
+    summary['delete_failed'] = len(failed)
+    summary['delete_results'] = results
 
     return itemList, summary
 
 
+def _executionPlan(client: GitHubClient,
+                   deleteCalls: int,
+                   workers: int,
+                   now: Optional[float] = None) -> dict:
+    """
+    What a real run of a dryrun would cost. The version list pages it took to find the versions, the DELETE calls it needs,
+    the primary rate limit budget left on the token, and a rough wall-clock estimate at the given concurrency.
+    The estimate uses the average time of the requests sent so far, and is never faster than the secondary rate limit
+    allows. If the deletes need more than the remaining primary budget, the wait for each reset is added on.
+    """
+    now = time.time() if now is None else now
+    calls = sum(client.calls.values())
+    secondsPerCall = sum(client.callSeconds.values()) / calls if calls else ESTIMATED_SECONDS_PER_CALL
+
+    deleteSeconds = max(-(-deleteCalls // max(workers, 1)) * secondsPerCall,
+                        deleteCalls * DELETE_POINTS * 60 / SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE)
+
+    waitSeconds = 0.0
+    rateLimit = client.rateLimit
+    if rateLimit is not None and deleteCalls > rateLimit["remaining"]:
+        resets = -(-(deleteCalls - rateLimit["remaining"]) // max(rateLimit["limit"], 1))
+        waitSeconds = max(rateLimit["reset"] - now, 0) + (resets - 1) * 3600
+
+    return {
+        "list_pages_fetched": client.versionPages,
+        "delete_calls": deleteCalls,
+        "workers": workers,
+        "rate_limit": rateLimit,
+        "fits_rate_limit": rateLimit is None or deleteCalls <= rateLimit["remaining"],
+        "seconds_per_call": round(secondsPerCall, 3),
+        "estimated_seconds": round(deleteSeconds + waitSeconds, 1)
+    }
+
+
+def _batchDeletePackageVersions(summary: dict,
+                                client: GitHubClient,
+                                org: Optional[str],
+                                user: Optional[str],
+                                packageType: str,
+                                packageNames: Optional[list[str]],
+                                packageNameRegex: Optional[str],
+                                fetchLimit: int,
+                                fetchWorkers: int,
+                                include: Optional[list[tuple[str, str]]],
+                                exclude: Optional[list[tuple[str, str]]],
+                                sortBy: Optional[str],
+                                sortReverse: Optional[bool],
+                                slice: Optional[tuple[int | None, int | None]],
+                                dryrun: bool,
+                                filterMode: FILTER_MODE = FILTER_MODE.AND,
+                                retention: Optional[_RetentionRules] = None,
+                                deleteWorkers: int = 1,
+                                batchWorkers: int = 1,
+                                journal: Optional[DeleteJournal] = None,
+                                fields: Optional[list[str]] = None) -> tuple[dict[str, list[dict]], dict]:
+    """
+    Run the list versions, filter, sort, slice and delete pipeline on many packages at once.
+    The packages are either the given list of names, or every package whose name matches the regex.
+    Up to `batchWorkers` packages are processed at the same time, all sharing the one client.
+    A failure in one package does not stop the others.
+    Returns the deleted versions, and the summary of each package, by package name.
+    """
+    assert bool(packageNames) != bool(packageNameRegex), "Provide one of a list of package names, or a package name regex"
+    assert batchWorkers >= 1, "Batch workers must be at least 1"
+
+    if packageNameRegex:
+        try:
+            nameRegex = re.compile(packageNameRegex)
+        except Exception:
+            raise Exception(f"Malformed regex in package name regex '{packageNameRegex}'. See above exception.")
+        packageList, _ = _listPackages(summary={}, client=client, org=org, user=user, packageType=packageType,
+                                       fetchLimit=fetchLimit, fetchWorkers=fetchWorkers,
+                                       include=None, exclude=None, sortBy=None, sortReverse=None, slice=None)
+        packageNames = [package["name"] for package in packageList if nameRegex.match(package["name"])]
+
+    assert packageNames is not None
+    INFO_PRINT(f"Batch of {len(packageNames)} package(s)")
+
+    def processPackage(packageName: str) -> tuple[list[dict], dict]:
+        packageSummary: dict = {}
+        try:
+            versionList, packageSummary = _listPackageVersions(summary=packageSummary, client=client, org=org, user=user,
+                                                               packageType=packageType, packageName=packageName,
+                                                               fetchLimit=fetchLimit, fetchWorkers=fetchWorkers,
+                                                               include=include, exclude=exclude, sortBy=sortBy,
+                                                               sortReverse=sortReverse, slice=slice, filterMode=filterMode,
+                                                               retention=retention, fields=fields)
+            return _deletePackageVersions(summary=packageSummary, itemList=versionList, client=client, org=org, user=user,
+                                          packageType=packageType, packageName=packageName, dryrun=dryrun, workers=deleteWorkers,
+                                          journal=journal)
+        except Exception as e:
+            INFO_PRINT(f"Package {packageName} failed [{e}]")
+            packageSummary["error"] = str(e)
+            return [], packageSummary
+
+    result: dict[str, list[dict]] = {}
+    packageSummaries: dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=batchWorkers) as executor:
+        for packageName, (deletedList, packageSummary) in zip(packageNames, executor.map(processPackage, packageNames)):
+            result[packageName] = deletedList
+            packageSummaries[packageName] = packageSummary
+
+    summary["packages"] = packageSummaries
+    summary["deleted"] = sum(s.get("deleted", 0) for s in packageSummaries.values())
+    summary["delete_failed"] = sum(s.get("delete_failed", 0) for s in packageSummaries.values())
+    summary["packages_failed"] = len([s for s in packageSummaries.values() if "error" in s])
+
+    return result, summary
+
+
+def _planFilterList(val: Any, key: str, ruleName: str) -> Optional[list[tuple[str, str]]]:
+    """
+    A plan rule filter is either a single [path, regex] pair, or a list of them.
+    """
+    if val is None:
+        return None
+    if len(val) == 2 and all(isinstance(v, str) for v in val):
+        val = [val]
+    filters = []
+    for filter in val:
+        assert isinstance(filter, list) and len(filter) == 2, f"Plan rule '{ruleName}' {key} filters must be [jsonpath, regex] pairs"
+        filters.append((str(filter[0]), str(filter[1])))
+    return filters or None
+
+
+def _loadPlan(planPath: str) -> list[dict]:
+    """
+    Load a json plan file, and validate each of it's rules.
+    Returns the rules, with the same options as the command line arguments of the same name, converted to python values.
+    ```
+    {"rules": [{"name": "untagged", "exclude": ["metadata.container.tags[*]", ".*"]},
+               {"name": "develop", "include": ["metadata.container.tags[*]", "(?i)DEVELOP.*"], "sort_by": "updated_at", "reverse": true, "slice": [5, null]}]}
+    ```
+    """
+    with open(planPath) as fh:
+        plan = json.load(fh)
+
+    assert isinstance(plan, dict) and isinstance(plan.get("rules"), list) and plan["rules"], f"Plan '{planPath}' must have a list of 'rules'"
+
+    rules = []
+    for index, rule in enumerate(plan["rules"]):
+        assert isinstance(rule, dict), f"Plan rule {index+1} must be an object"
+        name = str(rule.get("name", f"rule-{index+1}"))
+        unknown = set(rule.keys()) - PLAN_RULE_KEYS
+        assert not unknown, f"Plan rule '{name}' has unknown options {sorted(unknown)}"
+
+        slice = rule.get("slice")
+        if slice is not None:
+            assert isinstance(slice, list) and len(slice) == 2, f"Plan rule '{name}' slice must be [start, end]"
+            slice = (None if slice[0] is None else int(slice[0]), None if slice[1] is None else int(slice[1]))
+
+        retention = None
+        keepNewest = rule.get("keep_newest_per_tag_prefix")
+        if rule.get("older_than") is not None or keepNewest is not None:
+            retention = _RetentionRules(olderThanDays=None if rule.get("older_than") is None else float(rule["older_than"]),
+                                        keepNewest=None if keepNewest is None else (int(keepNewest[0]), str(keepNewest[1])),
+                                        ageField=rule.get("age_field", "updated_at"))
+
+        rules.append({
+            "name": name,
+            "include": _planFilterList(rule.get("include"), "include", name),
+            "exclude": _planFilterList(rule.get("exclude"), "exclude", name),
+            "filter_mode": FILTER_MODE(rule.get("filter_mode", FILTER_MODE.AND.value)),
+            "retention": retention,
+            "sort_by": rule.get("sort_by"),
+            # The same default as --reverse, so a rule copied from a command line sorts the same way
+            "reverse": bool(rule.get("reverse", True)),
+            "slice": slice,
+        })
+
+    return rules
+
+
+def _deletePackageVersionsByPlan(summary: dict,
+                                 client: GitHubClient,
+                                 org: Optional[str],
+                                 user: Optional[str],
+                                 packageType: str,
+                                 packageName: str,
+                                 fetchLimit: int,
+                                 fetchWorkers: int,
+                                 rules: list[dict],
+                                 dryrun: bool,
+                                 deleteWorkers: int = 1,
+                                 journal: Optional[DeleteJournal] = None) -> tuple[list[dict], dict]:
+    """
+    Fetch the package versions once, then run each of the plan rules against that same list.
+    The versions selected by any of the rules are deleted, each only once, in a single pass.
+    The summary reports which rule(s) selected each version.
+    """
+    assert bool(org) != bool(user)
+
+    url = None
+    if org:
+        url = LIST_PACKAGE_VERSIONS_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName)
+    if user:
+        url = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type=packageType, package_name=packageName)
+    assert url is not None, "Failed to generate a valid API url"
+
+    versionList: list[dict] = []
+    for page in _versionPagesGenerator(client, url, fetchLimit, summary, workers=fetchWorkers):
+        versionList.extend(page)
+
+    ruleSummaries: dict[str, dict] = {}
+    selectedBy: dict[int, list[str]] = {}
+    for rule in rules:
+        DEBUG_PRINT(f"Plan rule '{rule['name']}'")
+        ruleList, ruleSummary = _filterAndSortListResponseJson(itemList=versionList,
+                                                               include=rule["include"],
+                                                               exclude=rule["exclude"],
+                                                               sortBy=rule["sort_by"],
+                                                               sortReverse=rule["reverse"],
+                                                               slice=rule["slice"],
+                                                               summary={},
+                                                               filterMode=rule["filter_mode"],
+                                                               retention=rule["retention"])
+        for item in ruleList:
+            selectedBy.setdefault(id(item), []).append(rule["name"])
+        ruleSummary["selected"] = len(ruleList)
+        ruleSummaries[rule["name"]] = ruleSummary
+
+    # The union of all of the rules, in the original fetched order
+    deleteList = [item for item in versionList if id(item) in selectedBy]
+
+    summary["rules"] = ruleSummaries
+    summary["selected_by"] = {str(item["id"]): selectedBy[id(item)] for item in deleteList}
+    summary["items_found"] = len(deleteList)
+
+    return _deletePackageVersions(summary=summary, itemList=deleteList, client=client, org=org, user=user,
+                                  packageType=packageType, packageName=packageName, dryrun=dryrun, workers=deleteWorkers,
+                                  journal=journal)
+
+
+def _isUntagged(item: dict) -> bool:
+    """
+    True when the version has no container tags. The same versions `--exclude metadata.container.tags[*] .*` keeps,
+    without the json path.
+    """
+    metadata = item.get("metadata")
+    container = metadata.get("container") if isinstance(metadata, dict) else None
+    return not (container.get("tags") if isinstance(container, dict) else None)
+
+
+def _purgeUntaggedContainerVersions(summary: dict,
+                                    client: GitHubClient,
+                                    org: Optional[str],
+                                    user: Optional[str],
+                                    packageName: str,
+                                    fetchLimit: int,
+                                    fetchWorkers: int,
+                                    dryrun: bool,
+                                    retention: Optional[_RetentionRules] = None,
+                                    deleteWorkers: int = 1,
+                                    journal: Optional[DeleteJournal] = None) -> tuple[list[dict], dict]:
+    """
+    Delete every untagged version of a container package, while the rest of the pages are still being fetched.
+    Each page is checked for untagged versions as it arrives, and their deletes are queued on `deleteWorkers` threads straight away.
+    A delete shifts every later version one place up the list. So after the first page, the pages are fetched from the last to the 2nd,
+    and a page is only checked once every page after it has been. The deletes never move a version we have not seen yet.
+    The first page is where in-progress pushes sit, untagged manifests that get tagged moments later. So the first fetch
+    is only used to count the pages, and the first page is fetched again just before it is checked and deleted, last.
+    With `retention`, only the untagged versions older than it's `--older_than` are deleted.
+    Returns the untagged versions found.
+    """
+    assert bool(org) != bool(user)
+    assert fetchLimit > 0, "Fetch limit must be at least 1"
+    assert deleteWorkers >= 1, "Delete workers must be at least 1"
+
+    url = None
+    if org:
+        url = LIST_PACKAGE_VERSIONS_FOR_ORG.format(org=org, package_type="container", package_name=packageName)
+    if user:
+        url = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type="container", package_name=packageName)
+    assert url is not None, "Failed to generate a valid API url"
+
+    def pageUrl(page: int) -> str:
+        return url + PAGING_ARGS.format(per_page=GITHUB_PER_PAGE_LIMIT, page=page)
+
+    def deleteItem(item: dict):
+        id = item["id"]
+        deleteUrl = None
+        if org:
+            deleteUrl = DELETE_PACKAGE_VERSION_FOR_ORG.format(org=org, package_type="container", package_name=packageName, package_version_id=id)
+        if user:
+            deleteUrl = DELETE_PACKAGE_VERSION_FOR_USER.format(user=user, package_type="container", package_name=packageName, package_version_id=id)
+        assert deleteUrl is not None, "Failed to generate a valid API url"
+
+        outcome = _deletePackageVersion(client, deleteUrl)
+        if journal is not None:
+            journal.completed(packageName, id, outcome)
+        results[str(id)] = outcome
+        INFO_PRINT(f"Deleting {packageName} id:{id} {outcome}")
+
+    results: dict[str, str] = {}
+    untagged: list[dict] = []
+    seen: set = set()
+    deletes: list[Future] = []
+    deleteExecutor = ThreadPoolExecutor(max_workers=deleteWorkers)
+
+    def checkPage(page: list[dict]):
+        summary["items_fetched"] += len(page)
+        with _stages.stage("filter", len(page)):
+            # New versions pushed during the run shift the older ones down, so the same version can be seen twice
+            found = [item for item in page if item.get("id") is not None and item["id"] not in seen and _isUntagged(item)]
+            if retention is not None:
+                found = retention.filterAge(found)
+        seen.update(item["id"] for item in found)
+        untagged.extend(found)
+        if dryrun or not found:
+            return
+        if journal is not None:
+            journal.planned(packageName, [item["id"] for item in found])
+        deletes.extend(deleteExecutor.submit(deleteItem, item) for item in found)
+
+    summary["items_fetched"] = 0
+    fetchExecutor = ThreadPoolExecutor(max_workers=fetchWorkers)
+    try:
+        firstPage, response = _fetchPage(client, pageUrl(1))
+        lastPage = min(_lastPageNumber(response) or 1, -(-fetchLimit // GITHUB_PER_PAGE_LIMIT))
+        DEBUG_PRINT(f"Checking pages {lastPage} to 1 for untagged versions")
+
+        inFlight: deque[Future] = deque()
+        nextPage = lastPage
+        while nextPage >= 2 or inFlight:
+            while nextPage >= 2 and len(inFlight) < fetchWorkers:
+                inFlight.append(fetchExecutor.submit(_fetchPage, client, pageUrl(nextPage)))
+                nextPage -= 1
+            fetched, _ = inFlight.popleft().result()
+            checkPage(fetched)
+        if lastPage >= 2:
+            # The first fetch is as old as the whole run, check what is on the first page now
+            firstPage, _ = _fetchPage(client, pageUrl(1))
+        checkPage(firstPage)
+    finally:
+        fetchExecutor.shutdown(wait=True, cancel_futures=True)
+        deleteExecutor.shutdown(wait=True)
+
+    for future in deletes:
+        future.result()
+
+    summary["untagged"] = len(untagged)
+    if dryrun:
+        results = {str(item["id"]): "ok[dryrun]" for item in untagged}
+        INFO_PRINT(f"Dryrun. {len(untagged)} untagged version(s) would be deleted from {packageName}")
+
+    failed = {id: outcome for id, outcome in results.items() if not outcome.startswith("ok")}
+    if client.index is not None and not dryrun:
+        client.index.remove(url, [item["id"] for item in untagged if str(item["id"]) not in failed])
+
+    summary['deleted'] = len(results) - len(failed)
+    summary['delete_failed'] = len(failed)
+    summary['delete_results'] = results
+
+    return untagged, summary
+
+
+class AsyncGitHubClient:
+    """
+    The public asyncio api, for use as a library. Many owners and packages can be listed and cleaned up at once, from one event loop.
+    Use with `async with AsyncGitHubClient(ghtoken) as client:`
+    Each call runs the same pipeline as the command line operation of the same name, and returns the same `(result, summary)`.
+    The pipelines run on a pool of `concurrency` threads, sharing one GitHubClient, so the event loop is never blocked by the api.
+    Pass a RateLimitScheduler to pace every call together within the GitHub rate limits.
+    The `...Pages` calls are async iterators of the unfiltered pages, as they arrive. Stopping early stops the fetch.
+    """
+
+    def __init__(self,
+                 ghtoken: str,
+                 apiRoot: str = API_ROOT,
+                 concurrency: int = 10,
+                 fetchWorkers: int = 1,
+                 cache: Optional[EtagCache] = None,
+                 index: Optional[VersionIndex] = None,
+                 scheduler: Optional[RateLimitScheduler] = None):
+        assert concurrency >= 1, "Concurrency must be at least 1"
+        self.fetchWorkers = fetchWorkers
+        self.client = GitHubClient(ghtoken=ghtoken, apiRoot=apiRoot, poolSize=concurrency * fetchWorkers, cache=cache, index=index,
+                                   scheduler=scheduler)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ghpkgadmin")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """
+        Wait for the running calls to finish, then close the connections.
+        """
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self.client.close()
+
+    async def _run(self, function: Callable, **kwargs) -> Any:
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, **kwargs))
+
+    async def _streamPages(self, pages: Generator[list, None, None]) -> AsyncIterator[list[dict]]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Pages are never None, so None marks the end
+                page = await loop.run_in_executor(self._executor, next, pages, None)
+                if page is None:
+                    return
+                yield page
+        finally:
+            await loop.run_in_executor(self._executor, pages.close)
+
+    async def listPackages(self,
+                           packageType: str,
+                           org: Optional[str] = None,
+                           user: Optional[str] = None,
+                           fetchLimit: int = FETCH_LIMIT,
+                           include: Optional[list[tuple[str, str]]] = None,
+                           exclude: Optional[list[tuple[str, str]]] = None,
+                           sortBy: Optional[str] = None,
+                           sortReverse: Optional[bool] = None,
+                           slice: Optional[tuple[int | None, int | None]] = None,
+                           filterMode: FILTER_MODE = FILTER_MODE.AND,
+                           retention: Optional[_RetentionRules] = None,
+                           fields: Optional[list[str]] = None) -> tuple[list[dict], dict]:
+        return await self._run(_listPackages, summary={}, client=self.client, org=org, user=user, packageType=packageType,
+                               fetchLimit=fetchLimit, fetchWorkers=self.fetchWorkers, include=include, exclude=exclude,
+                               sortBy=sortBy, sortReverse=sortReverse, slice=slice, filterMode=filterMode, retention=retention, fields=fields)
+
+    async def listPackageVersions(self,
+                                  packageType: str,
+                                  packageName: str,
+                                  org: Optional[str] = None,
+                                  user: Optional[str] = None,
+                                  fetchLimit: int = FETCH_LIMIT,
+                                  include: Optional[list[tuple[str, str]]] = None,
+                                  exclude: Optional[list[tuple[str, str]]] = None,
+                                  sortBy: Optional[str] = None,
+                                  sortReverse: Optional[bool] = None,
+                                  slice: Optional[tuple[int | None, int | None]] = None,
+                                  filterMode: FILTER_MODE = FILTER_MODE.AND,
+                                  retention: Optional[_RetentionRules] = None,
+                                  fields: Optional[list[str]] = None) -> tuple[list[dict], dict]:
+        return await self._run(_listPackageVersions, summary={}, client=self.client, org=org, user=user, packageType=packageType,
+                               packageName=packageName, fetchLimit=fetchLimit, fetchWorkers=self.fetchWorkers, include=include, exclude=exclude,
+                               sortBy=sortBy, sortReverse=sortReverse, slice=slice, filterMode=filterMode, retention=retention, fields=fields)
+
+    async def deletePackageVersions(self,
+                                    packageType: str,
+                                    packageName: str,
+                                    versions: list[dict],
+                                    org: Optional[str] = None,
+                                    user: Optional[str] = None,
+                                    dryrun: bool = True,
+                                    workers: int = 1,
+                                    journal: Optional[DeleteJournal] = None) -> tuple[list[dict], dict]:
+        """
+        Delete the given versions, as found by `listPackageVersions`. Like the command line, nothing is deleted unless `dryrun` is False.
+        """
+        return await self._run(_deletePackageVersions, summary={}, itemList=versions, client=self.client, org=org, user=user,
+                               packageType=packageType, packageName=packageName, dryrun=dryrun, workers=workers, journal=journal)
+
+    def packagePages(self,
+                     packageType: str,
+                     org: Optional[str] = None,
+                     user: Optional[str] = None,
+                     fetchLimit: int = FETCH_LIMIT) -> AsyncIterator[list[dict]]:
+        assert bool(org) != bool(user), "One of org or user is required"
+        url = None
+        if org:
+            url = LIST_PACKAGES_FOR_ORG.format(org=org, package_type=packageType)
+        if user:
+            url = LIST_PACKAGES_FOR_USER.format(user=user, package_type=packageType)
+        assert url is not None, "Failed to generate a valid API url"
+        return self._streamPages(_pagedDataGenerator(self.client, url, fetchLimit, {}, workers=self.fetchWorkers))
+
+    def packageVersionPages(self,
+                            packageType: str,
+                            packageName: str,
+                            org: Optional[str] = None,
+                            user: Optional[str] = None,
+                            fetchLimit: int = FETCH_LIMIT) -> AsyncIterator[list[dict]]:
+        assert bool(org) != bool(user), "One of org or user is required"
+        url = None
+        if org:
+            url = LIST_PACKAGE_VERSIONS_FOR_ORG.format(org=org, package_type=packageType, package_name=packageName)
+        if user:
+            url = LIST_PACKAGE_VERSIONS_FOR_USER.format(user=user, package_type=packageType, package_name=packageName)
+        assert url is not None, "Failed to generate a valid API url"
+        return self._streamPages(_versionPagesGenerator(self.client, url, fetchLimit, {}, workers=self.fetchWorkers))
+
+
 def _isTrue(s: Optional[str]) -> bool:
     """
     Simple isTrue check for various arg string values.
@@ -447,20 +2536,88 @@ def _argListOfNonesToNone(val: Optional[list]):
     return val
 
 
+def _argFilterList(val: Optional[list[list]]) -> Optional[list[tuple[str, str]]]:
+    """
+    Take the repeated filter args, each a list of one or more (path, regex) pairs, and drop the pairs that are all Nones.
+    Produce None if there are no filters left.
+    """
+    if val is None:
+        return None
+    filters = []
+    for arg in val:
+        assert len(arg) % 2 == 0, f"Filters must be pairs of (jsonpath, regex). Received {arg}"
+        for i in range(0, len(arg), 2):
+            if _argListOfNonesToNone(arg[i:i + 2]) is not None:
+                filters.append((arg[i], arg[i + 1]))
+    return filters or None
+
+
+def _writeResult(result: Any, fh, outputFormat: OUTPUT_FORMAT, pretty: bool):
+    """
+    Stream the result into the open file, without building the whole json string in memory first.
+    ndjson writes a list as one compact json object per line. Anything else is a single line.
+    """
+    if outputFormat == OUTPUT_FORMAT.NDJSON:
+        for item in (result if type(result) is list else [result]):
+            fh.write(json.dumps(item, separators=(",", ":")))
+            fh.write("\n")
+        return
+
+    json.dump(result, fh, indent=4 if pretty else None)
+    fh.write("\n")
+
+
 def _setActionOutput(name, value):
     with open(os.environ['GITHUB_OUTPUT'], 'a') as fh:
         fh.write(f"{name}={value}\n")
 
 
+def _workspaceFile(fileName: str, outputName: str, reason: str) -> Optional[str]:
+    """
+    The path of a file in the workspace, for an output too large, or in the wrong format, for an action output.
+    Later steps run in the workspace, so they find the file by it's name.
+    Without a workspace there is nowhere to write it, so warn that the output is left out, and return None.
+    """
+    workspace = os.environ.get("GITHUB_WORKSPACE")
+    if not workspace:
+        INFO_PRINT(f"Warning: {reason}, and there is no GITHUB_WORKSPACE to write it to. The {outputName} output is not set")
+        return None
+    return os.path.join(workspace, fileName)
+
+
+def _setLargeActionOutput(name: str, value: str, fileOutputName: str, fileName: str):
+    """
+    Set the action output, unless the value is over the 1MB limit of an action output.
+    Then write it to a file in the workspace instead, and set it's name as the `fileOutputName` output.
+    """
+    if len(value) <= ACTION_OUTPUT_MAX_BYTES:
+        _setActionOutput(name, value)
+        return
+
+    path = _workspaceFile(fileName, fileOutputName, f"The {name} is too large for an action output")
+    if path is None:
+        return
+    with open(path, "w") as fh:
+        fh.write(value)
+    INFO_PRINT(f"The {name} is too large for an action output. Written to {fileName} in the workspace")
+    _setActionOutput(fileOutputName, fileName)
+
+
 # ***************************************
 # MAIN
 # ***************************************
 
 
-if __name__ == '__main__':
+def main(argv: Optional[list[str]] = None) -> int:
     """
     Main Entry Point
+    Parse the command line arguments, run the operation, and write the result and summary to stdout and the action outputs.
+    Returns the process exit code.
     """
+    global _debug, _stages
+    # main() can be called more than once in a process, only report the stages of this run
+    _stages = _StageTimes()
+
     parser = argparse.ArgumentParser()
 
     parser.add_argument('--operation',
@@ -487,39 +2644,160 @@ if __name__ == '__main__':
     parser.add_argument('--package_type',
                         dest='package_type',
                         type=_argString,
-                        required=True,
-                        choices=["npm", "maven", "rubygems", "docker", "nuget", "container"],
-                        help='One of the list of known github package types. eg "container, npm, docker..."')
+                        required=False,
+                        choices=PACKAGE_TYPES + [None],
+                        help='One of the list of known github package types. eg "container, npm, docker..."  Optional for the inventory operation, which defaults to all types.')
     parser.add_argument('--package_name',
                         dest='package_name',
                         type=_argString,
                         required=False,
                         help='The Package Name')
+    parser.add_argument('--package_names',
+                        dest='package_names',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        nargs='+',
+                        help='A list of Package Names for the batch operations')
+    parser.add_argument('--package_name_regex',
+                        dest='package_name_regex',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help='The batch operations run on all packages with a name matching this regex')
+    parser.add_argument('--batch_workers',
+                        dest='batch_workers',
+                        required=False,
+                        default=4,
+                        type=int,
+                        help="How many packages the batch and inventory operations process at the same time.")
     # parser.add_argument('--package_version_id',
     #                     dest='package_version_id',
     #                     type=str,
     #                     required=False,
     #                     help='The package version ID to operate on')
+    parser.add_argument('--plan',
+                        dest='plan',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help='A json plan file of include/exclude/sort/slice rules, for the deletePackageVersionsByPlan operation')
+    parser.add_argument('--query',
+                        dest='query',
+                        type=_argString,
+                        required=False,
+                        default=os.environ.get("INPUT_QUERY"),
+                        help='The sql query to run over the packages, versions and tags tables, for the query operation. '
+                             'Defaults to the INPUT_QUERY environment variable, which is how the action passes it in without being split into words.')
+    parser.add_argument('--database',
+                        dest='database',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help='Build the sqlite database of the query operation in this file, instead of in memory. It is kept after the run.')
     parser.add_argument('--fetch_limit',
                         dest='fetch_limit',
                         required=False,
-                        default=1000,
+                        default=FETCH_LIMIT,
                         type=int,
                         help="Fetching from the GH API is limited to 1000 records at a time.  Increase this with caution.")
+    parser.add_argument('--fetch_workers',
+                        dest='fetch_workers',
+                        required=False,
+                        default=1,
+                        type=int,
+                        help="How many pages to fetch concurrently. Once the first page reports the last page number, the remaining pages are fetched in parallel.")
+    parser.add_argument('--delete_workers',
+                        dest='delete_workers',
+                        required=False,
+                        default=1,
+                        type=int,
+                        help="How many package versions to delete concurrently. Deletes automatically slow down when GitHub rate limits are reached.")
+    parser.add_argument('--rate_limit_reserve',
+                        dest='rate_limit_reserve',
+                        required=False,
+                        default=0.0,
+                        type=float,
+                        help="The share of the rate limits to leave unused, for other jobs using the same token. Between 0 and 0.9")
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help="Keep the fetched list pages and their ETags in this directory. Unchanged pages are not downloaded again, and do not count against the rate limit.")
+    parser.add_argument('--cache_max_age',
+                        dest='cache_max_age',
+                        required=False,
+                        default=CACHE_MAX_AGE_HOURS,
+                        type=float,
+                        help="Cached pages older than this many hours are discarded.")
+    parser.add_argument('--cache_max_mb',
+                        dest='cache_max_mb',
+                        required=False,
+                        default=CACHE_MAX_MB,
+                        type=float,
+                        help="The least recently used cached pages are discarded once the cache grows beyond this many megabytes.")
+    parser.add_argument('--index_dir',
+                        dest='index_dir',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help="Keep a snapshot of every version of each listed package in this directory. Later runs only fetch the newest pages, until they reach a known version.")
+    parser.add_argument('--index_max_age',
+                        dest='index_max_age',
+                        required=False,
+                        default=INDEX_MAX_AGE_HOURS,
+                        type=float,
+                        help="A version snapshot older than this many hours is replaced by a full fetch.")
     parser.add_argument('--include',
                         dest='include',
                         required=False,
                         default=None,
                         type=_argString,
-                        nargs=2,
-                        help="Include regex field matches")
+                        nargs='+',
+                        action='append',
+                        help="Include regex field matches. One or more pairs of (jsonpath, regex). Can be given more than once.")
     parser.add_argument('--exclude',
                         dest='exclude',
                         required=False,
                         default=None,
                         type=_argString,
+                        nargs='+',
+                        action='append',
+                        help="Exclude regex field matches. One or more pairs of (jsonpath, regex). Can be given more than once.")
+    parser.add_argument('--filter_mode',
+                        dest='filter_mode',
+                        type=_argString,
+                        required=False,
+                        default=FILTER_MODE.AND.value,
+                        choices=list(map(lambda a: a.value, FILTER_MODE)),
+                        help="With several --include filters, must an item match all of them (and), or any one of them (or). Any one --exclude filter always removes an item")
+    parser.add_argument('--older_than',
+                        dest='older_than',
+                        required=False,
+                        default=None,
+                        type=_argString,
+                        help="Only keep items with an --age_field timestamp older than this many days")
+    parser.add_argument('--keep_newest_per_tag_prefix',
+                        dest='keep_newest_per_tag_prefix',
+                        required=False,
+                        default=None,
+                        type=_argString,
                         nargs=2,
-                        help="Exclude regex field matches")
+                        help="Group container versions by the prefix of their tags, and take the newest N of each group out of the list. eg: '5' '(.*)-[0-9]+'")
+    parser.add_argument('--age_field',
+                        dest='age_field',
+                        type=_argString,
+                        required=False,
+                        default="updated_at",
+                        help="The timestamp field used by --older_than and --keep_newest_per_tag_prefix")
+    parser.add_argument('--fields',
+                        dest='fields',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        nargs='+',
+                        help="Only keep these json path fields of each item. eg: 'id' 'metadata.container.tags' 'updated_at'")
     parser.add_argument('--sort_by',
                         dest='sort_by',
                         required=False,
@@ -546,6 +2824,26 @@ if __name__ == '__main__':
                         default=str(False).lower(),
                         choices=[str(True).lower(), str(False).lower()],
                         help="Don't output the raw json data, instead just summarize the actions")
+    parser.add_argument('--output_format',
+                        dest='output_format',
+                        type=_argString,
+                        required=False,
+                        default=OUTPUT_FORMAT.JSON.value,
+                        choices=[f.value for f in OUTPUT_FORMAT],
+                        help="Write the result as a single json document, or as one json object per line")
+    parser.add_argument('--output_file',
+                        dest='output_file',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help="Write the result to this file instead of stdout. The path is set as the result_file action output")
+    parser.add_argument('--pretty',
+                        dest='pretty',
+                        type=_argString,
+                        required=False,
+                        default=str(False).lower(),
+                        choices=[str(True).lower(), str(False).lower()],
+                        help="Indent the json result and summary")
     parser.add_argument('--dryrun',
                         dest='dryrun',
                         type=_argString,
@@ -553,6 +2851,32 @@ if __name__ == '__main__':
                         default=str(True).lower(),
                         choices=[str(True).lower(), str(False).lower()],
                         help='Delete operations can be dangerous. By default, we dryrun/pretend to do the actual operations.  Set this to False to run any Update/Delete operations.')
+    parser.add_argument('--journal',
+                        dest='journal',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help='Record the planned and completed deletes in this file, so an interrupted run can be resumed')
+    parser.add_argument('--resume',
+                        dest='resume',
+                        type=_argString,
+                        required=False,
+                        default=str(False).lower(),
+                        choices=[str(True).lower(), str(False).lower()],
+                        help='Skip the list and filters. Retry only the deletes in the --journal that are not yet done')
+    parser.add_argument('--profile',
+                        dest='profile',
+                        type=_argString,
+                        required=False,
+                        default=str(False).lower(),
+                        choices=[str(True).lower(), str(False).lower()],
+                        help="Add the time, calls and item counts of each pipeline stage, and of the http requests, to the summary")
+    parser.add_argument('--profile_file',
+                        dest='profile_file',
+                        type=_argString,
+                        required=False,
+                        default=None,
+                        help="Run the operation under cProfile, and write the stats of every thread to this file")
     parser.add_argument('--debug',
                         dest='debug',
                         type=_argString,
@@ -562,7 +2886,7 @@ if __name__ == '__main__':
                         help="Add stderr debug output information")
 
     # Grab our provided args, and dump into the summary
-    args = args = parser.parse_args()
+    args = args = parser.parse_args(argv)
     summary = vars(args).copy()
     _debug = _isTrue(args.debug)
 
@@ -577,9 +2901,24 @@ if __name__ == '__main__':
     # Org / User
     assert bool(args.org) != bool(args.user), "one of '--org' or '--user' parameters is required."
 
+    # Package Type
+    assert args.package_type or operation in [OPERATION.INVENTORY, OPERATION.QUERY], f"--package_type is required with --operation {operation.value}"
+
     # Fetch Limit
     assert args.fetch_limit >= 10 and args.fetch_limit <= 999999, "--fetch_limit must be between 10 and 999999"
 
+    # Fetch Workers
+    assert args.fetch_workers >= 1 and args.fetch_workers <= 20, "--fetch_workers must be between 1 and 20"
+
+    # Delete Workers
+    assert args.delete_workers >= 1 and args.delete_workers <= 20, "--delete_workers must be between 1 and 20"
+
+    # Batch Workers
+    assert args.batch_workers >= 1 and args.batch_workers <= 20, "--batch_workers must be between 1 and 20"
+
+    # Rate Limit Reserve
+    assert args.rate_limit_reserve >= 0 and args.rate_limit_reserve <= 0.9, "--rate_limit_reserve must be between 0 and 0.9"
+
     # Slice Args
     sliceArgs = None
     if _argListOfNonesToNone(args.slice) is not None:
@@ -599,39 +2938,108 @@ if __name__ == '__main__':
         summary["slice"] = sliceArgs
 
 
+    # Retention Rules
+    retention = None
+    keepNewestArgs = _argListOfNonesToNone(args.keep_newest_per_tag_prefix)
+    if args.older_than is not None or keepNewestArgs is not None:
+        olderThanDays = None
+        if args.older_than is not None:
+            try:
+                olderThanDays = float(args.older_than)
+            except Exception:
+                raise Exception("--older_than must be a number of days")
+        keepNewest = None
+        if keepNewestArgs is not None:
+            try:
+                keepNewest = (int(keepNewestArgs[0]), str(keepNewestArgs[1]))
+            except Exception:
+                raise Exception("--keep_newest_per_tag_prefix must be a count and a regex")
+        retention = _RetentionRules(olderThanDays=olderThanDays, keepNewest=keepNewest, ageField=args.age_field or "updated_at")
+
+    # Projected Fields
+    fields = _argListOfNonesToNone(args.fields)
+    outputProjection = _Projection(fields) if fields else None
+
     summary['ghtoken'] = "***"
     summary = {"args": summary}
 
     printSummary = _isTrue(args.summary)
     printResult = not printSummary
+    result: Any = None
+
+    cache = None
+    if args.cache_dir:
+        cache = EtagCache(cacheDir=args.cache_dir, maxAgeSeconds=args.cache_max_age * 3600, maxBytes=int(args.cache_max_mb * 1024 * 1024))
+
+    index = None
+    if args.index_dir:
+        index = VersionIndex(indexDir=args.index_dir, maxAgeSeconds=args.index_max_age * 3600)
+
+    # One shared connection pool, large enough for all of our workers
+    journal = DeleteJournal(args.journal) if args.journal else None
+    resume = _isTrue(args.resume)
+    assert not resume or journal is not None, "--journal is required with --resume"
+    assert not resume or operation == OPERATION.DELETE_PACKAGE_VERSIONS, f"--resume only works with --operation {OPERATION.DELETE_PACKAGE_VERSIONS.value}"
+
+    poolSize = max(args.fetch_workers, args.delete_workers)
+    if operation in [OPERATION.BATCH_DELETE_PACKAGE_VERSIONS, OPERATION.INVENTORY, OPERATION.QUERY]:
+        poolSize = poolSize * args.batch_workers
+    scheduler = RateLimitScheduler(pointsPerMinute=SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE, reserve=args.rate_limit_reserve)
+    # GitHub Enterprise Server runners point GITHUB_API_URL at their own api
+    client = GitHubClient(ghtoken=args.ghtoken, apiRoot=os.environ.get("GITHUB_API_URL", API_ROOT), poolSize=poolSize,
+                          cache=cache, index=index, scheduler=scheduler)
+
+    # Profiling
+    profile = _isTrue(args.profile)
+    printSummary = printSummary or profile
+    startTime = time.perf_counter()
+    profiler = None
+    if args.profile_file:
+        profiler = _ThreadProfiler()
+        profiler.enable()
 
     if operation == OPERATION.LIST_PACKAGES:
         result, summary = _listPackages(summary=summary,
-                                        ghtoken=args.ghtoken,
+                                        client=client,
                                         org=args.org,
                                         user=args.user,
                                         packageType=args.package_type,
                                         fetchLimit=args.fetch_limit,
-                                        include=_argListOfNonesToNone(args.include),
-                                        exclude=_argListOfNonesToNone(args.exclude),
+                                        fetchWorkers=args.fetch_workers,
+                                        include=_argFilterList(args.include),
+                                        exclude=_argFilterList(args.exclude),
                                         sortBy=args.sort_by,
                                         sortReverse=_isTrue(args.reverse),
-                                        slice=sliceArgs)
+                                        slice=sliceArgs,
+                                        filterMode=FILTER_MODE(args.filter_mode),
+                                        retention=retention,
+                                        fields=fields)
 
-    if operation in [OPERATION.LIST_PACKAGE_VERSIONS, OPERATION.DELETE_PACKAGE_VERSIONS]:
+    if operation == OPERATION.DELETE_PACKAGE_VERSIONS and resume:
+        assert args.package_name, f"--package_name is required with --action {args.package_name}"
+        assert journal is not None
+        result = [{"id": id} for id in journal.unfinished(args.package_name)]
+        summary["resumed"] = len(result)
+        INFO_PRINT(f"Resuming {len(result)} unfinished delete(s) from {args.journal}")
+
+    elif operation in [OPERATION.LIST_PACKAGE_VERSIONS, OPERATION.DELETE_PACKAGE_VERSIONS]:
         assert args.package_name, f"--package_name is required with --action {args.package_name}"
         result, summary = _listPackageVersions(summary=summary,
-                                               ghtoken=args.ghtoken,
+                                               client=client,
                                                org=args.org,
                                                user=args.user,
                                                packageType=args.package_type,
                                                packageName=args.package_name,
                                                fetchLimit=args.fetch_limit,
-                                               include=_argListOfNonesToNone(args.include),
-                                               exclude=_argListOfNonesToNone(args.exclude),
+                                               fetchWorkers=args.fetch_workers,
+                                               include=_argFilterList(args.include),
+                                               exclude=_argFilterList(args.exclude),
                                                sortBy=args.sort_by,
                                                sortReverse=_isTrue(args.reverse),
-                                               slice=sliceArgs)
+                                               slice=sliceArgs,
+                                               filterMode=FILTER_MODE(args.filter_mode),
+                                               retention=retention,
+                                               fields=fields)
 
     if operation == OPERATION.DELETE_PACKAGE_VERSIONS:
         assert result is not None and type(result) is list
@@ -639,17 +3047,165 @@ if __name__ == '__main__':
         printResult = False
         result, summary = _deletePackageVersions(summary=summary,
                                                  itemList=result,
-                                                 ghtoken=args.ghtoken,
+                                                 client=client,
                                                  org=args.org,
                                                  user=args.user,
                                                  packageType=args.package_type,
                                                  packageName=args.package_name,
-                                                 dryrun=_isTrue(args.dryrun))
+                                                 dryrun=_isTrue(args.dryrun),
+                                                 workers=args.delete_workers,
+                                                 journal=journal,
+                                                 resuming=resume)
+
+    if operation == OPERATION.BATCH_DELETE_PACKAGE_VERSIONS:
+        packageNames = _argListOfNonesToNone(args.package_names)
+        assert bool(packageNames) != bool(args.package_name_regex), f"one of --package_names or --package_name_regex is required with --operation {operation.value}"
+        printSummary = True
+        printResult = False
+        result, summary = _batchDeletePackageVersions(summary=summary,
+                                                      client=client,
+                                                      org=args.org,
+                                                      user=args.user,
+                                                      packageType=args.package_type,
+                                                      packageNames=packageNames,
+                                                      packageNameRegex=args.package_name_regex,
+                                                      fetchLimit=args.fetch_limit,
+                                                      fetchWorkers=args.fetch_workers,
+                                                      include=_argFilterList(args.include),
+                                                      exclude=_argFilterList(args.exclude),
+                                                      sortBy=args.sort_by,
+                                                      sortReverse=_isTrue(args.reverse),
+                                                      slice=sliceArgs,
+                                                      dryrun=_isTrue(args.dryrun),
+                                                      filterMode=FILTER_MODE(args.filter_mode),
+                                                      retention=retention,
+                                                      deleteWorkers=args.delete_workers,
+                                                      batchWorkers=args.batch_workers,
+                                                      journal=journal,
+                                                      fields=fields)
+
+    if operation == OPERATION.DELETE_PACKAGE_VERSIONS_BY_PLAN:
+        assert args.package_name, f"--package_name is required with --operation {operation.value}"
+        assert args.plan, f"--plan is required with --operation {operation.value}"
+        printSummary = True
+        printResult = False
+        result, summary = _deletePackageVersionsByPlan(summary=summary,
+                                                       client=client,
+                                                       org=args.org,
+                                                       user=args.user,
+                                                       packageType=args.package_type,
+                                                       packageName=args.package_name,
+                                                       fetchLimit=args.fetch_limit,
+                                                       fetchWorkers=args.fetch_workers,
+                                                       rules=_loadPlan(args.plan),
+                                                       dryrun=_isTrue(args.dryrun),
+                                                       deleteWorkers=args.delete_workers,
+                                                       journal=journal)
+
+    if operation == OPERATION.INVENTORY:
+        result, summary = _inventory(summary=summary,
+                                     client=client,
+                                     org=args.org,
+                                     user=args.user,
+                                     packageTypes=[args.package_type] if args.package_type else PACKAGE_TYPES,
+                                     fetchLimit=args.fetch_limit,
+                                     fetchWorkers=args.fetch_workers,
+                                     ageField=args.age_field or "updated_at",
+                                     workers=args.batch_workers)
+
+    if operation == OPERATION.PURGE_UNTAGGED_CONTAINER_VERSIONS:
+        assert args.package_name, f"--package_name is required with --operation {operation.value}"
+        assert args.package_type == "container", f"--package_type must be container with --operation {operation.value}"
+        printSummary = True
+        printResult = False
+        result, summary = _purgeUntaggedContainerVersions(summary=summary,
+                                                          client=client,
+                                                          org=args.org,
+                                                          user=args.user,
+                                                          packageName=args.package_name,
+                                                          fetchLimit=args.fetch_limit,
+                                                          fetchWorkers=args.fetch_workers,
+                                                          dryrun=_isTrue(args.dryrun),
+                                                          retention=retention,
+                                                          deleteWorkers=args.delete_workers,
+                                                          journal=journal)
+
+    if operation == OPERATION.QUERY:
+        assert args.query, f"--query is required with --operation {operation.value}"
+        result, summary = _query(summary=summary,
+                                 client=client,
+                                 org=args.org,
+                                 user=args.user,
+                                 packageTypes=[args.package_type] if args.package_type else PACKAGE_TYPES,
+                                 sql=args.query,
+                                 fetchLimit=args.fetch_limit,
+                                 fetchWorkers=args.fetch_workers,
+                                 packageNameRegex=args.package_name_regex,
+                                 databasePath=args.database or ":memory:",
+                                 workers=args.batch_workers)
+
+    client.close()
+
+    if _isTrue(args.dryrun) and summary.get("deleted") is not None:
+        planWorkers = args.delete_workers * (args.batch_workers if operation == OPERATION.BATCH_DELETE_PACKAGE_VERSIONS else 1)
+        summary["execution_plan"] = _executionPlan(client, deleteCalls=summary["deleted"], workers=planWorkers)
+
+    summary["rate_limit_scheduler"] = scheduler.report()
+
+    if cache is not None:
+        summary["cache"] = {"hits": cache.hits, "misses": cache.misses, "evicted": cache.evict()}
+
+    if printResult and outputProjection is not None and type(result) is list:
+        result = outputProjection.items(result)
+
+    pretty = _isTrue(args.pretty)
+    outputFormat = OUTPUT_FORMAT(args.output_format)
+
+    outputStart = time.perf_counter()
+    if printResult and args.output_file:
+        with open(args.output_file, "w") as fh:
+            _writeResult(result, fh, outputFormat, pretty)
+        INFO_PRINT(f"Result written to {args.output_file}")
+        _setActionOutput("result_file", args.output_file)
+
+    elif printResult and outputFormat == OUTPUT_FORMAT.NDJSON:
+        _writeResult(result, sys.stdout, outputFormat, pretty)
+        # An ndjson result is never a json document, so it only goes out as a file
+        path = _workspaceFile(NDJSON_RESULT_FILE_NAME, "result_file", "An ndjson result can not be set as the result_json_output")
+        if path is not None:
+            with open(path, "w") as fh:
+                _writeResult(result, fh, outputFormat, pretty)
+            INFO_PRINT(f"Result written to {NDJSON_RESULT_FILE_NAME} in the workspace")
+            _setActionOutput("result_file", NDJSON_RESULT_FILE_NAME)
+
+    elif printResult:
+        resultJson = json.dumps(result)
+        INFO_PRINT(json.dumps(result, indent=4) if pretty else resultJson)
+        _setLargeActionOutput("result_json_output", resultJson, "result_file", RESULT_FILE_NAME)
+
+    if printResult:
+        _stages.add("output", time.perf_counter() - outputStart, len(result) if type(result) is list else 1)
+
+    if profiler is not None:
+        profiler.dump(args.profile_file)
+        INFO_PRINT(f"cProfile stats written to {args.profile_file}")
+
+    if profile:
+        summary["profile"] = {"wall_seconds": round(time.perf_counter() - startTime, 4),
+                              "stages": _stages.report(),
+                              "http": client.httpReport()}
 
     if printSummary:
-        INFO_PRINT(json.dumps(summary, indent=4))
-        _setActionOutput("summary_json_output", json.dumps(summary))
+        summaryJson = json.dumps(summary)
+        INFO_PRINT(json.dumps(summary, indent=4) if pretty else summaryJson)
+        # The per id delete results of a large delete can take the summary over the limit too
+        _setLargeActionOutput("summary_json_output", summaryJson, "summary_file", SUMMARY_FILE_NAME)
 
-    if printResult:
-        INFO_PRINT(json.dumps(result, indent=4))
-        _setActionOutput("result_json_output", json.dumps(result))
+    # Let the workflow know, not every delete went through
+    if summary.get("delete_failed") or summary.get("packages_failed"):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+A local stand-in for the GitHub Packages api.
+Serves the list packages, list package versions and delete package version endpoints
+for both orgs and users, with the same paging, Link and ETag headers as GitHub.
+Along with the version list, mock response and action output helpers the tests share.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+from typing import Sequence
+from unittest.mock import Mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+PACKAGES_PATH = re.compile(r"^/(orgs|users)/[^/]+/packages$")
+VERSIONS_PATH = re.compile(r"^/(orgs|users)/[^/]+/packages/[^/]+/([^/]+)/versions$")
+VERSION_PATH = re.compile(r"^/(orgs|users)/[^/]+/packages/[^/]+/([^/]+)/versions/([0-9]+)$")
+
+
+class FakeGitHub:
+    """
+    Start with a `with FakeGitHub(...) as fake:` block, and point a GitHubClient at `fake.url`
+    Pass a `rateLimit` budget, to have every response carry the X-RateLimit headers, counting down from it.
+    The versions of a package can also be any read only sequence, such as one that makes up each version as it's asked for.
+    Deletes from a read only sequence are recorded, but the versions are not removed.
+    `latency` seconds are added to every request, and `errorRate` is the chance of a request failing with one of the `errorStatuses`.
+    Pages are never larger than `maxPerPage`, no matter the per_page asked for. The same as GitHub.
+    """
+
+    def __init__(self,
+                 packages: list[dict] = [],
+                 versions: dict[str, Sequence[dict]] = {},
+                 rateLimit: int | None = None,
+                 rateLimitReset: int = 0,
+                 latency: float = 0.0,
+                 errorRate: float = 0.0,
+                 errorStatuses: tuple[int, ...] = (502, 429),
+                 maxPerPage: int = 100,
+                 seed: int = 0):
+        self.packages = list(packages)
+        self.versions = {name: list(items) if isinstance(items, list) else items for name, items in versions.items()}
+        self.latency = latency
+        self.errorRate = errorRate
+        self.errorStatuses = errorStatuses
+        self.maxPerPage = maxPerPage
+        self._random = random.Random(seed)
+        self.requests: list[tuple[str, str]] = []
+        self.deleted: list[int] = []
+        self.notModified = 0
+        self.rateLimit = rateLimit
+        self.rateLimitRemaining = rateLimit
+        self.rateLimitReset = rateLimitReset
+        self._failures: deque[tuple[str, int, dict]] = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def failNext(self, method: str, status: int, headers: dict = {}):
+        """
+        Answer the next `method` request with this status, instead of serving it.
+        """
+        self._failures.append((method, status, headers))
+
+    def requestCount(self, method: str) -> int:
+        return len([r for r in self.requests if r[0] == method])
+
+    def _takeFailure(self, method: str):
+        with self._lock:
+            for failure in self._failures:
+                if failure[0] == method:
+                    self._failures.remove(failure)
+                    return failure
+        return None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body=None, headers: dict = {}):
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if fake.rateLimit is not None:
+                    with fake._lock:
+                        fake.rateLimitRemaining = max(fake.rateLimitRemaining - 1, 0)
+                        remaining = fake.rateLimitRemaining
+                    self.send_header("X-RateLimit-Limit", str(fake.rateLimit))
+                    self.send_header("X-RateLimit-Remaining", str(remaining))
+                    self.send_header("X-RateLimit-Used", str(fake.rateLimit - remaining))
+                    self.send_header("X-RateLimit-Reset", str(fake.rateLimitReset))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _begin(self, method: str) -> bool:
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    fake.requests.append((method, self.path))
+                    randomFailure = fake.errorRate and fake._random.random() < fake.errorRate
+                    status = fake._random.choice(fake.errorStatuses) if randomFailure else None
+                failure = fake._takeFailure(method)
+                if failure is None and status is not None:
+                    failure = (method, status, {"Retry-After": "0"} if status == 429 else {})
+                if failure is not None:
+                    self._send(failure[1], {"message": "injected failure"}, failure[2])
+                    return False
+                return True
+
+            def _sendPage(self, path: str, query: dict, items: Sequence[dict]):
+                perPage = min(int(query.get("per_page", ["30"])[0]), fake.maxPerPage)
+                page = int(query.get("page", ["1"])[0])
+                with fake._lock:
+                    count = len(items)
+                    body = list(items[(page - 1) * perPage:page * perPage])
+                lastPage = max(-(-count // perPage), 1)
+                headers = {}
+                if lastPage > 1:
+                    args = dict((k, v[0]) for k, v in query.items())
+                    args["page"] = str(lastPage)
+                    headers["Link"] = f'<{fake.url}{path}?{urllib.parse.urlencode(args)}>; rel="last"'
+                etag = '"' + hashlib.sha1(json.dumps(body).encode()).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with fake._lock:
+                        fake.notModified += 1
+                    self._send(304, None, {"ETag": etag})
+                    return
+                headers["ETag"] = etag
+                self._send(200, body, headers)
+
+            def do_GET(self):
+                if not self._begin("GET"):
+                    return
+                parsed = urllib.parse.urlparse(self.path)
+                query = urllib.parse.parse_qs(parsed.query)
+                if PACKAGES_PATH.match(parsed.path):
+                    packageType = query.get("package_type", [None])[0]
+                    packages = [p for p in fake.packages if packageType is None or p.get("package_type", packageType) == packageType]
+                    self._sendPage(parsed.path, query, packages)
+                    return
+                match = VERSIONS_PATH.match(parsed.path)
+                if match and match.group(2) in fake.versions:
+                    self._sendPage(parsed.path, query, fake.versions[match.group(2)])
+                    return
+                self._send(404, {"message": "Not Found"})
+
+            def do_DELETE(self):
+                if not self._begin("DELETE"):
+                    return
+                match = VERSION_PATH.match(urllib.parse.urlparse(self.path).path)
+                if match and match.group(2) in fake.versions:
+                    id = int(match.group(3))
+                    with fake._lock:
+                        items = fake.versions[match.group(2)]
+                        if not isinstance(items, list):
+                            fake.deleted.append(id)
+                            found = [{"id": id}]
+                        else:
+                            found = [item for item in items if item["id"] == id]
+                            for item in found:
+                                items.remove(item)
+                                fake.deleted.append(id)
+                    if found:
+                        self._send(204)
+                        return
+                self._send(404, {"message": "Not Found"})
+
+        return Handler
+
+
+def containerVersion(id: int, updated: str, tags: list[str]) -> dict:
+    """ A container package version, the same shape as GitHub returns """
+    return {"id": id, "name": f"sha256:{id}", "updated_at": updated, "metadata": {"container": {"tags": tags}}}
+
+
+def versionList(count: int, start: int = 1, tagEvery: int = 0) -> list[dict]:
+    """
+    `count` package versions, with ids counting up from `start`.
+    With `tagEvery`, each version has container tags, and every `tagEvery`th id is tagged. The rest are untagged.
+    """
+    if not tagEvery:
+        return [{"id": i} for i in range(start, start + count)]
+    return [{"id": i, "metadata": {"container": {"tags": [f"v{i}"] if i % tagEvery == 0 else []}}} for i in range(start, start + count)]
+
+
+def mockResponse(status: int, headers: dict = {}, text: str = "") -> Mock:
+    response = Mock()
+    response.status_code = status
+    response.headers = headers
+    response.text = text
+    return response
+
+
+def actionOutputs(path) -> dict[str, str]:
+    """ The outputs written to a GITHUB_OUTPUT file """
+    with open(path) as fh:
+        return dict(line.rstrip("\n").split("=", 1) for line in fh)
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList
+
+
+PACKAGES = [{"id": 1, "name": "app"}, {"id": 2, "name": "web"}]
+
+
+@pytest.mark.asyncio
+async def testListManyPackagesAtOnce():
+
+    # Given
+    with FakeGitHub(packages=PACKAGES, versions={"app": versionList(250, tagEvery=2), "web": versionList(3, tagEvery=2)}) as fake:
+        async with g.AsyncGitHubClient("t", apiRoot=fake.url, concurrency=4, fetchWorkers=2) as client:
+
+            # When
+            packages, _ = await client.listPackages("container", org="o")
+            results = await asyncio.gather(*[client.listPackageVersions("container", package["name"], org="o",
+                                                                        exclude=[("metadata.container.tags[*]", ".*")])
+                                             for package in packages])
+
+    # Then
+    (app, appSummary), (web, _) = results
+    assert len(app) == 125
+    assert appSummary["items_fetched"] == 250
+    assert [item["id"] for item in web] == [1, 3]
+
+
+@pytest.mark.asyncio
+async def testVersionPagesStream():
+
+    # Given
+    with FakeGitHub(versions={"app": versionList(250, tagEvery=2)}) as fake:
+        async with g.AsyncGitHubClient("t", apiRoot=fake.url) as client:
+
+            # When
+            pages = [page async for page in client.packageVersionPages("container", "app", user="u")]
+
+    # Then
+    assert [len(page) for page in pages] == [100, 100, 50]
+
+
+@pytest.mark.asyncio
+async def testVersionPagesStopEarly():
+
+    # Given
+    with FakeGitHub(versions={"app": versionList(1000, tagEvery=2)}) as fake:
+        async with g.AsyncGitHubClient("t", apiRoot=fake.url) as client:
+
+            # When
+            async for page in client.packageVersionPages("container", "app", org="o"):
+                break
+
+    # Then
+    assert len(page) == 100
+    assert fake.requestCount("GET") == 1
+
+
+@pytest.mark.asyncio
+async def testPackagePagesStream():
+
+    # Given
+    with FakeGitHub(packages=PACKAGES) as fake:
+        async with g.AsyncGitHubClient("t", apiRoot=fake.url) as client:
+
+            # When
+            pages = [page async for page in client.packagePages("container", org="o")]
+
+    # Then
+    assert pages == [PACKAGES]
+
+
+@pytest.mark.asyncio
+async def testDeleteVersions():
+
+    # Given
+    with FakeGitHub(versions={"app": versionList(4, tagEvery=2)}) as fake:
+        async with g.AsyncGitHubClient("t", apiRoot=fake.url) as client:
+            versions, _ = await client.listPackageVersions("container", "app", org="o", exclude=[("metadata.container.tags[*]", ".*")])
+
+            # When
+            dryrun, dryrunSummary = await client.deletePackageVersions("container", "app", versions, org="o")
+            _, summary = await client.deletePackageVersions("container", "app", versions, org="o", dryrun=False, workers=2)
+
+    # Then
+    assert dryrunSummary["deleted"] == 2
+    assert summary["delete_results"] == {"1": "ok", "3": "ok"}
+    assert sorted(fake.deleted) == [1, 3]
+
+
+def testMainValidatesArgs():
+
+    # When / Then
+    with pytest.raises(AssertionError, match="one of '--org' or '--user'"):
+        g.main(["--operation", "listPackages", "--ghtoken", "t", "--package_type", "container"])
@@ -146,3 +146,39 @@ def testArgIsFalseWhenNone():
 
 #     # Then
 #     assert len(result) == 1
+
+
+def testArgFilterListDropsNones():
+
+    # Given
+    args = [[None, None], ["tags[*]", "latest"]]
+
+    # When
+    res = g._argFilterList(args)
+
+    # Then
+    assert res == [("tags[*]", "latest")]
+
+
+def testArgFilterListAllNones():
+
+    # Given
+    args = [[None, None]]
+
+    # When
+    res = g._argFilterList(args)
+
+    # Then
+    assert res is None
+
+
+def testArgFilterListSplitsPairs():
+
+    # Given
+    args = [["tags[*]", "develop-.*", "updated_at", "2024-.*"]]
+
+    # When
+    res = g._argFilterList(args)
+
+    # Then
+    assert res == [("tags[*]", "develop-.*"), ("updated_at", "2024-.*")]
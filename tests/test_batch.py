@@ -0,0 +1,60 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub
+
+
+PACKAGES = [{"id": 1, "name": "app-one"}, {"id": 2, "name": "app-two"}, {"id": 3, "name": "tool"}]
+VERSIONS = {
+    "app-one": [{"id": 10, "name": "keep"}, {"id": 11, "name": "drop"}],
+    "app-two": [{"id": 20, "name": "drop"}, {"id": 21, "name": "drop"}],
+    "tool": [{"id": 30, "name": "drop"}],
+}
+
+
+def _batch(client: g.GitHubClient, packageNames=None, packageNameRegex=None, dryrun=False) -> tuple[dict, dict]:
+    return g._batchDeletePackageVersions(summary={}, client=client, org="o", user=None, packageType="container",
+                                         packageNames=packageNames, packageNameRegex=packageNameRegex,
+                                         fetchLimit=1000, fetchWorkers=1, include=[("name", "drop")], exclude=None,
+                                         sortBy=None, sortReverse=None, slice=None, dryrun=dryrun, batchWorkers=2)
+
+
+def testBatchByPackageNames():
+
+    # Given
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        result, summary = _batch(client, packageNames=["app-one", "tool"])
+
+    # Then
+    assert sorted(fake.deleted) == [11, 30]
+    assert list(result.keys()) == ["app-one", "tool"]
+    assert summary["deleted"] == 2
+    assert summary["packages"]["app-one"]["items_fetched"] == 2
+
+
+def testBatchByPackageNameRegex():
+
+    # Given
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        result, summary = _batch(client, packageNameRegex="app-.*")
+
+    # Then
+    assert sorted(fake.deleted) == [11, 20, 21]
+    assert sorted(summary["packages"].keys()) == ["app-one", "app-two"]
+    assert summary["deleted"] == 3
+
+
+def testBatchContinuesPastFailedPackage():
+
+    # Given
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        result, summary = _batch(client, packageNames=["missing", "tool"])
+
+    # Then
+    assert fake.deleted == [30]
+    assert "404" in summary["packages"]["missing"]["error"]
+    assert summary["packages_failed"] == 1
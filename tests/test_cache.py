@@ -0,0 +1,74 @@
+import os
+import time
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList
+
+
+PATH = g.LIST_PACKAGE_VERSIONS_FOR_ORG.format(org="o", package_type="container", package_name="p")
+
+
+def testCacheServesNotModifiedPages(tmp_path):
+
+    # Given
+    cache = g.EtagCache(str(tmp_path))
+
+    # When
+    with FakeGitHub(versions={"p": versionList(250, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url, cache=cache) as client:
+        first, _ = g._pagedDataFetch(client, PATH, 1000, {})
+        second, _ = g._pagedDataFetch(client, PATH, 1000, {}, workers=2)
+
+    # Then
+    assert first == second
+    assert fake.notModified == 3
+    assert cache.misses == 3
+    assert cache.hits == 3
+
+
+def testCacheRefreshesChangedPages(tmp_path):
+
+    # Given
+    cache = g.EtagCache(str(tmp_path))
+
+    # When
+    with FakeGitHub(versions={"p": versionList(150, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url, cache=cache) as client:
+        g._pagedDataFetch(client, PATH, 1000, {})
+        fake.versions["p"].insert(0, {"id": 999})
+        result, _ = g._pagedDataFetch(client, PATH, 1000, {})
+
+    # Then
+    assert [item["id"] for item in result][:2] == [999, 0]
+    assert len(result) == 151
+    assert fake.notModified == 0
+
+
+def testCacheIgnoresExpiredEntries(tmp_path):
+
+    # Given
+    cache = g.EtagCache(str(tmp_path), maxAgeSeconds=60)
+    cache.store("u", '"etag"', None, [1])
+    path = cache._path("u")
+    os.utime(path, (time.time() - 120, time.time() - 120))
+
+    # When
+    entry = cache.load("u")
+
+    # Then
+    assert entry is None
+
+
+def testCacheEvictsLeastRecentlyUsed(tmp_path):
+
+    # Given
+    cache = g.EtagCache(str(tmp_path))
+    for i in range(5):
+        cache.store(f"u{i}", '"etag"', None, ["x" * 100])
+        os.utime(cache._path(f"u{i}"), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.maxBytes = os.path.getsize(cache._path("u0")) * 2
+
+    # When
+    removed = cache.evict()
+
+    # Then
+    assert removed == 3
+    assert cache.load("u0") is None
+    assert cache.load("u4") is not None
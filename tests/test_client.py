@@ -0,0 +1,89 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub
+
+
+PATH = g.LIST_PACKAGES_FOR_ORG.format(org="o", package_type="container")
+
+
+def testClientSendsHeadersOnce():
+
+    # Given
+    client = g.GitHubClient("secret")
+
+    # When
+    headers = client.session.headers
+
+    # Then
+    assert headers["Authorization"] == "Bearer secret"
+    assert headers["X-GitHub-Api-Version"] == "2022-11-28"
+
+
+def testClientUrlKeepsFullUrls():
+
+    # Given
+    client = g.GitHubClient("t", apiRoot="http://localhost:1/")
+
+    # When
+    relative = client.url("/orgs/o/packages")
+    full = client.url("https://api.github.com/orgs/o/packages?page=2")
+
+    # Then
+    assert relative == "http://localhost:1/orgs/o/packages"
+    assert full == "https://api.github.com/orgs/o/packages?page=2"
+
+
+def testClientRetriesServerErrors():
+
+    # Given
+    with FakeGitHub(packages=[{"id": 1}]) as fake, g.GitHubClient("t", apiRoot=fake.url, backoff=0) as client:
+        fake.failNext("GET", 502)
+        fake.failNext("GET", 429, {"Retry-After": "0"})
+
+        # When
+        response = client.get(PATH)
+
+    # Then
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1}]
+    assert fake.requestCount("GET") == 3
+
+
+def testClientGivesUpAfterRetries():
+
+    # Given
+    with FakeGitHub() as fake, g.GitHubClient("t", apiRoot=fake.url, retries=1, backoff=0) as client:
+        fake.failNext("GET", 500)
+        fake.failNext("GET", 503)
+
+        # When
+        response = client.get(PATH)
+
+    # Then
+    assert response.status_code == 503
+    assert fake.requestCount("GET") == 2
+
+
+def testClientDoesNotRetryClientErrors():
+
+    # Given
+    with FakeGitHub() as fake, g.GitHubClient("t", apiRoot=fake.url, backoff=0) as client:
+
+        # When
+        response = client.delete("/orgs/o/packages/container/p/versions/1")
+
+    # Then
+    assert response.status_code == 404
+    assert fake.requestCount("DELETE") == 1
+
+
+def testClientRetriesInjectedErrors():
+
+    # Given
+    with FakeGitHub(packages=[{"id": 1}], errorRate=1.0, errorStatuses=(502,)) as fake, g.GitHubClient("t", apiRoot=fake.url, retries=2, backoff=0) as client:
+
+        # When
+        response = client.get(PATH)
+
+    # Then
+    assert response.status_code == 502
+    assert fake.requestCount("GET") == 3
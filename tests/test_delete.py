@@ -0,0 +1,101 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList, mockResponse
+
+
+def testRateLimitWaitNotLimited():
+
+    # Given
+    response = mockResponse(204)
+
+    # When
+    res = g._rateLimitWaitSeconds(response)
+
+    # Then
+    assert res is None
+
+
+def testRateLimitWaitRetryAfter():
+
+    # Given
+    response = mockResponse(429, {"Retry-After": "7"})
+
+    # When
+    res = g._rateLimitWaitSeconds(response)
+
+    # Then
+    assert res == 7
+
+
+def testRateLimitWaitSecondaryWithoutRetryAfter():
+
+    # Given
+    response = mockResponse(403, {}, "You have exceeded a secondary rate limit")
+
+    # When
+    res = g._rateLimitWaitSeconds(response)
+
+    # Then
+    assert res == g.SECONDARY_RATE_LIMIT_WAIT_SECONDS
+
+
+def testRateLimitWaitPlainForbidden():
+
+    # Given
+    response = mockResponse(403, {}, "Must have admin rights")
+
+    # When
+    res = g._rateLimitWaitSeconds(response)
+
+    # Then
+    assert res is None
+
+
+def testDeleteContinuesAfterFailure():
+
+    # Given
+    itemList = [{"id": 1}, {"id": 2}, {"id": 3}]
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(3)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        fake.versions["p"].remove({"id": 2})
+        result, summary = g._deletePackageVersions(summary=summary, itemList=itemList, client=client, org="o", user=None,
+                                                   packageType="container", packageName="p", dryrun=False, workers=2)
+
+    # Then
+    assert summary["deleted"] == 2
+    assert summary["delete_failed"] == 1
+    assert summary["delete_results"] == {"1": "ok", "2": "fail [404]", "3": "ok"}
+
+
+def testDeleteRetriesWhenSecondaryRateLimited():
+
+    # Given
+    itemList = [{"id": 1}]
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(1)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        fake.failNext("DELETE", 403, {"Retry-After": "0"})
+        result, summary = g._deletePackageVersions(summary=summary, itemList=itemList, client=client, org=None, user="u",
+                                                   packageType="container", packageName="p", dryrun=False)
+
+    # Then
+    assert fake.requestCount("DELETE") == 2
+    assert summary["delete_results"] == {"1": "ok"}
+
+
+def testDeleteDryrunSendsNothing():
+
+    # Given
+    itemList = [{"id": 1}, {"id": 2}]
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(2)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._deletePackageVersions(summary=summary, itemList=itemList, client=client, org="o", user=None,
+                                                   packageType="container", packageName="p", dryrun=True)
+
+    # Then
+    assert fake.requestCount("DELETE") == 0
+    assert summary["deleted"] == 2
@@ -0,0 +1,102 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList
+
+
+PATH = g.LIST_PACKAGE_VERSIONS_FOR_USER.format(user="u", package_type="container", package_name="p")
+
+
+def testClientKeepsLatestRateLimit():
+
+    # Given
+    with FakeGitHub(versions={"p": versionList(250)}, rateLimit=5000, rateLimitReset=1700000000) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        g._pagedDataFetch(client, PATH, 1000, {})
+
+    # Then
+    assert client.calls == {"GET": 3}
+    assert client.rateLimit == {"limit": 5000, "remaining": 4997, "used": 3, "reset": 1700000000, "resource": "core"}
+
+
+def testDryrunDeleteDoesNotTouchTheApi():
+
+    # Given
+    itemList = [{"id": 1}, {"id": None}, {"id": 3}]
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(3)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._deletePackageVersions(summary=summary, itemList=itemList, client=client, org="o", user=None,
+                                                   packageType="container", packageName="p", dryrun=True, workers=4)
+
+    # Then
+    assert fake.requests == []
+    assert summary["delete_results"] == {"1": "ok[dryrun]", "3": "ok[dryrun]"}
+    assert summary["deleted"] == 2
+
+
+def testExecutionPlanWithinBudget():
+
+    # Given
+    with FakeGitHub(versions={"p": versionList(450)}, rateLimit=5000, rateLimitReset=2000) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        g._pagedDataFetch(client, PATH, 1000, {})
+        client.callSeconds = {"GET": 5.0}
+
+        # When
+        plan = g._executionPlan(client, deleteCalls=400, workers=4, now=1000)
+
+    # Then
+    assert plan["list_pages_fetched"] == 5
+    assert plan["delete_calls"] == 400
+    assert plan["rate_limit"]["remaining"] == 4995
+    assert plan["fits_rate_limit"] is True
+    assert plan["seconds_per_call"] == 1.0
+    # 100 rounds of 4 parallel deletes at 1s each, is faster than the secondary limit of 180 deletes a minute
+    assert plan["estimated_seconds"] == round(400 * g.DELETE_POINTS * 60 / g.SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE, 1)
+
+
+def testExecutionPlanCountsOnlyVersionPages():
+
+    # Given
+    with FakeGitHub(packages=[{"id": 1, "name": "p"}], versions={"p": versionList(250)}) as fake, g.GitHubClient("t", apiRoot=fake.url, backoff=0) as client:
+        g._pagedDataFetch(client, g.LIST_PACKAGES_FOR_USER.format(user="u", package_type="container"), 1000, {})
+        fake.failNext("GET", 502)
+        g._pagedDataFetch(client, PATH, 1000, {})
+
+        # When
+        plan = g._executionPlan(client, deleteCalls=1, workers=1)
+
+    # Then, not the package list, nor the retry
+    assert client.calls["GET"] == 5
+    assert plan["list_pages_fetched"] == 3
+
+
+def testExecutionPlanOverBudgetWaitsForReset():
+
+    # Given
+    with FakeGitHub(versions={"p": versionList(10)}, rateLimit=100, rateLimitReset=1600) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        g._pagedDataFetch(client, PATH, 1000, {})
+        client.callSeconds = {"GET": 2.0}
+
+        # When
+        plan = g._executionPlan(client, deleteCalls=250, workers=1, now=1000)
+
+    # Then
+    assert plan["fits_rate_limit"] is False
+    # 250 deletes at 2s each, plus 600s until the first reset, and 1 more full hour for the last 51 deletes
+    assert plan["estimated_seconds"] == 250 * 2 + 600 + 3600
+
+
+def testExecutionPlanWithoutRequests():
+
+    # Given
+    client = g.GitHubClient("t")
+
+    # When
+    plan = g._executionPlan(client, deleteCalls=10, workers=10)
+
+    # Then
+    assert plan["list_pages_fetched"] == 0
+    assert plan["rate_limit"] is None
+    assert plan["fits_rate_limit"] is True
+    assert plan["seconds_per_call"] == g.ESTIMATED_SECONDS_PER_CALL
@@ -0,0 +1,97 @@
+import pytest
+import ghpkgadmin as g
+
+
+@pytest.fixture
+def itemList():
+    itemList = [
+        {"id": 0, "tags": ["develop-1"], "updated_at": "2024-01-01"},
+        {"id": 1, "tags": ["develop-2", "latest"], "updated_at": "2024-02-01"},
+        {"id": 2, "tags": ["v1-3"], "updated_at": "2024-01-15"},
+        {"id": 3, "tags": [], "updated_at": "2024-03-01"},
+    ]
+    yield itemList
+
+
+def testAndModeMustMatchAllIncludes(itemList):
+
+    # Given
+    plan = g._FilterPlan(include=[("tags[*]", "develop-.*"), ("updated_at", "2024-01")], exclude=[], mode=g.FILTER_MODE.AND)
+
+    # When
+    result, includedCount = plan.filter(itemList)
+
+    # Then
+    assert [item["id"] for item in result] == [0]
+    assert includedCount == 1
+
+
+def testOrModeMatchesAnyInclude(itemList):
+
+    # Given
+    plan = g._FilterPlan(include=[("tags[*]", "develop-.*"), ("updated_at", "2024-01")], exclude=[], mode=g.FILTER_MODE.OR)
+
+    # When
+    result, includedCount = plan.filter(itemList)
+
+    # Then
+    assert [item["id"] for item in result] == [0, 1, 2]
+
+
+def testIncludeAndExcludeTogether(itemList):
+
+    # Given
+    plan = g._FilterPlan(include=[("tags[*]", "develop-.*")], exclude=[("tags[*]", "latest")])
+
+    # When
+    result, includedCount = plan.filter(itemList)
+
+    # Then
+    assert [item["id"] for item in result] == [0]
+    assert includedCount == 2
+
+
+def testAndModeExcludesOnAnyExclude(itemList):
+
+    # Given
+    plan = g._FilterPlan(include=[], exclude=[("tags[*]", "latest"), ("tags[*]", "v1-.*")], mode=g.FILTER_MODE.AND)
+
+    # When
+    result, includedCount = plan.filter(itemList)
+
+    # Then
+    assert [item["id"] for item in result] == [0, 3]
+    assert includedCount == 4
+
+
+def testEachPathExtractedOncePerItem(itemList):
+
+    # Given
+    plan = g._FilterPlan(include=[("tags[*]", "develop-.*"), ("tags[*]", ".*-[12]")], exclude=[("tags[*]", "latest")])
+    calls = []
+    valuesAt = plan._valuesAt["tags[*]"]
+    plan._valuesAt["tags[*]"] = lambda item: calls.append(item["id"]) or valuesAt(item)
+
+    # When
+    plan.filter(itemList)
+
+    # Then
+    assert calls == [0, 1, 2, 3]
+
+
+def testFilterAndSortWithManyFilters(itemList):
+
+    # Given
+    summary: dict = {}
+
+    # When
+    result, summary = g._filterAndSortListResponseJson(itemList=itemList,
+                                                       include=[("tags[*]", "develop-.*"), ("tags[*]", "v1-.*")],
+                                                       exclude=[("tags[*]", "latest")],
+                                                       sortBy="updated_at", sortReverse=True, slice=None,
+                                                       summary=summary, filterMode=g.FILTER_MODE.OR)
+
+    # Then
+    assert [item["id"] for item in result] == [2, 0]
+    assert summary["include_filter_result"] == 3
+    assert summary["exclude_filter_result"] == 2
@@ -42,3 +42,42 @@ def testIncludeSimpleMatcheAll(itemList):
 
 #     # Then
 #     assert len(result) == 1
+
+
+def testIncludeMatchesAtChildLevelOnce(itemList):
+
+    # Given
+    summary = {}
+
+    # When
+    result, summary = g._includeFilter(itemList=itemList, include=("children[*].id", "[bd]"), summary=summary)
+
+    # Then
+    assert [item["id"] for item in result] == [1, 3]
+    assert summary["include_filter_result"] == 2
+
+
+def testExcludeKeepsOriginalOrder(itemList):
+
+    # Given
+    summary = {}
+
+    # When
+    result, summary = g._excludeFilter(itemList=itemList, exclude=("children[*].id", "[ac]1"), summary=summary)
+
+    # Then
+    assert [item["id"] for item in result] == [1, 3]
+    assert summary["exclude_filter_result"] == 2
+
+
+def testIncludeMalformedRegex(itemList):
+
+    # Given
+    summary = {}
+
+    # When
+    with pytest.raises(Exception) as e:
+        g._includeFilter(itemList=itemList, include=("name", "(unclosed"), summary=summary)
+
+    # Then
+    assert "Malformed regex in include filter" in str(e.value)
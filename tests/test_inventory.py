@@ -0,0 +1,63 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, containerVersion
+
+
+PACKAGES = [
+    {"id": 1, "name": "app", "package_type": "container"},
+    {"id": 2, "name": "lib", "package_type": "npm"},
+    {"id": 3, "name": "gone", "package_type": "maven"}
+]
+
+
+VERSIONS = {
+    "app": [
+        containerVersion(10, "2024-03-01T00:00:00Z", ["v1"]),
+        containerVersion(11, "2024-01-01T00:00:00Z", []),
+        containerVersion(12, "2024-05-01T00:00:00Z", []),
+    ],
+    "lib": [{"id": 20, "name": "1.0.0", "updated_at": "2023-06-01T00:00:00Z"}]
+}
+
+
+def testInventoryReportsEveryPackage():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._inventory(summary=summary, client=client, org="o", user=None, packageTypes=g.PACKAGE_TYPES,
+                                       fetchLimit=1000, fetchWorkers=1, workers=2)
+
+    # Then
+    lib, gone, app = result
+    assert app["versions"] == 3
+    assert app["untagged"] == 2
+    assert app["oldest"] == {"id": 11, "name": "sha256:11", "updated_at": "2024-01-01T00:00:00+00:00"}
+    assert app["newest"]["id"] == 12
+    assert lib["versions"] == 1
+    assert lib["untagged"] is None
+    assert lib["oldest"] == lib["newest"]
+    assert "404" in gone["error"]
+    assert summary["packages"] == 3
+    assert summary["versions"] == 4
+    assert summary["untagged"] == 2
+    assert summary["packages_failed"] == 1
+    assert summary["package_types"]["container"] == {"packages": 1, "versions": 3, "untagged": 2}
+    assert summary["package_types"]["docker"] == {"packages": 0}
+
+
+def testInventoryOfOneType():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._inventory(summary=summary, client=client, org=None, user="u", packageTypes=["npm"],
+                                       fetchLimit=1000, fetchWorkers=1)
+
+    # Then
+    assert [r["name"] for r in result] == ["lib"]
+    assert list(summary["package_types"]) == ["npm"]
+    assert summary["packages_failed"] == 0
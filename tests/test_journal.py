@@ -0,0 +1,107 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList
+
+
+def testJournalUnfinished(tmp_path):
+
+    # Given
+    journal = g.DeleteJournal(str(tmp_path / "journal.jsonl"))
+    journal.planned("p", [1, 2, 3, 4])
+    journal.planned("other", [9])
+    journal.completed("p", 1, "ok")
+    journal.completed("p", 3, "fail [500]")
+
+    # When
+    res = journal.unfinished("p")
+
+    # Then
+    assert res == [2, 3, 4]
+
+
+def testJournalIgnoresTruncatedLine(tmp_path):
+
+    # Given
+    path = tmp_path / "journal.jsonl"
+    journal = g.DeleteJournal(str(path))
+    journal.planned("p", [1, 2])
+    with open(path, "a") as fh:
+        fh.write('{"event": "deleted", "pack')
+
+    # When
+    res = journal.unfinished("p")
+
+    # Then
+    assert res == [1, 2]
+
+
+def testJournalMissingFile(tmp_path):
+
+    # Given
+    journal = g.DeleteJournal(str(tmp_path / "missing.jsonl"))
+
+    # When
+    res = journal.unfinished("p")
+
+    # Then
+    assert res == []
+
+
+def testDeleteRecordsJournalAndResumes(tmp_path):
+
+    # Given
+    journal = g.DeleteJournal(str(tmp_path / "journal.jsonl"))
+    itemList = [{"id": 1}, {"id": 2}, {"id": 3}]
+
+    with FakeGitHub(versions={"p": versionList(3)}) as fake, g.GitHubClient("t", apiRoot=fake.url, retries=0) as client:
+        fake.failNext("DELETE", 500)
+
+        # When
+        _, firstSummary = g._deletePackageVersions(summary={}, itemList=itemList, client=client, org="o", user=None,
+                                                   packageType="container", packageName="p", dryrun=False, journal=journal)
+        unfinished = journal.unfinished("p")
+        _, secondSummary = g._deletePackageVersions(summary={}, itemList=[{"id": id} for id in unfinished], client=client, org="o", user=None,
+                                                    packageType="container", packageName="p", dryrun=False, journal=journal)
+
+    # Then
+    assert firstSummary["delete_failed"] == 1
+    assert len(unfinished) == 1
+    assert secondSummary["deleted"] == 1
+    assert sorted(fake.deleted) == [1, 2, 3]
+    assert journal.unfinished("p") == []
+
+
+def testResumeCountsAlreadyGoneAsDeleted(tmp_path):
+
+    # Given
+    journal = g.DeleteJournal(str(tmp_path / "journal.jsonl"))
+    journal.planned("p", [1, 2, 3])
+    journal.completed("p", 1, "ok")
+
+    # The killed run's delete of 2 finished on the server, but never made it into the journal
+    with FakeGitHub(versions={"p": versionList(3)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        fake.versions["p"].remove({"id": 1})
+        fake.versions["p"].remove({"id": 2})
+
+        # When
+        _, summary = g._deletePackageVersions(summary={}, itemList=[{"id": id} for id in journal.unfinished("p")], client=client, org="o", user=None,
+                                              packageType="container", packageName="p", dryrun=False, journal=journal, resuming=True)
+
+    # Then
+    assert summary["delete_results"] == {"2": "ok [gone]", "3": "ok"}
+    assert summary["delete_failed"] == 0
+    assert journal.unfinished("p") == []
+
+
+def testDryrunDoesNotJournal(tmp_path):
+
+    # Given
+    path = tmp_path / "journal.jsonl"
+    journal = g.DeleteJournal(str(path))
+
+    # When
+    with FakeGitHub(versions={"p": versionList(2)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        g._deletePackageVersions(summary={}, itemList=[{"id": 1}, {"id": 2}], client=client, org="o", user=None,
+                                 packageType="container", packageName="p", dryrun=True, journal=journal)
+
+    # Then
+    assert not path.exists()
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import jsonpath_ng  # type: ignore
+import pytest
+import ghpkgadmin as g
+
+
+ITEM = {"id": 1, "name": "a", "metadata": {"container": {"tags": ["v1", "latest"]}}, "list": [{"k": 1}, {"k": 2}]}
+PATHS = ["id", "$.name", "metadata.container.tags[*]", "metadata.container.tags[0]", "list[*].k", "$..k", "metadata.*.tags"]
+
+
+def testImportDoesNotLoadJsonPath():
+
+    # When
+    res = subprocess.run([sys.executable, "-c", "import sys, ghpkgadmin; print('jsonpath_ng' in sys.modules)"],
+                         capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Then
+    assert res.stdout.strip() == "False"
+
+
+def testSharedParserMatchesJsonPath():
+
+    # When / Then
+    for path in PATHS:
+        assert str(g._parseJsonPath(path)) == str(jsonpath_ng.parse(path))
+        assert [m.value for m in g._parseJsonPath(path).find(ITEM)] == [m.value for m in jsonpath_ng.parse(path).find(ITEM)]
+
+
+def testSharedParserMalformedPath():
+
+    # When / Then
+    with pytest.raises(Exception):
+        g._parseJsonPath("metadata[")
+    assert g._parseJsonPath("id").find(ITEM)[0].value == 1
+
+
+def testParserFromPrecompiledTables(tmp_path, monkeypatch):
+
+    # Given, the tables are read without ever building the grammar
+    import ply.yacc  # type: ignore
+    expected = str(jsonpath_ng.parse("metadata.container.tags[*]"))
+    g._writeJsonPathTables(str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(ply.yacc, "yacc", None)
+
+    # When
+    parser = g._buildJsonPathParser()
+    sys.modules.pop(g._jsonPathTablesModule(), None)
+
+    # Then
+    tokens = jsonpath_ng.parser.IteratorToTokenStream(jsonpath_ng.lexer.JsonPathLexer().tokenize("metadata.container.tags[*]"))
+    assert str(parser.parse(lexer=tokens)) == expected
+
+
+def testFastFieldPathMatchesJsonPath():
+
+    # Given
+    items = [ITEM, {}, [], None, 7, {"id": None}, {"id": 0}, {"id": ""}, {"id": []}, {"id": {}}, {"id": False}, {"id": True},
+             {"id": -1}, {"id": "abc"}, {"id": ["a", "b"]}, {"id": {"k": 1}}, {"id": [{"k": 1}]}, {"metadata": []},
+             {"metadata": {"container": None}}, {"metadata": {"container": {"tags": "v1"}}}, {"metadata": {"container": {"tags": []}}}]
+    paths = ["id", "$.id", "id[*]", "id.k", "metadata.container.tags", "metadata.container.tags[*]", "$.metadata.container"]
+
+    # When / Then
+    for path in paths:
+        fastPath = g._fastFieldPath(path)
+        assert fastPath is not None
+        for item in items:
+            assert fastPath(item) == [m.value for m in jsonpath_ng.parse(path).find(item)], (path, item)
+
+
+def testFastFieldPathLeavesOtherPaths():
+
+    # When / Then
+    for path in ["metadata.container.tags[0]", "list[*].k", "$..k", "metadata.*.tags", "where", "id where name"]:
+        assert g._fastFieldPath(path) is None
+
+
+def testCompiledPathsAreShared(monkeypatch):
+
+    # Given, a simple path never needs the parser
+    monkeypatch.setattr(g, "_parseJsonPath", None)
+    g._compileFieldPath.cache_clear()
+
+    # When
+    first = g._compileFieldPath("metadata.container.tags[*]")
+    second = g._compileFieldPath("metadata.container.tags[*]")
+
+    # Then
+    assert first is second
+    assert first(ITEM) == ["v1", "latest"]
+    assert g._compileFieldPath.cache_info().hits == 1
@@ -0,0 +1,125 @@
+import io
+import json
+import pytest
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, actionOutputs
+
+
+RESULT = [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+
+
+def testWriteResultNdjson():
+
+    # Given
+    fh = io.StringIO()
+
+    # When
+    g._writeResult(RESULT, fh, g.OUTPUT_FORMAT.NDJSON, pretty=False)
+
+    # Then
+    assert fh.getvalue() == '{"id":1,"name":"a"}\n{"id":2,"name":"b"}\n'
+
+
+def testWriteResultNdjsonSingleObject():
+
+    # Given
+    fh = io.StringIO()
+
+    # When
+    g._writeResult({"a": [1]}, fh, g.OUTPUT_FORMAT.NDJSON, pretty=True)
+
+    # Then
+    assert fh.getvalue() == '{"a":[1]}\n'
+
+
+def testWriteResultJsonCompactByDefault():
+
+    # Given
+    fh = io.StringIO()
+
+    # When
+    g._writeResult(RESULT, fh, g.OUTPUT_FORMAT.JSON, pretty=False)
+
+    # Then
+    assert "\n" not in fh.getvalue().strip()
+    assert json.loads(fh.getvalue()) == RESULT
+
+
+def testWriteResultJsonPretty():
+
+    # Given
+    fh = io.StringIO()
+
+    # When
+    g._writeResult(RESULT, fh, g.OUTPUT_FORMAT.JSON, pretty=True)
+
+    # Then
+    assert fh.getvalue() == json.dumps(RESULT, indent=4) + "\n"
+
+
+@pytest.fixture
+def actionEnv(tmp_path, monkeypatch):
+    outputPath = tmp_path / "output"
+    outputPath.write_text("")
+    monkeypatch.setenv("GITHUB_OUTPUT", str(outputPath))
+    monkeypatch.delenv("GITHUB_WORKSPACE", raising=False)
+    return outputPath
+
+
+def _main(monkeypatch, versions: list[dict], *args: str) -> int:
+    with FakeGitHub(versions={"p": versions}) as fake:
+        monkeypatch.setenv("GITHUB_API_URL", fake.url)
+        return g.main(["--operation", "listPackageVersions", "--ghtoken", "t", "--user", "u", "--package_type", "container",
+                       "--package_name", "p", *args])
+
+
+def testNdjsonResultIsWrittenToTheWorkspace(tmp_path, monkeypatch, actionEnv):
+
+    # Given
+    monkeypatch.setenv("GITHUB_WORKSPACE", str(tmp_path))
+
+    # When
+    _main(monkeypatch, [{"id": 1}, {"id": 2}], "--output_format", "ndjson")
+
+    # Then
+    outputs = actionOutputs(actionEnv)
+    assert outputs == {"result_file": g.NDJSON_RESULT_FILE_NAME}
+    assert (tmp_path / g.NDJSON_RESULT_FILE_NAME).read_text() == '{"id":1}\n{"id":2}\n'
+
+
+def testNdjsonResultWithoutWorkspaceWarns(monkeypatch, actionEnv, capsys):
+
+    # When
+    _main(monkeypatch, [{"id": 1}], "--output_format", "ndjson")
+
+    # Then
+    assert actionOutputs(actionEnv) == {}
+    assert "Warning: An ndjson result can not be set as the result_json_output" in capsys.readouterr().out
+
+
+def testLargeResultWithoutWorkspaceWarns(monkeypatch, actionEnv, capsys):
+
+    # Given
+    monkeypatch.setattr(g, "ACTION_OUTPUT_MAX_BYTES", 10)
+
+    # When
+    _main(monkeypatch, [{"id": 1}, {"id": 2}])
+
+    # Then
+    assert actionOutputs(actionEnv) == {}
+    assert "Warning: The result_json_output is too large for an action output" in capsys.readouterr().out
+
+
+def testLargeSummaryIsWrittenToTheWorkspace(tmp_path, monkeypatch, actionEnv):
+
+    # Given
+    monkeypatch.setenv("GITHUB_WORKSPACE", str(tmp_path))
+    monkeypatch.setattr(g, "ACTION_OUTPUT_MAX_BYTES", 100)
+
+    # When
+    _main(monkeypatch, [{"id": 1}], "--summary", "true")
+
+    # Then
+    outputs = actionOutputs(actionEnv)
+    assert outputs == {"summary_file": g.SUMMARY_FILE_NAME}
+    assert json.loads((tmp_path / g.SUMMARY_FILE_NAME).read_text())["args"]["ghtoken"] == "***"
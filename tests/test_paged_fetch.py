@@ -0,0 +1,137 @@
+from unittest.mock import Mock
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList
+from benchmarks.synthetic import SyntheticVersions
+
+
+PATH = g.LIST_PACKAGE_VERSIONS_FOR_USER.format(user="u", package_type="container", package_name="p")
+
+
+def testLastPageNumber():
+
+    # Given
+    response = Mock()
+    response.links = {"last": {"url": "https://api.github.com" + PATH + "&per_page=100&page=42"}}
+
+    # When
+    res = g._lastPageNumber(response)
+
+    # Then
+    assert res == 42
+
+
+def testLastPageNumberSinglePage():
+
+    # Given
+    response = Mock()
+    response.links = {}
+
+    # When
+    res = g._lastPageNumber(response)
+
+    # Then
+    assert res is None
+
+
+def testPagedFetchParallelKeepsOrder():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(950, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._pagedDataFetch(client, PATH, 1000, summary, workers=4)
+
+    # Then
+    assert [item["id"] for item in result] == list(range(950))
+    assert summary["items_fetched"] == 950
+
+
+def testPagedFetchParallelStopsAtLimit():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(5000, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._pagedDataFetch(client, PATH, 250, summary, workers=4)
+
+    # Then
+    assert fake.requestCount("GET") == 3
+    assert [item["id"] for item in result] == list(range(250))
+
+
+def testPagedFetchSerialMatchesParallel():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(420, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        serial, _ = g._pagedDataFetch(client, PATH, 1000, summary, workers=1)
+        parallel, _ = g._pagedDataFetch(client, PATH, 1000, summary, workers=3)
+
+    # Then
+    assert serial == parallel
+
+
+def testPagedGeneratorYieldsPages():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(250, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        pages = list(g._pagedDataGenerator(client, PATH, 1000, summary))
+
+    # Then
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert summary["items_fetched"] == 250
+
+
+def testFilterAndSortPagesStopsAtSliceEnd():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(5000, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        pages = g._pagedDataGenerator(client, PATH, 5000, summary)
+        result, summary = g._filterAndSortPages(pages=pages, include=[("id", "[0-9]*[05]$")], exclude=None,
+                                                sortBy=None, sortReverse=None, slice=(None, 30), summary=summary)
+
+    # Then
+    assert fake.requestCount("GET") == 2
+    assert [item["id"] for item in result] == list(range(0, 150, 5))
+    assert summary["include_filter_result"] == 40
+
+
+def testFilterAndSortPagesFetchesAllWhenSorting():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": versionList(500, start=0)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        pages = g._pagedDataGenerator(client, PATH, 5000, summary, workers=2)
+        result, summary = g._filterAndSortPages(pages=pages, include=None, exclude=None,
+                                                sortBy="id", sortReverse=True, slice=(None, 3), summary=summary)
+
+    # Then
+    assert fake.requestCount("GET") == 5
+    assert [item["id"] for item in result] == [499, 498, 497]
+    assert summary["items_found"] == 500
+
+
+def testPagedFetchFromSyntheticVersions():
+
+    # Given
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions={"p": SyntheticVersions(1234)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._pagedDataFetch(client, PATH, 5000, summary, workers=4)
+
+    # Then
+    assert [item["id"] for item in result] == list(range(1234))
+    assert result[7] == SyntheticVersions(1234)[7]
@@ -0,0 +1,114 @@
+import json
+import pytest
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, containerVersion
+
+
+TAGS = g.CONTAINER_TAGS_PATH
+
+
+VERSIONS = {"p": [
+    containerVersion(1, "2024-01-09T00:00:00Z", ["develop-9"]),
+    containerVersion(2, "2024-01-08T00:00:00Z", []),
+    containerVersion(3, "2024-01-07T00:00:00Z", ["develop-7"]),
+    containerVersion(4, "2024-01-06T00:00:00Z", ["develop-6", "v1-6"]),
+    containerVersion(5, "2024-01-05T00:00:00Z", ["v1-5"]),
+    containerVersion(6, "2024-01-04T00:00:00Z", []),
+]}
+
+
+def _writePlan(tmp_path, plan: dict) -> str:
+    path = tmp_path / "plan.json"
+    path.write_text(json.dumps(plan))
+    return str(path)
+
+
+def testLoadPlan(tmp_path):
+
+    # Given
+    path = _writePlan(tmp_path, {"rules": [
+        {"name": "untagged", "exclude": [TAGS, ".*"]},
+        {"include": [[TAGS, "develop-.*"], [TAGS, "v1-.*"]], "filter_mode": "or", "sort_by": "updated_at", "reverse": True, "slice": [1, None]},
+    ]})
+
+    # When
+    rules = g._loadPlan(path)
+
+    # Then
+    assert rules[0]["name"] == "untagged"
+    assert rules[0]["exclude"] == [(TAGS, ".*")]
+    assert rules[1]["name"] == "rule-2"
+    assert rules[1]["filter_mode"] == g.FILTER_MODE.OR
+    assert rules[1]["slice"] == (1, None)
+
+
+def testPlanRuleSortsNewestFirstByDefault(tmp_path):
+
+    # Given, a rule copied from a command line that keeps the newest develop version
+    rules = g._loadPlan(_writePlan(tmp_path, {"rules": [{"name": "develop", "include": [TAGS, "develop-.*"], "sort_by": "updated_at", "slice": [1, None]}]}))
+
+    # When
+    with FakeGitHub(versions={"p": [dict(version) for version in VERSIONS["p"]]}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, _ = g._deletePackageVersionsByPlan(summary={}, client=client, org=None, user="u", packageType="container",
+                                                   packageName="p", fetchLimit=1000, fetchWorkers=1, rules=rules, dryrun=True)
+
+    # Then
+    assert rules[0]["reverse"] is True
+    assert [item["id"] for item in result] == [3, 4]
+
+
+def testLoadPlanUnknownOption(tmp_path):
+
+    # Given
+    path = _writePlan(tmp_path, {"rules": [{"name": "typo", "sortby": "updated_at"}]})
+
+    # When
+    with pytest.raises(AssertionError) as e:
+        g._loadPlan(path)
+
+    # Then
+    assert "sortby" in str(e.value)
+
+
+def testPlanFetchesOnceAndDeletesTheUnion(tmp_path):
+
+    # Given
+    rules = g._loadPlan(_writePlan(tmp_path, {"rules": [
+        {"name": "untagged", "exclude": [TAGS, ".*"]},
+        {"name": "develop", "include": [TAGS, "develop-.*"], "sort_by": "updated_at", "reverse": True, "slice": [1, None]},
+        {"name": "v1", "include": [TAGS, "v1-.*"], "sort_by": "updated_at", "reverse": True, "slice": [1, None]},
+    ]}))
+
+    # When
+    with FakeGitHub(versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._deletePackageVersionsByPlan(summary={}, client=client, org=None, user="u", packageType="container",
+                                                         packageName="p", fetchLimit=1000, fetchWorkers=1, rules=rules, dryrun=False)
+
+    # Then
+    assert fake.requestCount("GET") == 1
+    assert [item["id"] for item in result] == [2, 3, 4, 5, 6]
+    assert sorted(fake.deleted) == [2, 3, 4, 5, 6]
+    assert fake.requestCount("DELETE") == 5
+    assert summary["selected_by"] == {"2": ["untagged"], "3": ["develop"], "4": ["develop"], "5": ["v1"], "6": ["untagged"]}
+    assert summary["rules"]["develop"]["selected"] == 2
+
+
+def testPlanListsThroughTheVersionIndex(tmp_path):
+
+    # Given
+    rules = g._loadPlan(_writePlan(tmp_path, {"rules": [{"name": "untagged", "exclude": [TAGS, ".*"]}]}))
+    index = g.VersionIndex(str(tmp_path / "index"))
+    versions = {"p": [dict(version) for version in VERSIONS["p"]]}
+
+    # When
+    with FakeGitHub(versions=versions) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _, first = g._deletePackageVersionsByPlan(summary={}, client=client, org=None, user="u", packageType="container",
+                                                  packageName="p", fetchLimit=1000, fetchWorkers=1, rules=rules, dryrun=False)
+        result, second = g._deletePackageVersionsByPlan(summary={}, client=client, org=None, user="u", packageType="container",
+                                                        packageName="p", fetchLimit=1000, fetchWorkers=1, rules=rules, dryrun=False)
+
+    # Then, the 2nd run is an incremental sync of the snapshot the first run's deletes were removed from
+    assert first["index"]["sync"] == "full"
+    assert second["index"]["sync"] == "incremental"
+    assert result == []
+    assert sorted(fake.deleted) == [2, 6]
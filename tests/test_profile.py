@@ -0,0 +1,88 @@
+import pstats
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, versionList
+
+
+PATH = g.LIST_PACKAGE_VERSIONS_FOR_USER.format(user="u", package_type="container", package_name="p")
+
+
+def testStageTimesAddsUp():
+
+    # Given
+    stages = g._StageTimes()
+
+    # When
+    with stages.stage("filter", 100):
+        pass
+    with stages.stage("filter", 50):
+        pass
+    stages.add("sort", 1.23456, 150)
+
+    # Then
+    report = stages.report()
+    assert report["filter"]["calls"] == 2
+    assert report["filter"]["items"] == 150
+    assert report["sort"] == {"calls": 1, "seconds": 1.2346, "items": 150}
+
+
+def testStageTimesRecordsFailedStages():
+
+    # Given
+    stages = g._StageTimes()
+
+    # When
+    try:
+        with stages.stage("delete", 3):
+            raise ValueError()
+    except ValueError:
+        pass
+
+    # Then
+    assert stages.report()["delete"]["calls"] == 1
+
+
+def testPipelineStagesAreTimed():
+
+    # Given
+    g._stages = g._StageTimes()
+    versions = {"p": [{"id": i, "tag": str(i)} for i in range(250)]}
+
+    # When
+    with FakeGitHub(versions=versions) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        g._listPackageVersions(summary={}, client=client, org=None, user="u", packageType="container", packageName="p",
+                               fetchLimit=1000, fetchWorkers=2, include=[("tag", "1.*")], exclude=None,
+                               sortBy="id", sortReverse=False, slice=None, fields=["id"])
+        http = client.httpReport()
+
+    # Then
+    report = g._stages.report()
+    assert report["json_decode"]["items"] == 250
+    assert report["projection"]["items"] == 250
+    assert report["filter"]["items"] == 250
+    assert report["sort"]["items"] == 111
+    assert http["GET"]["calls"] == 3
+    assert http["GET"]["bytes"] > 0
+    assert http["GET"]["slowest_seconds"] <= http["GET"]["seconds"]
+
+
+def testMainResetsStagesAndProfilesWorkerThreads(tmp_path, monkeypatch):
+
+    # Given
+    profilePath = tmp_path / "ghpkgadmin.prof"
+    outputPath = tmp_path / "output"
+    outputPath.write_text("")
+    monkeypatch.setenv("GITHUB_OUTPUT", str(outputPath))
+    g._stages.add("delete", 1.0, 99)
+    args = ["--operation", "deletePackageVersions", "--ghtoken", "t", "--user", "u", "--package_type", "container", "--package_name", "p",
+            "--dryrun", "false", "--profile", "true", "--profile_file", str(profilePath)]
+
+    # When
+    with FakeGitHub(versions={"p": versionList(3)}) as fake:
+        monkeypatch.setenv("GITHUB_API_URL", fake.url)
+        exitCode = g.main(args)
+
+    # Then, the deletes ran on a worker thread
+    functions = {name for _, _, name in pstats.Stats(str(profilePath)).stats}
+    assert exitCode == 0
+    assert "_deletePackageVersion" in functions
+    assert g._stages.report()["delete"]["items"] == 3
@@ -0,0 +1,100 @@
+import pytest
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub
+
+
+VERSION = {
+    "id": 7,
+    "name": "sha256:7",
+    "url": "https://api.github.com/7",
+    "html_url": "https://github.com/7",
+    "updated_at": "2024-01-01T00:00:00Z",
+    "metadata": {"package_type": "container", "container": {"tags": ["v1", "latest"]}}
+}
+
+
+def testFieldKeys():
+
+    # When / Then
+    assert g._fieldKeys("id") == ["id"]
+    assert g._fieldKeys("$.metadata.container.tags[*]") == ["metadata", "container", "tags"]
+    assert g._fieldKeys("metadata.container.tags[0]") == ["metadata", "container", "tags"]
+    assert g._fieldKeys("$..tags") is None
+    assert g._fieldKeys("metadata[*].tags") is None
+
+
+def testProjectionKeepsNesting():
+
+    # Given
+    projection = g._Projection(["id", "metadata.container.tags[*]", "missing.field"])
+
+    # When
+    res = projection(VERSION)
+
+    # Then
+    assert res == {"id": 7, "metadata": {"container": {"tags": ["v1", "latest"]}}}
+    assert VERSION["metadata"]["package_type"] == "container"
+
+
+def testProjectionFieldInsideAnotherField():
+
+    # Given
+    projection = g._Projection(["metadata.container", "metadata", "id", "id"])
+
+    # When
+    res = projection(VERSION)
+
+    # Then
+    assert res == {"metadata": VERSION["metadata"], "id": 7}
+
+
+def testProjectionMalformedField():
+
+    # When / Then
+    with pytest.raises(Exception, match="Malformed field"):
+        g._Projection(["$..tags"])
+
+
+def testPipelineProjectionKeepsWhatTheRulesRead():
+
+    # Given
+    retention = g._RetentionRules(olderThanDays=1, keepNewest=(1, "(.*)"))
+
+    # When
+    projection = g._pipelineProjection(["name"], include=[("metadata.container.tags[*]", "v.*")], exclude=None,
+                                       sortBy="updated_at", retention=retention)
+
+    # Then
+    assert projection is not None
+    assert projection(VERSION) == {"name": "sha256:7", "id": 7, "updated_at": "2024-01-01T00:00:00Z",
+                                   "metadata": {"container": {"tags": ["v1", "latest"]}}}
+
+
+def testPipelineProjectionNotPossible():
+
+    # When
+    projection = g._pipelineProjection(["name"], include=[("$..tags[*]", "v.*")], exclude=None, sortBy=None, retention=None)
+
+    # Then
+    assert projection is None
+
+
+def testListPackageVersionsProjectsEachPage():
+
+    # Given
+    versions = {"p": [{**VERSION, "id": i} for i in range(150)]}
+    summary: dict = {}
+
+    # When
+    with FakeGitHub(versions=versions) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._listPackageVersions(summary=summary, client=client, org="o", user=None, packageType="container",
+                                                 packageName="p", fetchLimit=1000, fetchWorkers=2,
+                                                 include=[("metadata.container.tags[*]", "latest")], exclude=None,
+                                                 sortBy="id", sortReverse=True, slice=(None, 2), fields=["updated_at"])
+
+    # Then
+    assert result == [
+        {"updated_at": "2024-01-01T00:00:00Z", "id": 149, "metadata": {"container": {"tags": ["v1", "latest"]}}},
+        {"updated_at": "2024-01-01T00:00:00Z", "id": 148, "metadata": {"container": {"tags": ["v1", "latest"]}}}
+    ]
+    assert summary["include_filter_result"] == 150
@@ -0,0 +1,140 @@
+from datetime import datetime, timezone
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, containerVersion
+
+
+def _versions(count: int) -> list[dict]:
+    """ Newest first. Every 3rd version is tagged """
+    return [containerVersion(i, f"2024-01-{1 + i % 28:02d}T00:00:00Z", [f"v{i}"] if i % 3 == 0 else []) for i in range(count, 0, -1)]
+
+
+def _purge(client: g.GitHubClient, **kwargs) -> tuple[list[dict], dict]:
+    args = {"fetchLimit": 5000, "fetchWorkers": 3, "dryrun": False, "deleteWorkers": 4, **kwargs}
+    return g._purgeUntaggedContainerVersions(summary={}, client=client, org="o", user=None, packageName="p", **args)
+
+
+def testIsUntaggedMatchesExcludeFilter():
+
+    # Given
+    items = [{"id": 1}, {"id": 2, "metadata": None}, {"id": 3, "metadata": {"container": {}}}, {"id": 4, "metadata": {"container": {"tags": None}}},
+             {"id": 5, "metadata": {"container": {"tags": []}}}, {"id": 6, "metadata": {"container": {"tags": ["v1"]}}},
+             {"id": 7, "metadata": {"container": {"tags": [""]}}}, {"id": 8, "metadata": {"container": {"tags": "v1"}}}]
+
+    # When
+    excluded, _ = g._excludeFilter(items, ("metadata.container.tags[*]", ".*"), {})
+
+    # Then
+    assert [item for item in items if g._isUntagged(item)] == excluded
+
+
+def testPurgeDeletesEveryUntaggedVersion():
+
+    # Given
+    with FakeGitHub(versions={"p": _versions(450)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        result, summary = _purge(client)
+
+    # Then, no version was skipped as the pages shifted under the deletes
+    assert sorted(fake.deleted) == [i for i in range(1, 451) if i % 3 != 0]
+    assert [item["id"] for item in fake.versions["p"]] == [i for i in range(450, 0, -1) if i % 3 == 0]
+    assert summary["untagged"] == 300
+    assert summary["deleted"] == 300
+    assert summary["delete_failed"] == 0
+    assert summary["items_fetched"] == 450
+    assert len(result) == 300
+
+
+def testPurgeFetchesFromLastPageAndDeletesFirstPageLast():
+
+    # Given
+    with FakeGitHub(versions={"p": _versions(250)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        _purge(client, fetchWorkers=1, deleteWorkers=1)
+
+    # Then
+    pages = [path.split("page=")[-1] for method, path in fake.requests if method == "GET"]
+    assert pages == ["1", "3", "2", "1"]
+    assert fake.deleted[-1] == 151
+    assert min(fake.deleted[-67:]) > 150
+
+
+def testPurgeRefetchesFirstPageBeforeDeletingIt(monkeypatch):
+
+    # Given
+    fetchPage = g._fetchPage
+
+    def pushTagged(client, url):
+        res = fetchPage(client, url)
+        if url.endswith("page=1") and not fake.deleted:
+            # The push that was in progress at the first fetch is tagged now
+            fake.versions["p"][0]["metadata"]["container"]["tags"] = ["latest"]
+        return res
+
+    monkeypatch.setattr(g, "_fetchPage", pushTagged)
+
+    with FakeGitHub(versions={"p": _versions(250)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        result, summary = _purge(client, fetchWorkers=1, deleteWorkers=1)
+
+    # Then
+    assert 250 not in fake.deleted
+    assert 250 not in [item["id"] for item in result]
+    assert summary["deleted"] == 166
+
+
+def testPurgeDryrunSendsNothing():
+
+    # Given
+    with FakeGitHub(versions={"p": _versions(120)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        result, summary = _purge(client, dryrun=True)
+
+    # Then
+    assert fake.requestCount("DELETE") == 0
+    assert summary["deleted"] == 80
+    assert set(summary["delete_results"].values()) == {"ok[dryrun]"}
+
+
+def testPurgeOlderThan():
+
+    # Given
+    retention = g._RetentionRules(olderThanDays=10, now=datetime(2024, 1, 20, tzinfo=timezone.utc))
+
+    # When
+    with FakeGitHub(versions={"p": _versions(28)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        _, summary = _purge(client, retention=retention)
+
+    # Then
+    assert sorted(fake.deleted) == [1, 2, 4, 5, 7, 8, 28]
+    assert summary["deleted"] == 7
+
+
+def testPurgeStopsAtFetchLimit():
+
+    # Given
+    with FakeGitHub(versions={"p": _versions(1000)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        _, summary = _purge(client, fetchLimit=200, dryrun=True)
+
+    # Then
+    assert fake.requestCount("GET") == 3
+    assert summary["untagged"] == 133
+
+
+def testPurgeRecordsJournal(tmp_path):
+
+    # Given
+    journal = g.DeleteJournal(str(tmp_path / "journal.jsonl"))
+
+    # When
+    with FakeGitHub(versions={"p": _versions(9)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        _purge(client, journal=journal)
+
+    # Then
+    assert journal.unfinished("p") == []
+    assert sorted(fake.deleted) == [1, 2, 4, 5, 7, 8]
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import subprocess
+import pytest
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, containerVersion, actionOutputs
+from benchmarks.synthetic import SyntheticVersions
+
+
+PACKAGES = [
+    {"id": 1, "name": "app", "package_type": "container", "visibility": "private", "version_count": 3},
+    {"id": 2, "name": "web", "package_type": "container", "visibility": "public", "version_count": 1},
+    {"id": 3, "name": "lib", "package_type": "npm", "visibility": "private", "version_count": 1},
+    {"id": 4, "name": "gone", "package_type": "maven"}
+]
+
+
+VERSIONS = {
+    "app": [
+        containerVersion(10, "2024-03-01T00:00:00Z", ["v1", "latest"]),
+        containerVersion(11, "2024-01-01T00:00:00Z", []),
+        containerVersion(12, "2024-05-01T02:00:00+02:00", ["develop-3"]),
+    ],
+    "web": [containerVersion(30, "2023-01-01T00:00:00Z", ["develop-1"])],
+    "lib": [{"id": 20, "name": "1.0.0", "updated_at": "2023-06-01T00:00:00Z"}]
+}
+
+
+def _query(sql: str, **kwargs) -> tuple[list[dict], dict]:
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        return g._query(summary={}, client=client, org="o", user=None, packageTypes=kwargs.pop("packageTypes", g.PACKAGE_TYPES),
+                        sql=sql, fetchLimit=1000, fetchWorkers=1, **kwargs)
+
+
+def testSqlTimestamp():
+
+    # When / Then
+    assert g._sqlTimestamp("2024-05-01T02:00:00+02:00") == "2024-05-01 00:00:00"
+    assert g._sqlTimestamp("2024-05-01T00:00:00Z") == "2024-05-01 00:00:00"
+    assert g._sqlTimestamp("yesterday") == "yesterday"
+    assert g._sqlTimestamp(None) is None
+
+
+def testQueryVersionsPerPackage():
+
+    # When
+    result, summary = _query("SELECT package_name, COUNT(*) AS versions FROM versions GROUP BY package_name ORDER BY versions DESC, package_name", workers=2)
+
+    # Then
+    assert result == [{"package_name": "app", "versions": 3}, {"package_name": "lib", "versions": 1}, {"package_name": "web", "versions": 1}]
+    assert summary["packages"] == 4
+    assert summary["versions"] == 5
+    assert summary["tags"] == 4
+    assert summary["rows"] == 3
+    assert summary["packages_failed"] == 1
+    assert "404" in summary["package_errors"]["maven/gone"]
+
+
+def testQueryTagPrefixOlderThan():
+
+    # When
+    result, _ = _query("SELECT v.package_name, v.id FROM tags t JOIN versions v ON v.id = t.version_id "
+                       "WHERE t.tag GLOB 'develop-*' AND v.updated_at < '2024-05-01 00:00:01' ORDER BY v.id")
+
+    # Then
+    assert result == [{"package_name": "app", "id": 12}, {"package_name": "web", "id": 30}]
+
+
+def testQueryUsesIndexes():
+
+    # Given
+    packages = [{"id": 1, "name": "bench", "package_type": "container"}]
+
+    # When
+    with FakeGitHub(packages=packages, versions={"bench": SyntheticVersions(2000)}) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, _ = g._query(summary={}, client=client, org="o", user=None, packageTypes=["container"], fetchLimit=5000, fetchWorkers=4,
+                             sql="EXPLAIN QUERY PLAN SELECT version_id FROM tags WHERE tag GLOB 'develop-1*'")
+
+    # Then
+    assert "USING INDEX tags_tag" in " ".join(row["detail"] for row in result)
+
+
+def testQueryIsReadOnly():
+
+    # When / Then
+    with pytest.raises(Exception, match="Malformed sql query"):
+        _query("DELETE FROM versions")
+
+
+def testQueryVersionSeenTwiceIsOnlyLoadedOnce():
+
+    # Given, a version that shifted onto the next page while paging, and was returned on both
+    versions = {"app": [VERSIONS["app"][0], *VERSIONS["app"]]}
+
+    # When
+    with FakeGitHub(packages=PACKAGES[:1], versions=versions) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+        result, summary = g._query(summary={}, client=client, org="o", user=None, packageTypes=["container"],
+                                   sql="SELECT COUNT(*) AS tags FROM tags t JOIN versions v ON v.id = t.version_id", fetchLimit=1000, fetchWorkers=1)
+
+    # Then
+    assert result == [{"tags": 3}]
+    assert summary["versions"] == 3
+    assert summary["tags"] == 3
+
+
+def testQueryOfOneTypeAndName():
+
+    # When
+    result, summary = _query("SELECT name, json_extract(data, '$.visibility') AS visibility FROM packages", packageTypes=["container"], packageNameRegex="w.*")
+
+    # Then
+    assert result == [{"name": "web", "visibility": "public"}]
+    assert summary["versions"] == 1
+
+
+def testQueryDatabaseFileIsRebuilt(tmp_path):
+
+    # Given
+    path = str(tmp_path / "packages.sqlite")
+    _query("SELECT 1", databasePath=path)
+
+    # When
+    result, _ = _query("SELECT COUNT(*) AS versions FROM versions", databasePath=path)
+
+    # Then
+    assert result == [{"versions": 5}]
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM tags").fetchone() == (4,)
+
+
+SQL = "SELECT v.package_name, COUNT(*) AS versions FROM tags t JOIN versions v ON v.id = t.version_id WHERE t.tag GLOB 'develop-*' GROUP BY v.package_name ORDER BY v.package_name"
+
+
+def testQueryThroughActionEntrypoint(tmp_path):
+
+    # Given, the args as the action passes them, and the query as GitHub passes the input
+    outputPath = tmp_path / "output"
+    outputPath.write_text("")
+    args = ["--operation", "query", "--ghtoken", "t", "--org", "o", "--user", "__NONE__", "--package_type", "__NONE__", "--database", "__NONE__"]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # When
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake:
+        env = {**os.environ, "ACTION_DIR": root, "INPUT_QUERY": SQL, "GITHUB_API_URL": fake.url, "GITHUB_OUTPUT": str(outputPath)}
+        res = subprocess.run(["bash", os.path.join(root, "entrypoint.sh")] + args, cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    # Then
+    assert "unrecognized arguments" not in res.stderr
+    assert json.loads(actionOutputs(outputPath)["result_json_output"]) == [{"package_name": "app", "versions": 1}, {"package_name": "web", "versions": 1}]
+
+
+def testQueryFromMainArgs(tmp_path, monkeypatch):
+
+    # Given
+    outputPath = tmp_path / "output"
+    outputPath.write_text("")
+    monkeypatch.setenv("GITHUB_OUTPUT", str(outputPath))
+    monkeypatch.delenv("INPUT_QUERY", raising=False)
+
+    # When
+    with FakeGitHub(packages=PACKAGES, versions=VERSIONS) as fake:
+        monkeypatch.setenv("GITHUB_API_URL", fake.url)
+        exitCode = g.main(["--operation", "query", "--ghtoken", "t", "--org", "o", "--query", SQL])
+
+    # Then
+    assert exitCode == 1  # the maven package fails to list it's versions
+    assert json.loads(actionOutputs(outputPath)["result_json_output"])[0] == {"package_name": "app", "versions": 1}
@@ -0,0 +1,127 @@
+import time
+from unittest.mock import Mock
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub, mockResponse
+
+
+PATH = g.LIST_PACKAGES_FOR_ORG.format(org="o", package_type="container")
+
+
+def _budget(remaining: int, limit: int, resetIn: float) -> Mock:
+    return mockResponse(200, {"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Limit": str(limit), "X-RateLimit-Reset": str(time.time() + resetIn)})
+
+
+def testSecondaryBucketAllowsABurst():
+
+    # Given, a bucket of 600 points, refilled at 90 points a second
+    scheduler = g.RateLimitScheduler(pointsPerMinute=6000)
+
+    # When
+    for _ in range(120):
+        scheduler.acquire("DELETE")
+    burstWaits = scheduler.waits
+    scheduler.acquire("DELETE")
+
+    # Then
+    assert burstWaits == 0
+    assert scheduler.waits == 1
+
+
+def testSecondaryBucketNeverExceedsAMinute():
+
+    # Given
+    scheduler = g.RateLimitScheduler(pointsPerMinute=900)
+
+    # Then, the burst plus a minute of refills is exactly the points per minute
+    assert scheduler._capacity + scheduler._rate * 60 == 900
+
+
+def testReserveWaitsForReset():
+
+    # Given
+    scheduler = g.RateLimitScheduler(reserve=0.1)
+    scheduler.observe(_budget(remaining=100, limit=1000, resetIn=0.2))
+
+    # When
+    start = time.time()
+    scheduler.acquire("GET")
+
+    # Then
+    assert time.time() - start >= 0.15
+    assert scheduler.waits == 1
+
+
+def testLowBudgetIsSpreadOut():
+
+    # Given
+    scheduler = g.RateLimitScheduler(lowWatermark=50)
+    scheduler.observe(_budget(remaining=10, limit=1000, resetIn=0.5))
+
+    # When
+    start = time.time()
+    for _ in range(3):
+        scheduler.acquire("GET")
+
+    # Then
+    assert time.time() - start >= 0.09
+    assert scheduler.waits == 2
+
+
+def testPlentifulBudgetIsNotPaced():
+
+    # Given
+    scheduler = g.RateLimitScheduler(reserve=0.5)
+    scheduler.observe(_budget(remaining=4000, limit=5000, resetIn=3600))
+
+    # When
+    for _ in range(100):
+        scheduler.acquire("GET")
+
+    # Then
+    assert scheduler.waits == 0
+
+
+def testRateLimitedResponsePausesEveryone():
+
+    # Given
+    scheduler = g.RateLimitScheduler()
+
+    # When
+    wait = scheduler.observe(mockResponse(429, {"Retry-After": "0.2"}))
+    start = time.time()
+    scheduler.acquire("DELETE")
+
+    # Then
+    assert wait == 0.2
+    assert time.time() - start >= 0.15
+    assert scheduler.report()["rate_limited"] == 1
+
+
+def testClientRetriesSecondaryRateLimitedList():
+
+    # Given
+    scheduler = g.RateLimitScheduler(pointsPerMinute=900)
+    with FakeGitHub(packages=[{"id": 1}]) as fake, g.GitHubClient("t", apiRoot=fake.url, scheduler=scheduler) as client:
+        fake.failNext("GET", 403, {"Retry-After": "0"})
+
+        # When
+        response = client.get(PATH)
+
+    # Then
+    assert response.status_code == 200
+    assert fake.requestCount("GET") == 2
+    assert scheduler.rateLimited == 1
+
+
+def testClientSharesBudgetAcrossWorkers():
+
+    # Given
+    with FakeGitHub(packages=[{"id": 1}], rateLimit=5000, rateLimitReset=int(time.time()) + 3600) as fake, g.GitHubClient("t", apiRoot=fake.url) as client:
+
+        # When
+        client.get(PATH)
+        client.get(PATH)
+
+    # Then
+    assert client.scheduler._remaining == 4998
+    assert client.scheduler._limit == 5000
@@ -0,0 +1,117 @@
+import gc
+import weakref
+import pytest
+from datetime import datetime, timezone
+import ghpkgadmin as g
+from tests.fake_github import containerVersion
+
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def itemList():
+    itemList = [
+        containerVersion(0, "2024-05-30T00:00:00Z", ["develop-5"]),
+        containerVersion(1, "2024-05-01T00:00:00Z", ["develop-4"]),
+        containerVersion(2, "2024-04-01T00:00:00Z", ["develop-3", "v1-2"]),
+        containerVersion(3, "2024-03-01T00:00:00Z", ["develop-2"]),
+        containerVersion(4, "2024-02-01T00:00:00Z", ["v1-1"]),
+        containerVersion(5, "not a date", []),
+    ]
+    yield itemList
+
+
+def testTimestampsParsedOnce(itemList):
+
+    # Given
+    timestamps = g._Timestamps("updated_at")
+    calls = []
+    valuesAt = timestamps._valuesAt
+    timestamps._valuesAt = lambda item: calls.append(item["id"]) or valuesAt(item)
+
+    # When
+    with timestamps.stage():
+        first = timestamps.of(itemList[0])
+        second = timestamps.of(itemList[0])
+    third = timestamps.of(itemList[0])
+
+    # Then
+    assert first == datetime(2024, 5, 30, tzinfo=timezone.utc)
+    assert second is first
+    assert third == first
+    assert calls == [0, 0]
+
+
+def testOlderThanKeepsNoDroppedItems():
+
+    # Given
+    class Item(dict):
+        pass
+    items = [Item(id=i, updated_at="2024-05-30T00:00:00Z") for i in range(100)]
+    refs = [weakref.ref(item) for item in items]
+    rules = g._RetentionRules(olderThanDays=30, now=NOW)
+
+    # When
+    res = rules.filterAge(items)
+    del items
+    gc.collect()
+
+    # Then
+    assert res == []
+    assert all(ref() is None for ref in refs)
+
+
+def testTimestampsUnparsable(itemList):
+
+    # Given
+    timestamps = g._Timestamps("updated_at")
+
+    # When
+    res = timestamps.of(itemList[5])
+
+    # Then
+    assert res is None
+
+
+def testOlderThan(itemList):
+
+    # Given
+    rules = g._RetentionRules(olderThanDays=45, now=NOW)
+
+    # When
+    result = rules.filterAge(itemList)
+
+    # Then
+    assert [item["id"] for item in result] == [2, 3, 4]
+
+
+def testKeepNewestPerTagPrefix(itemList):
+
+    # Given
+    rules = g._RetentionRules(keepNewest=(2, "(.*)-[0-9]+"), now=NOW)
+    summary: dict = {}
+
+    # When
+    result = rules.withoutNewest(itemList, summary)
+
+    # Then
+    # develop keeps 0 and 1. v1 keeps 2 and 4. The untagged 5 is not affected
+    assert [item["id"] for item in result] == [3, 5]
+    assert summary["kept_newest"] == 4
+
+
+def testRetentionInFilterAndSort(itemList):
+
+    # Given
+    rules = g._RetentionRules(olderThanDays=10, keepNewest=(1, "(develop)-"), now=NOW)
+    summary: dict = {}
+
+    # When
+    result, summary = g._filterAndSortListResponseJson(itemList=itemList, include=[(g.CONTAINER_TAGS_PATH, "develop-.*")], exclude=None,
+                                                       sortBy="updated_at", sortReverse=False, slice=None,
+                                                       summary=summary, retention=rules)
+
+    # Then
+    assert [item["id"] for item in result] == [3, 2]
+    assert summary["older_than_result"] == 3
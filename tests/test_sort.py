@@ -0,0 +1,93 @@
+import random
+import pytest
+import ghpkgadmin as g
+
+
+@pytest.fixture
+def itemList():
+    rnd = random.Random(7)
+    itemList = []
+    for i in range(400):
+        item: dict = {"id": i, "tags": [rnd.randint(0, 30) for _ in range(rnd.randint(0, 3))]}
+        # Lots of ties, and some without a value at all
+        if rnd.random() < 0.9:
+            item["updated_at"] = f"2024-01-{rnd.randint(1, 20):02d}"
+        itemList.append(item)
+    yield itemList
+
+
+def _fullSortAndSlice(itemList, sortBy, sortReverse, slice):
+    result, _ = g._sortBy(itemList=itemList, sortBy=sortBy, sortReverse=sortReverse, summary={})
+    return result[slice[0]:slice[1]]
+
+
+def testSortByPushesNonesToTheEnd(itemList):
+
+    # Given
+    summary: dict = {}
+
+    # When
+    result, summary = g._sortBy(itemList=itemList, sortBy="updated_at", sortReverse=False, summary=summary)
+
+    # Then
+    values = [item.get("updated_at") for item in result]
+    count = len([v for v in values if v is not None])
+    assert values[:count] == sorted(v for v in values if v is not None)
+    assert all(v is None for v in values[count:])
+
+
+def testSortByMultipleValuesUsesFirstInOrder():
+
+    # Given
+    itemList = [{"id": 0, "tags": [5, 1]}, {"id": 1, "tags": [3, 4]}]
+
+    # When
+    ascending, _ = g._sortBy(itemList=itemList, sortBy="tags[*]", sortReverse=False, summary={})
+    descending, _ = g._sortBy(itemList=itemList, sortBy="tags[*]", sortReverse=True, summary={})
+
+    # Then
+    assert [item["id"] for item in ascending] == [0, 1]
+    assert [item["id"] for item in descending] == [0, 1]
+
+
+@pytest.mark.parametrize("sortBy", ["updated_at", "tags[*]", "id"])
+@pytest.mark.parametrize("sortReverse", [False, True])
+@pytest.mark.parametrize("slice", [(None, 10), (5, 15), (0, 1), (-10, None), (-20, -5), (None, 0), (-1, None)])
+def testTopKMatchesFullSort(itemList, sortBy, sortReverse, slice):
+
+    # Given
+    expected = _fullSortAndSlice(itemList, sortBy, sortReverse, slice)
+
+    # When
+    result = g._sortTopK(itemList=itemList, sortBy=sortBy, sortReverse=sortReverse, slice=slice)
+
+    # Then
+    assert result is not None
+    assert result == expected
+
+
+@pytest.mark.parametrize("slice", [(5, None), (None, -5), (3, -3), (None, 300)])
+def testTopKNotUsedForUnboundedSlice(itemList, slice):
+
+    # Given
+    sortBy = "updated_at"
+
+    # When
+    result = g._sortTopK(itemList=itemList, sortBy=sortBy, sortReverse=False, slice=slice)
+
+    # Then
+    assert result is None
+
+
+def testSortAndSliceSummary(itemList):
+
+    # Given
+    summary: dict = {}
+
+    # When
+    result, summary = g._sortAndSlice(itemList=itemList, sortBy="updated_at", sortReverse=True, slice=(None, 10), summary=summary)
+
+    # Then
+    assert len(result) == 10
+    assert summary["items_found"] == 400
+    assert summary["sliced"] == 10
@@ -0,0 +1,151 @@
+import ghpkgadmin as g
+from tests.fake_github import FakeGitHub
+
+
+PATH = g.LIST_PACKAGE_VERSIONS_FOR_USER.format(user="u", package_type="container", package_name="p")
+
+
+def _versions(newest: int, oldest: int = 1) -> list[dict]:
+    """ Newest first, the same as GitHub """
+    return [{"id": i, "name": f"v{i}"} for i in range(newest, oldest - 1, -1)]
+
+
+def _list(client: g.GitHubClient, fetchLimit: int = 5000) -> tuple[list[dict], dict]:
+    return g._listPackageVersions(summary={}, client=client, org=None, user="u", packageType="container", packageName="p",
+                                  fetchLimit=fetchLimit, fetchWorkers=2, include=None, exclude=None, sortBy=None, sortReverse=None, slice=None)
+
+
+def testFirstListingFetchesEverything(tmp_path):
+
+    # Given
+    index = g.VersionIndex(str(tmp_path))
+
+    # When
+    with FakeGitHub(versions={"p": _versions(450)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        result, summary = _list(client)
+
+    # Then
+    assert [item["id"] for item in result] == list(range(450, 0, -1))
+    assert fake.requestCount("GET") == 5
+    assert summary["index"]["sync"] == "full"
+    assert index.load(PATH)["complete"] is True
+
+
+def testLaterListingOnlyFetchesNewPages(tmp_path):
+
+    # Given
+    index = g.VersionIndex(str(tmp_path))
+    with FakeGitHub(versions={"p": _versions(1000)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client)
+        fake.requests.clear()
+        fake.versions["p"][0:0] = _versions(1120, 1001)
+
+        # When
+        result, summary = _list(client)
+
+    # Then
+    assert fake.requestCount("GET") == 2
+    assert [item["id"] for item in result] == list(range(1120, 0, -1))
+    assert summary["index"] == {"sync": "incremental", "pages_fetched": 2, "versions": 1120, "added": 120, "dropped": 0}
+
+
+def testLaterListingDropsDeletedAndKeepsChanged(tmp_path):
+
+    # Given
+    index = g.VersionIndex(str(tmp_path))
+    with FakeGitHub(versions={"p": _versions(300)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client)
+        fake.versions["p"].remove({"id": 299, "name": "v299"})
+        fake.versions["p"][0]["name"] = "latest"
+        fake.versions["p"].insert(0, {"id": 301, "name": "v301"})
+
+        # When
+        result, summary = _list(client)
+
+    # Then
+    assert [item["id"] for item in result] == [301] + list(range(300, 0, -1))[:1] + list(range(298, 0, -1))
+    assert result[1]["name"] == "latest"
+    assert summary["index"]["sync"] == "incremental"
+    assert summary["index"]["dropped"] == 1
+
+
+def testListingRefetchesWhenPageCountDisagrees(tmp_path):
+
+    # Given, someone else deleted versions deep in the history
+    index = g.VersionIndex(str(tmp_path))
+    with FakeGitHub(versions={"p": _versions(450)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client)
+        del fake.versions["p"][300:]
+
+        # When
+        result, summary = _list(client)
+
+    # Then
+    assert [item["id"] for item in result] == list(range(450, 150, -1))
+    assert summary["index"]["sync"] == "full"
+
+
+def testStaleIndexIsNotUsed(tmp_path):
+
+    # Given
+    index = g.VersionIndex(str(tmp_path), maxAgeSeconds=-1)
+    with FakeGitHub(versions={"p": _versions(250)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client)
+
+        # When
+        result, summary = _list(client)
+
+    # Then
+    assert summary["index"]["sync"] == "full"
+    assert len(result) == 250
+
+
+def testDeletedVersionsAreDroppedFromIndex(tmp_path):
+
+    # Given
+    index = g.VersionIndex(str(tmp_path))
+    with FakeGitHub(versions={"p": _versions(5)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client)
+
+        # When
+        g._deletePackageVersions(summary={}, itemList=[{"id": 2}, {"id": 4}, {"id": 9}], client=client, org=None, user="u",
+                                 packageType="container", packageName="p", dryrun=False)
+
+    # Then
+    assert [version["id"] for version in index.load(PATH)["versions"]] == [5, 3, 1]
+
+
+def testIndexedListingHonoursFetchLimit(tmp_path):
+
+    # Given
+    index = g.VersionIndex(str(tmp_path))
+    with FakeGitHub(versions={"p": _versions(450)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client)
+
+        # When
+        result, summary = _list(client, fetchLimit=120)
+
+    # Then
+    assert [item["id"] for item in result] == list(range(450, 330, -1))
+    assert summary["items_fetched"] == 120
+    assert len(index.load(PATH)["versions"]) == 450
+
+
+def testLargerFetchLimitRefetchesShortSnapshot(tmp_path):
+
+    # Given, a snapshot cut short by a smaller fetch limit
+    index = g.VersionIndex(str(tmp_path))
+    with FakeGitHub(versions={"p": _versions(3000)}) as fake, g.GitHubClient("t", apiRoot=fake.url, index=index) as client:
+        _list(client, fetchLimit=1000)
+        shortSnapshot = index.load(PATH)
+
+        # When
+        result, summary = _list(client, fetchLimit=3000)
+        again, againSummary = _list(client, fetchLimit=3000)
+
+    # Then
+    assert shortSnapshot["complete"] is False
+    assert [item["id"] for item in result] == list(range(3000, 0, -1))
+    assert summary["index"]["sync"] == "full"
+    assert len(again) == 3000
+    assert againSummary["index"]["sync"] == "incremental"